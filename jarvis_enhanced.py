@@ -22,21 +22,268 @@ import pyautogui
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import queue
+import wave
 import logging
-from typing import Optional, List, Dict, Any
+import logging.handlers
+import multiprocessing
+import argparse
+import copy
+import io
+import contextlib
+import uuid
+import urllib.request
+import urllib.parse
+import socket
+import ssl
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import deque
+import concurrent.futures
+from concurrent.futures import (Future, ThreadPoolExecutor, ProcessPoolExecutor, InvalidStateError,
+                                wait, FIRST_COMPLETED)
+from typing import Optional, List, Dict, Any, Callable, Iterator
 import hashlib
+import hmac
+import ipaddress
 import shutil
 import mimetypes
+import heapq
+import array
+import difflib
+import math
+import random
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+import atexit
+import tempfile
+import tracemalloc
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, pure Python fallbacks are used without it
+    np = None
+
+def get_data_dir() -> Path:
+    """Get the per-user directory for JARVIS caches and state"""
+    data_dir = Path.home() / '.jarvis_enhanced'
+    data_dir.mkdir(parents=True, exist_ok=True)
+    return data_dir
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Formats log records as one JSON object per line"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed_repeats'] = record.suppressed
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RepeatedLogFilter(logging.Filter):
+    """Lets only the first few identical warnings/errors through per time window
+
+    When a window with suppressed repeats ends, the next identical record
+    carries a 'suppressed' count so nothing is silently lost.
+    """
+    
+    def __init__(self, window: float = 60.0, burst: int = 3, max_keys: int = 1000):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.max_keys = max_keys
+        self.seen = {}
+        self.lock = threading.Lock()
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        key = (record.levelno, record.msg if not record.args else record.getMessage())
+        now = time.monotonic()
+        with self.lock:
+            if key not in self.seen and len(self.seen) >= self.max_keys:
+                self._prune(now)
+            window_start, count, suppressed = self.seen.get(key, (now, 0, 0))
+            if now - window_start >= self.window:
+                record.suppressed = suppressed
+                self.seen[key] = (now, 1, 0)
+                return True
+            if count < self.burst:
+                self.seen[key] = (window_start, count + 1, suppressed)
+                return True
+            self.seen[key] = (window_start, count, suppressed + 1)
+            return False
+    
+    def _prune(self, now: float):
+        """Drop expired windows, then the oldest ones, to make room for a new message"""
+        self.seen = {k: v for k, v in self.seen.items() if now - v[0] < self.window}
+        if len(self.seen) >= self.max_keys:
+            keep = heapq.nlargest(self.max_keys // 2, self.seen.items(), key=lambda item: item[1][0])
+            self.seen = dict(keep)
+
+
+def setup_logging(log_dir: Optional[Path] = None) -> logging.handlers.QueueListener:
+    """Route logging through a queue so callers never block on disk I/O
+
+    Records go to a rotating JSON Lines file in the per-user log directory
+    and to the console. Rotation is by size unless JARVIS_LOG_ROTATION is
+    'daily'.
+    """
+    log_dir = Path(os.getenv('JARVIS_LOG_DIR', '') or log_dir or get_data_dir() / 'logs')
+    log_dir.mkdir(parents=True, exist_ok=True)
+    log_file = log_dir / 'jarvis.jsonl'
+    
+    if os.getenv('JARVIS_LOG_ROTATION', 'size').lower() == 'daily':
+        file_handler = logging.handlers.TimedRotatingFileHandler(log_file, when='midnight', backupCount=7,
+                                                                 encoding='utf-8')
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=5 * 1024 * 1024, backupCount=5,
+                                                            encoding='utf-8')
+    file_handler.setFormatter(JsonLogFormatter())
+    
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RepeatedLogFilter())
+    
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(logging.INFO)
+    
+    listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler,
+                                              respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+# Set up logging; pool worker processes that import this module log through the
+# root logger without starting a second listener on the same rotating file
+log_listener = setup_logging() if multiprocessing.current_process().name == 'MainProcess' else None
+
+
+def audio_rms(data: bytes, sample_width: int = 2) -> float:
+    """Root-mean-square energy of a block of PCM audio"""
+    if not data:
+        return 0.0
+    if sample_width == 1:
+        # 8-bit PCM is unsigned
+        samples = [b - 128 for b in data]
+        return math.sqrt(sum(v * v for v in samples) / len(samples))
+    usable = len(data) - len(data) % sample_width
+    if np is not None and sample_width in (2, 4):
+        samples = np.frombuffer(data[:usable], dtype=np.int16 if sample_width == 2 else np.int32)
+        return float(np.sqrt(np.mean(samples.astype(np.float64) ** 2))) if samples.size else 0.0
+    samples = array.array('h' if sample_width == 2 else 'i', data[:usable])
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return math.sqrt(sum(v * v for v in samples) / len(samples)) if samples else 0.0
+
+
+def audio_block_rms(data: bytes, sample_width: int = 2, parts: int = 1, stride: int = 4) -> List[float]:
+    """Approximate RMS of each of parts equal slices of a PCM block, from every stride-th sample
+
+    Cheap enough to run on every block of an always-open microphone.
+    """
+    usable = len(data) - len(data) % (sample_width * parts)
+    if sample_width not in (2, 4) or not usable:
+        size = usable // parts
+        return [audio_rms(data[i * size:(i + 1) * size], sample_width) for i in range(parts)]
+    if np is not None:
+        samples = np.frombuffer(data[:usable], dtype=np.int16 if sample_width == 2 else np.int32)
+        sliced = samples.reshape(parts, -1)[:, ::stride].astype(np.float64)
+        return np.sqrt(np.mean(sliced * sliced, axis=1)).tolist()
+    samples = array.array('h' if sample_width == 2 else 'i', data[:usable])
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    size = len(samples) // parts
+    energies = []
+    for i in range(parts):
+        part = samples[i * size:(i + 1) * size:stride]
+        energies.append(math.sqrt(sum(v * v for v in part) / len(part)) if part else 0.0)
+    return energies
+
+
+def hash_file(path: str, block_size: int = 1024 * 1024) -> tuple:
+    """Stream a whole file through BLAKE2b; returns (path, hexdigest or None)"""
+    digest = hashlib.blake2b(digest_size=20)
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+    except OSError:
+        return path, None
+    return path, digest.hexdigest()
+
+
+def hash_file_edges(path: str, size: int, edge_size: int = 64 * 1024) -> Optional[str]:
+    """Hash the first and last blocks of a file, a cheap pre-check before a full hash"""
+    digest = hashlib.blake2b(digest_size=20)
+    try:
+        with open(path, 'rb') as f:
+            digest.update(f.read(edge_size))
+            if size > edge_size:
+                f.seek(max(edge_size, size - edge_size))
+                digest.update(f.read(edge_size))
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+class HostActions:
+    """Everything that changes the host: browser, launched programs, opened files, volume"""
+    
+    def open_url(self, url: str) -> bool:
+        return webbrowser.open(url)
+    
+    def launch(self, args: List[str]):
+        subprocess.Popen(args)
+    
+    def open_path(self, path: str):
+        """Open a file with its default application"""
+        if sys.platform.startswith('darwin'):  # macOS
+            subprocess.call(['open', path])
+        elif sys.platform.startswith('linux'):  # Linux
+            subprocess.call(['xdg-open', path])
+        elif sys.platform.startswith('win'):  # Windows
+            os.startfile(path)
+    
+    def run(self, args: List[str], **kwargs) -> subprocess.CompletedProcess:
+        return subprocess.run(args, **kwargs)
+
+
+class DryRunHostActions(HostActions):
+    """Records host actions instead of performing them, for replays and batch runs"""
+    
+    def __init__(self):
+        self.actions = []
+    
+    def open_url(self, url: str) -> bool:
+        self.actions.append(('open_url', url))
+        return True
+    
+    def launch(self, args: List[str]):
+        self.actions.append(('launch', list(args)))
+    
+    def open_path(self, path: str):
+        self.actions.append(('open_path', path))
+    
+    def run(self, args: List[str], **kwargs) -> subprocess.CompletedProcess:
+        self.actions.append(('run', list(args)))
+        return subprocess.CompletedProcess(args, 0, stdout='', stderr='')
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('jarvis.log'),
-        logging.StreamHandler()
-    ]
-)
 
 class SafetyManager:
     """Manages safety and security for file operations"""
@@ -73,114 +320,2304 @@ class SafetyManager:
         _, ext = os.path.splitext(file_path.lower())
         return ext in self.safe_extensions and ext not in self.dangerous_extensions
 
+class FilenameRanker:
+    """Ranks filenames against spoken file requests"""
+
+    # Words people say for a file type instead of its extension
+    SPOKEN_EXTENSIONS = {
+        'pdf': '.pdf', 'word': '.docx', 'docx': '.docx', 'doc': '.doc',
+        'excel': '.xlsx', 'spreadsheet': '.xlsx', 'xlsx': '.xlsx', 'csv': '.csv',
+        'powerpoint': '.pptx', 'presentation': '.pptx', 'slides': '.pptx', 'pptx': '.pptx',
+        'text': '.txt', 'txt': '.txt', 'markdown': '.md', 'json': '.json',
+        'python': '.py', 'jpeg': '.jpg', 'jpg': '.jpg', 'png': '.png',
+        'mp3': '.mp3', 'mp4': '.mp4', 'html': '.html'
+    }
+
+    FILLER_WORDS = {'my', 'the', 'a', 'an', 'file', 'files', 'please', 'called', 'named',
+                    'this', 'that', 'for', 'me', 'of', 'dot'}
+
+    NGRAM_SIZE = 3
+    HASH_BUCKETS = 4096
+
+    def __init__(self, query: str, access_counts: Optional[Dict[str, int]] = None):
+        self.wanted_ext = None
+        tokens = []
+        for token in self.tokenize(query):
+            if token in self.SPOKEN_EXTENSIONS:
+                self.wanted_ext = self.SPOKEN_EXTENSIONS[token]
+            elif token not in self.FILLER_WORDS:
+                tokens.append(token)
+        self.tokens = tokens
+        self.access_counts = access_counts or {}
+        self.query_grams = self._ngrams(' '.join(tokens)) if tokens else []
+        # Cheap prefilter used while walking: any query word's prefix in the name
+        self._prefixes = [token[:4] for token in tokens]
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """Split text on case changes, underscores, punctuation and digits"""
+        return [t.lower() for t in re.findall(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+', text)]
+
+    def _ngrams(self, text: str) -> List[str]:
+        padded = f" {text} "
+        n = self.NGRAM_SIZE
+        return [padded[i:i + n] for i in range(max(1, len(padded) - n + 1))]
+
+    def is_candidate(self, name: str) -> bool:
+        """Quick check whether a filename is worth ranking"""
+        lname = name.lower()
+        if self._prefixes:
+            return any(prefix in lname for prefix in self._prefixes)
+        return bool(self.wanted_ext) and lname.endswith(self.wanted_ext)
+
+    def _ngram_similarities(self, names: List[str]) -> List[float]:
+        """Cosine similarity between the query and each name over hashed character n-grams"""
+        if not self.query_grams:
+            return [0.0] * len(names)
+        name_grams = [self._ngrams(' '.join(self.tokenize(name))) for name in names]
+
+        if np is not None:
+            buckets = self.HASH_BUCKETS
+            query_vec = np.zeros(buckets)
+            np.add.at(query_vec, [hash(g) % buckets for g in self.query_grams], 1.0)
+            rows = np.repeat(np.arange(len(names)), [len(g) for g in name_grams])
+            cols = np.fromiter((hash(g) % buckets for grams in name_grams for g in grams),
+                               dtype=np.int64, count=len(rows))
+            matrix = np.zeros((len(names), buckets))
+            np.add.at(matrix, (rows, cols), 1.0)
+            norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vec)
+            norms[norms == 0] = 1.0
+            return (matrix @ query_vec / norms).tolist()
+
+        query_counts = {}
+        for g in self.query_grams:
+            query_counts[g] = query_counts.get(g, 0) + 1
+        query_norm = math.sqrt(sum(v * v for v in query_counts.values()))
+        similarities = []
+        for grams in name_grams:
+            counts = {}
+            for g in grams:
+                counts[g] = counts.get(g, 0) + 1
+            dot = sum(v * query_counts.get(g, 0) for g, v in counts.items())
+            norm = math.sqrt(sum(v * v for v in counts.values())) * query_norm
+            similarities.append(dot / norm if norm else 0.0)
+        return similarities
+
+    def rank(self, paths: List[str]) -> List[tuple]:
+        """Score candidate paths and return (score, path) pairs, best first"""
+        if not paths:
+            return []
+        names = [os.path.basename(p) for p in paths]
+        similarities = self._ngram_similarities([os.path.splitext(n)[0] for n in names])
+        now = time.time()
+        max_count = max(self.access_counts.values(), default=0)
+
+        ranked = []
+        for path, name, similarity in zip(paths, names, similarities):
+            stem, ext = os.path.splitext(name)
+            name_tokens = self.tokenize(stem)
+            if self.tokens:
+                covered = sum(1 for t in self.tokens if any(nt.startswith(t) or t.startswith(nt)
+                                                            for nt in name_tokens if len(nt) > 1))
+                coverage = covered / len(self.tokens)
+            else:
+                coverage = 1.0
+            score = 0.5 * similarity + 0.4 * coverage
+
+            if self.wanted_ext:
+                score += 0.15 if ext.lower() == self.wanted_ext else -0.3
+
+            try:
+                age_days = max(0.0, (now - os.path.getmtime(path)) / 86400)
+                score += 0.05 * math.exp(-age_days / 30)
+            except OSError:
+                pass
+
+            count = self.access_counts.get(path, 0)
+            if count and max_count:
+                score += 0.1 * math.log1p(count) / math.log1p(max_count)
+
+            ranked.append((score, path))
+
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        return ranked
+
+class ProviderStats:
+    """Latency and reliability statistics per AI provider, kept as EWMAs"""
+    
+    def __init__(self, path: Optional[Path] = None, alpha: float = 0.2, save_interval: float = 10.0):
+        self.path = path or get_data_dir() / 'provider_stats.json'
+        self.alpha = alpha
+        self.save_interval = save_interval
+        self.providers = {}
+        self.lock = threading.Lock()
+        self._last_save = 0.0
+        self.load()
+        atexit.register(self.save)
+    
+    def load(self):
+        """Load statistics saved by a previous run"""
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                self.providers = json.load(f)
+        except Exception as e:
+            logging.error(f"Error loading provider stats: {e}")
+    
+    def save(self):
+        """Write statistics to disk"""
+        with self.lock:
+            data = json.dumps(self.providers, indent=2)
+            self._last_save = time.monotonic()
+        try:
+            with open(self.path, 'w') as f:
+                f.write(data)
+        except Exception as e:
+            logging.error(f"Error saving provider stats: {e}")
+    
+    def record(self, provider: str, latency: float, success: bool):
+        """Fold one request outcome into the provider's averages"""
+        a = self.alpha
+        with self.lock:
+            entry = self.providers.get(provider)
+            if entry is None:
+                entry = {'latency': latency, 'p50': latency, 'p95': latency,
+                         'success_rate': 1.0 if success else 0.0, 'requests': 0}
+                self.providers[provider] = entry
+            entry['requests'] += 1
+            entry['success_rate'] += a * ((1.0 if success else 0.0) - entry['success_rate'])
+            entry['latency'] += a * (latency - entry['latency'])
+            # Stochastic quantile tracking: nudge each estimate toward the sample
+            step = a * max(entry['latency'], 0.05)
+            for key, q in (('p50', 0.5), ('p95', 0.95)):
+                if latency > entry[key]:
+                    entry[key] += step * q
+                else:
+                    entry[key] -= step * (1 - q)
+                entry[key] = max(entry[key], 0.0)
+            entry['updated'] = datetime.datetime.now().isoformat()
+            due = time.monotonic() - self._last_save >= self.save_interval
+        if due:
+            self.save()
+    
+    def merge(self, providers: Dict[str, Dict[str, Any]]):
+        """Adopt entries that are newer than what was loaded from disk"""
+        with self.lock:
+            for name, entry in providers.items():
+                current = self.providers.get(name)
+                if current is None or entry.get('updated', '') > current.get('updated', ''):
+                    self.providers[name] = dict(entry)
+    
+    def expected_latency(self, provider: str) -> float:
+        """Expected seconds until a good answer; 0 for providers never tried"""
+        entry = self.providers.get(provider)
+        if not entry:
+            return 0.0
+        return entry['p50'] / max(entry['success_rate'], 0.05)
+    
+    def rank(self, providers: List[str], exploration: float = 0.05) -> List[str]:
+        """Order providers best first, occasionally promoting a random one to keep stats fresh"""
+        with self.lock:
+            ordered = sorted(providers, key=self.expected_latency)
+        if len(ordered) > 1 and random.random() < exploration:
+            explored = random.choice(ordered[1:])
+            ordered.remove(explored)
+            ordered.insert(0, explored)
+        return ordered
+    
+    def describe(self, provider: str) -> str:
+        """Short human readable summary"""
+        entry = self.providers.get(provider)
+        if not entry:
+            return "no data"
+        return (f"p50 {entry['p50']:.2f}s, p95 {entry['p95']:.2f}s, "
+                f"{entry['success_rate'] * 100:.0f}% ok, {entry['requests']} requests")
+
+
 class AIIntegration:
     """Handles AI integrations with OpenAI and Gemini - FIXED VERSION"""
     
-    def __init__(self, openai_key: str = "", gemini_key: str = ""):
-        self.openai_key = openai_key
-        self.gemini_key = gemini_key
-        self.openai_client = None
-        self.gemini_model = None
-        
-        # Initialize OpenAI client if key is available
-        if self.openai_key:
+    def __init__(self, openai_key: str = "", gemini_key: str = "", stats: Optional[ProviderStats] = None,
+                 exploration: float = 0.05, openai_base_url: str = "", gemini_base_url: str = ""):
+        self.openai_key = openai_key
+        self.gemini_key = gemini_key
+        # Alternative endpoints, e.g. a local ProviderStubServer for load tests
+        self.openai_base_url = openai_base_url
+        self.gemini_base_url = gemini_base_url
+        self.openai_client = None
+        self.gemini_model = None
+        self.stats = stats or ProviderStats()
+        self.exploration = exploration
+        self.recorder = None  # SessionRecorder capturing provider replies, when recording
+        
+        # Initialize OpenAI client if key is available
+        if self.openai_key:
+            try:
+                from openai import OpenAI
+                self.openai_client = OpenAI(api_key=self.openai_key, base_url=self.openai_base_url or None)
+                logging.info("OpenAI client initialized successfully")
+            except Exception as e:
+                logging.error(f"Failed to initialize OpenAI client: {e}")
+        
+        # Initialize Gemini model if key is available
+        if self.gemini_key:
+            try:
+                import google.generativeai as genai
+                if self.gemini_base_url:
+                    genai.configure(api_key=self.gemini_key, transport='rest',
+                                    client_options={'api_endpoint': self.gemini_base_url})
+                else:
+                    genai.configure(api_key=self.gemini_key)
+                # FIX 1: Use correct model name for current Gemini API
+                self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')  # Changed from gemini-1.5-pro-latest
+                logging.info("Gemini model initialized successfully")
+            except Exception as e:
+                logging.error(f"Failed to initialize Gemini model: {e}")
+    
+    def query_openai(self, prompt: str) -> str:
+        """Query OpenAI GPT for complex tasks - FIXED VERSION"""
+        if not self.openai_key or not self.openai_client:
+            return "OpenAI API key not configured or client not initialized"
+        
+        try:
+            response = self.openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are JARVIS, a helpful assistant. Provide concise, accurate responses."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=200,
+                temperature=0.7
+            )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            error_msg = str(e)
+            if "insufficient_quota" in error_msg:
+                return "OpenAI quota exceeded. Please check your billing details."
+            elif "rate_limit" in error_msg:
+                return "OpenAI rate limit reached. Please try again later."
+            else:
+                logging.error(f"OpenAI API error: {e}")
+                return f"Error querying OpenAI: {str(e)}"
+    
+    def query_gemini(self, prompt: str) -> str:
+        """Query Google Gemini for complex tasks - FIXED VERSION"""
+        if not self.gemini_key or not self.gemini_model:
+            return "Gemini API key not configured or model not initialized"
+        
+        try:
+            response = self.gemini_model.generate_content(prompt)
+            if response.text:
+                return response.text
+            else:
+                return "Gemini returned empty response"
+        except Exception as e:
+            error_msg = str(e)
+            if "quota" in error_msg.lower():
+                return "Gemini quota exceeded. Please check your billing details or try again later."
+            elif "rate" in error_msg.lower():
+                return "Gemini rate limit reached. Please try again later."
+            else:
+                logging.error(f"Gemini API error: {e}")
+                return f"Error querying Gemini: {str(e)}"
+    
+    def is_available(self) -> bool:
+        """Check if any AI service is available"""
+        return bool(self.openai_client or self.gemini_model)
+    
+    @staticmethod
+    def is_error_response(response: str) -> bool:
+        """Check whether a provider reply is an error message rather than an answer"""
+        return not response or any(error in response.lower() for error in ['error', 'quota', 'rate limit'])
+    
+    def available_providers(self) -> List[str]:
+        """Names of the configured providers"""
+        providers = []
+        if self.gemini_model:
+            providers.append('gemini')
+        if self.openai_client:
+            providers.append('openai')
+        return providers
+    
+    def query(self, prompt: str) -> str:
+        """Query the provider with the best expected latency, falling back to the others"""
+        query_functions = {'gemini': self.query_gemini, 'openai': self.query_openai}
+        response = ""
+        for provider in self.stats.rank(self.available_providers(), self.exploration):
+            start = time.perf_counter()
+            response = query_functions[provider](prompt)
+            elapsed = time.perf_counter() - start
+            failed = self.is_error_response(response)
+            self.stats.record(provider, elapsed, not failed)
+            if self.recorder:
+                self.recorder.record('provider', provider=provider, prompt=prompt, response=response,
+                                     latency_ms=round(elapsed * 1000, 1))
+            if not failed:
+                return response
+            logging.warning(f"{provider} failed, trying next provider: {response[:100]}")
+        return response
+    
+    def get_status(self) -> str:
+        """Get status of AI integrations"""
+        status = []
+        if self.openai_client:
+            status.append(f"OpenAI: Ready ({self.stats.describe('openai')})")
+        else:
+            status.append("OpenAI: Not configured")
+        
+        if self.gemini_model:
+            status.append(f"Gemini: Ready ({self.stats.describe('gemini')})")
+        else:
+            status.append("Gemini: Not configured")
+        
+        return " | ".join(status)
+
+class ProviderProbe:
+    """Measures connect time, time to first token and total latency of each AI provider
+
+    Requests to all providers run concurrently on worker threads and each
+    result is passed to `on_result` as soon as it arrives, so a GUI can show
+    progress without blocking its event loop.
+    """
+    
+    PROMPT = "Reply with the single word: ready"
+    GEMINI_ENDPOINT = "https://generativelanguage.googleapis.com"
+    OPENAI_ENDPOINT = "https://api.openai.com/v1"
+    
+    def __init__(self, ai: AIIntegration, requests_per_provider: int = 5, concurrency: int = 2,
+                 timeout: float = 30.0, record_stats: bool = True):
+        self.ai = ai
+        self.requests_per_provider = requests_per_provider
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.record_stats = record_stats
+    
+    @staticmethod
+    def classify_error(error: Exception) -> str:
+        """Bucket a provider exception into quota, rate_limit, auth, timeout, connection, server or other"""
+        message = str(error).lower()
+        status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+        if 'quota' in message:
+            return 'quota'
+        if status == 429 or 'rate limit' in message or 'rate_limit' in message or 'resource exhausted' in message:
+            return 'rate_limit'
+        if status in (401, 403) or 'api key' in message or 'unauthorized' in message or 'permission' in message:
+            return 'auth'
+        if isinstance(error, (socket.timeout, TimeoutError)) or 'timed out' in message or 'timeout' in message:
+            return 'timeout'
+        if isinstance(error, (ConnectionError, OSError)) or 'connection' in message:
+            return 'connection'
+        if isinstance(status, int) and status >= 500 or 'internal' in message or 'unavailable' in message:
+            return 'server'
+        return 'other'
+    
+    def endpoint(self, provider: str) -> str:
+        """Base URL requests for a provider are sent to"""
+        if provider == 'openai':
+            return str(getattr(self.ai.openai_client, 'base_url', '') or self.ai.openai_base_url or self.OPENAI_ENDPOINT)
+        url = self.ai.gemini_base_url or self.GEMINI_ENDPOINT
+        return url if '://' in url else f"https://{url}"
+    
+    def connect_time(self, url: str) -> Optional[float]:
+        """Seconds to open a TCP (and TLS) connection to the endpoint; None if it fails"""
+        parsed = urllib.parse.urlparse(url)
+        secure = parsed.scheme == 'https'
+        port = parsed.port or (443 if secure else 80)
+        start = time.perf_counter()
+        try:
+            with socket.create_connection((parsed.hostname, port), timeout=self.timeout) as sock:
+                if secure:
+                    with ssl.create_default_context().wrap_socket(sock, server_hostname=parsed.hostname):
+                        pass
+        except OSError:
+            return None
+        return time.perf_counter() - start
+    
+    def _stream(self, provider: str) -> Iterator[str]:
+        """Yield text chunks of a streamed reply"""
+        if provider == 'openai':
+            # No SDK retries: a probe should see every failure and its real latency
+            stream = self.ai.openai_client.with_options(max_retries=0).chat.completions.create(
+                model="gpt-3.5-turbo", messages=[{"role": "user", "content": self.PROMPT}],
+                max_tokens=5, stream=True, timeout=self.timeout)
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        else:
+            for chunk in self.ai.gemini_model.generate_content(self.PROMPT, stream=True,
+                                                               request_options={'timeout': self.timeout}):
+                if chunk.text:
+                    yield chunk.text
+    
+    def probe_once(self, provider: str, index: int) -> Dict[str, Any]:
+        """Send one streamed request and time it"""
+        result = {'provider': provider, 'index': index, 'ok': False, 'connect_ms': None,
+                  'ttft_ms': None, 'total_ms': None, 'error': None, 'detail': ''}
+        connect = self.connect_time(self.endpoint(provider))
+        if connect is not None:
+            result['connect_ms'] = round(connect * 1000, 1)
+        start = time.perf_counter()
+        text = ''
+        try:
+            for piece in self._stream(provider):
+                if not text:
+                    result['ttft_ms'] = round((time.perf_counter() - start) * 1000, 1)
+                text += piece
+            if text.strip():
+                result['ok'] = True
+            else:
+                result['error'] = 'empty'
+        except Exception as e:
+            result['error'] = self.classify_error(e)
+            result['detail'] = str(e)[:200]
+        elapsed = time.perf_counter() - start
+        result['total_ms'] = round(elapsed * 1000, 1)
+        if self.record_stats:
+            self.ai.stats.record(provider, elapsed, result['ok'])
+        return result
+    
+    @staticmethod
+    def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Percentiles and error counts per provider"""
+        summary = {}
+        for provider in sorted({r['provider'] for r in results}):
+            rows = [r for r in results if r['provider'] == provider]
+            ok = [r for r in rows if r['ok']]
+            errors = {}
+            for r in rows:
+                if r['error']:
+                    errors[r['error']] = errors.get(r['error'], 0) + 1
+            connect = [r['connect_ms'] for r in rows if r['connect_ms'] is not None]
+            ttft = [r['ttft_ms'] for r in ok if r['ttft_ms'] is not None]
+            total = [r['total_ms'] for r in ok]
+            summary[provider] = {
+                'requests': len(rows),
+                'ok': len(ok),
+                'errors': errors,
+                'connect_ms_p50': _percentile(connect, 50),
+                'ttft_ms_p50': _percentile(ttft, 50),
+                'ttft_ms_p95': _percentile(ttft, 95),
+                'total_ms_p50': _percentile(total, 50),
+                'total_ms_p95': _percentile(total, 95),
+                'total_ms_p99': _percentile(total, 99),
+            }
+        return summary
+    
+    def run(self, on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Probe every configured provider concurrently and return the summary"""
+        providers = self.ai.available_providers()
+        results = []
+        if not providers:
+            return {}
+        with ThreadPoolExecutor(max_workers=self.concurrency * len(providers),
+                                thread_name_prefix='jarvis-probe') as pool:
+            # Interleave providers so both make progress from the start
+            futures = [pool.submit(self.probe_once, provider, i)
+                       for i in range(self.requests_per_provider) for provider in providers]
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if on_result:
+                    on_result(result)
+        return self.summarize(results)
+    
+    @staticmethod
+    def format_result(result: Dict[str, Any]) -> str:
+        """One line describing a single probe result"""
+        connect = f"{result['connect_ms']:.0f}" if result['connect_ms'] is not None else "-"
+        if result['ok']:
+            return (f"{result['provider']} #{result['index'] + 1}: ok, connect {connect} ms, "
+                    f"first token {result['ttft_ms']:.0f} ms, total {result['total_ms']:.0f} ms")
+        return (f"{result['provider']} #{result['index'] + 1}: {result['error']} after "
+                f"{result['total_ms']:.0f} ms {result['detail'][:80]}")
+    
+    @staticmethod
+    def format_summary(summary: Dict[str, Any]) -> str:
+        """Multi-line summary table"""
+        lines = []
+        for provider, s in summary.items():
+            errors = ", ".join(f"{k} {v}" for k, v in s['errors'].items()) or "none"
+            lines.append(f"{provider}: {s['ok']}/{s['requests']} ok | connect p50 {s['connect_ms_p50']:.0f} ms | "
+                         f"first token p50 {s['ttft_ms_p50']:.0f} / p95 {s['ttft_ms_p95']:.0f} ms | "
+                         f"total p50 {s['total_ms_p50']:.0f} / p95 {s['total_ms_p95']:.0f} / "
+                         f"p99 {s['total_ms_p99']:.0f} ms | errors: {errors}")
+        return "\n".join(lines)
+
+
+class CaptureBackend:
+    """Source of screen frames for the screenshot pipeline"""
+    
+    name = "base"
+    
+    def capture(self, region: Optional[tuple] = None, monitor: Optional[int] = None):
+        """Capture a frame as a PIL image"""
+        raise NotImplementedError
+
+
+class PyAutoGUICaptureBackend(CaptureBackend):
+    """Captures the real screen with pyautogui"""
+    
+    name = "pyautogui"
+    
+    def monitor_region(self, monitor: int) -> Optional[tuple]:
+        """Get (left, top, width, height) of a monitor, numbered from 1"""
+        try:
+            import mss
+            with mss.mss() as screens:
+                if 0 < monitor < len(screens.monitors):
+                    bounds = screens.monitors[monitor]
+                    return (bounds['left'], bounds['top'], bounds['width'], bounds['height'])
+                logging.warning(f"Monitor {monitor} not found, capturing all screens")
+        except ImportError:
+            logging.warning("Monitor selection requires the 'mss' package, capturing all screens")
+        return None
+    
+    def capture(self, region: Optional[tuple] = None, monitor: Optional[int] = None):
+        if region is None and monitor:
+            region = self.monitor_region(monitor)
+        return pyautogui.screenshot(region=region)
+
+
+class SyntheticCaptureBackend(CaptureBackend):
+    """Generates frames without a display, for headless benchmarks"""
+    
+    name = "synthetic"
+    
+    def __init__(self, width: int = 1920, height: int = 1080, change_every: int = 1):
+        from PIL import Image
+        self._image_module = Image
+        self.width = width
+        self.height = height
+        self.change_every = max(1, change_every)
+        self.frames = 0
+        # Noise compresses like a busy desktop, which is the expensive case
+        self._base = Image.frombytes('RGB', (width, height), os.urandom(width * height * 3))
+    
+    def capture(self, region: Optional[tuple] = None, monitor: Optional[int] = None):
+        frame = self._base.copy()
+        # Consecutive frames are identical until change_every frames have passed
+        shade = (self.frames // self.change_every * 37) % 256
+        frame.paste((shade, shade, shade), (0, 0, 64, 64))
+        self.frames += 1
+        if region:
+            left, top, width, height = region
+            frame = frame.crop((left, top, left + width, top + height))
+        return frame
+
+
+class ScreenshotPipeline:
+    """Captures on the caller's thread and encodes to disk on a background worker"""
+    
+    FORMATS = {'png': '.png', 'jpeg': '.jpg', 'jpg': '.jpg', 'webp': '.webp'}
+    
+    def __init__(self, backend: CaptureBackend, output_dir: str, image_format: str = 'png',
+                 png_compress_level: int = 1, quality: int = 85, skip_duplicates: bool = True):
+        self.backend = backend
+        self.output_dir = output_dir
+        self.image_format = image_format.lower() if image_format.lower() in self.FORMATS else 'png'
+        self.png_compress_level = png_compress_level
+        self.quality = quality
+        self.skip_duplicates = skip_duplicates
+        
+        self.last_digest = None
+        self.last_path = None
+        self._queued = set()  # Paths handed to the encoder but not yet written
+        self.stats = {'captured': 0, 'encoded': 0, 'skipped': 0, 'failed': 0,
+                      'capture_ms': 0.0, 'encode_ms': 0.0}
+        
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._encode_loop, name='jarvis-screenshot', daemon=True)
+        self._worker.start()
+        atexit.register(self.flush)
+    
+    def _save_options(self) -> Dict[str, Any]:
+        if self.image_format == 'png':
+            return {'format': 'PNG', 'compress_level': self.png_compress_level}
+        if self.image_format == 'webp':
+            return {'format': 'WEBP', 'quality': self.quality}
+        return {'format': 'JPEG', 'quality': self.quality}
+    
+    def capture(self, region: Optional[tuple] = None, monitor: Optional[int] = None) -> tuple:
+        """Grab a frame and queue it for encoding
+
+        Returns (path, is_new). When the frame is identical to the previous
+        capture nothing is written and the previous file's path is returned.
+        """
+        start = time.perf_counter()
+        frame = self.backend.capture(region=region, monitor=monitor)
+        self.stats['captured'] += 1
+        
+        if self.skip_duplicates:
+            digest = hashlib.blake2b(frame.tobytes(), digest_size=16).digest()
+            # Only reuse the previous file if it was written (or is about to be)
+            # and hasn't been deleted since
+            if (digest == self.last_digest and self.last_path and
+                    (self.last_path in self._queued or os.path.exists(self.last_path))):
+                self.stats['skipped'] += 1
+                self.stats['capture_ms'] += (time.perf_counter() - start) * 1000
+                return self.last_path, False
+            self.last_digest = digest
+        
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        path = os.path.join(self.output_dir, f"jarvis_screenshot_{timestamp}{self.FORMATS[self.image_format]}")
+        self.last_path = path
+        self._queued.add(path)
+        self._queue.put((frame, path))
+        self.stats['capture_ms'] += (time.perf_counter() - start) * 1000
+        return path, True
+    
+    def _encode_loop(self):
+        while True:
+            frame, path = self._queue.get()
+            try:
+                start = time.perf_counter()
+                if self.image_format != 'png' and frame.mode not in ('RGB', 'L'):
+                    frame = frame.convert('RGB')
+                frame.save(path, **self._save_options())
+                self.stats['encoded'] += 1
+                self.stats['encode_ms'] += (time.perf_counter() - start) * 1000
+            except Exception as e:
+                self.stats['failed'] += 1
+                if path == self.last_path:
+                    self.last_digest = None  # Nothing on disk to reuse for the next identical frame
+                logging.error(f"Screenshot encoding error for {path}: {e}")
+            finally:
+                self._queued.discard(path)
+                self._queue.task_done()
+    
+    def pending(self) -> int:
+        """Number of frames waiting to be encoded"""
+        return self._queue.unfinished_tasks
+    
+    def flush(self):
+        """Wait until every queued frame has been written"""
+        self._queue.join()
+
+
+def benchmark_screenshot_pipeline(frames: int = 20, width: int = 2560, height: int = 1440,
+                                  image_format: str = 'png', png_compress_level: int = 1,
+                                  quality: int = 85, change_every: int = 1) -> Dict[str, Any]:
+    """Measure the screenshot pipeline with synthetic frames, no display needed"""
+    backend = SyntheticCaptureBackend(width, height, change_every=change_every)
+    with tempfile.TemporaryDirectory() as output_dir:
+        pipeline = ScreenshotPipeline(backend, output_dir, image_format=image_format,
+                                      png_compress_level=png_compress_level, quality=quality)
+        start = time.perf_counter()
+        for _ in range(frames):
+            pipeline.capture()
+        blocking_s = time.perf_counter() - start
+        pipeline.flush()
+        total_s = time.perf_counter() - start
+        written = sum(os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir))
+    
+    stats = pipeline.stats
+    return {
+        'frames': frames,
+        'resolution': f"{width}x{height}",
+        'format': pipeline.image_format,
+        'avg_capture_ms': round(stats['capture_ms'] / max(1, stats['captured']), 2),
+        'avg_encode_ms': round(stats['encode_ms'] / max(1, stats['encoded']), 2),
+        'blocking_s': round(blocking_s, 3),
+        'total_s': round(total_s, 3),
+        'encoded': stats['encoded'],
+        'skipped_duplicates': stats['skipped'],
+        'bytes_written': written
+    }
+
+
+class DuplicateFinder:
+    """Finds duplicate files by size, then edge hash, then full hash"""
+    
+    EDGE_SIZE = 64 * 1024
+    
+    def __init__(self, safety_manager: SafetyManager, cache_path: Optional[Path] = None,
+                 hash_workers: Optional[int] = None):
+        self.safety_manager = safety_manager
+        self.cache_path = cache_path or get_data_dir() / 'duplicate_hash_cache.json'
+        self.hash_workers = hash_workers
+        self.cache = None
+        self._touched = set()
+        self.lock = threading.Lock()
+        self.stats = {}
+    
+    def _load_cache(self):
+        if self.cache is not None:
+            return
+        self.cache = {}
+        if self.cache_path.exists():
+            try:
+                with open(self.cache_path, 'r') as f:
+                    self.cache = json.load(f)
+            except Exception as e:
+                logging.error(f"Error loading duplicate hash cache: {e}")
+    
+    def _save_cache(self):
+        try:
+            tmp_path = self.cache_path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(self.cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logging.error(f"Error saving duplicate hash cache: {e}")
+    
+    def _walk(self, root: str) -> List[tuple]:
+        """Collect (path, size, mtime_ns, identity key) for regular files under root"""
+        files = []
+        pending_dirs = deque([root])
+        while pending_dirs:
+            current = pending_dirs.popleft()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if not entry.name.startswith('.') and self.safety_manager.is_safe_path(entry.path):
+                                    pending_dirs.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                st = entry.stat(follow_symlinks=False)
+                                if st.st_size > 0:
+                                    # DirEntry.stat() reports no inode on Windows; fall back to
+                                    # the path so only overlapping roots are collapsed there
+                                    key = (st.st_dev, st.st_ino) if st.st_ino else entry.path
+                                    files.append((entry.path, st.st_size, st.st_mtime_ns, key))
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return files
+    
+    def _cached(self, path: str, size: int, mtime_ns: int) -> Dict[str, Any]:
+        """Get the cache record for a file, discarding it if the file changed"""
+        self._touched.add(path)
+        record = self.cache.get(path)
+        if not record or record.get('size') != size or record.get('mtime_ns') != mtime_ns:
+            record = {'size': size, 'mtime_ns': mtime_ns}
+            self.cache[path] = record
+        return record
+    
+    def find(self, roots: List[str], checkpoint: Optional[Callable[[], None]] = None) -> List[List[str]]:
+        """Find groups of identical files under roots, largest waste first
+
+        checkpoint, if given, is called between units of hashing work so a
+        background job can pause for commands and system load.
+        """
+        checkpoint = checkpoint or (lambda: None)
+        with self.lock:
+            self._load_cache()
+            self._touched = set()
+            stats = {'files': 0, 'edge_hashed': 0, 'full_hashed': 0, 'cache_hits': 0}
+            
+            # Stage 0: walk roots in parallel and bucket by size
+            roots = [r for r in dict.fromkeys(roots) if os.path.isdir(r)]
+            by_size = {}
+            seen_inodes = set()
+            with ThreadPoolExecutor(max_workers=max(1, len(roots)), thread_name_prefix='jarvis-dupes') as pool:
+                for files in pool.map(self._walk, roots):
+                    for path, size, mtime_ns, inode in files:
+                        # Hard links and overlapping roots are the same data, not duplicates
+                        if inode in seen_inodes:
+                            continue
+                        seen_inodes.add(inode)
+                        by_size.setdefault(size, []).append((path, mtime_ns))
+            stats['files'] = len(seen_inodes)
+            checkpoint()
+            
+            # Stage 1: edge hash within same-size buckets
+            by_edge = {}
+            for size, files in by_size.items():
+                if len(files) < 2:
+                    continue
+                checkpoint()
+                for path, mtime_ns in files:
+                    record = self._cached(path, size, mtime_ns)
+                    if 'edge' in record:
+                        stats['cache_hits'] += 1
+                    else:
+                        record['edge'] = hash_file_edges(path, size, self.EDGE_SIZE)
+                        stats['edge_hashed'] += 1
+                    if record['edge']:
+                        by_edge.setdefault((size, record['edge']), []).append(path)
+            
+            # Stage 2: full hash, only for files whose edges collide
+            to_hash = []
+            for (size, _), paths in by_edge.items():
+                if len(paths) < 2:
+                    continue
+                for path in paths:
+                    record = self.cache[path]
+                    if size <= 2 * self.EDGE_SIZE:
+                        record['full'] = record['edge']  # Edge hash already covered the whole file
+                    elif 'full' not in record:
+                        to_hash.append(path)
+            
+            if to_hash:
+                stats['full_hashed'] = len(to_hash)
+                with ProcessPoolExecutor(max_workers=self.hash_workers) as pool:
+                    for start in range(0, len(to_hash), 256):
+                        checkpoint()
+                        for path, digest in pool.map(hash_file, to_hash[start:start + 256], chunksize=16):
+                            self.cache[path]['full'] = digest
+            
+            groups = {}
+            for (size, _), paths in by_edge.items():
+                if len(paths) < 2:
+                    continue
+                for path in paths:
+                    digest = self.cache[path].get('full')
+                    if digest:
+                        groups.setdefault((size, digest), []).append(path)
+            
+            # Forget files under the scanned roots that no longer need hashing
+            prefixes = tuple(os.path.join(r, '') for r in roots)
+            self.cache = {path: record for path, record in self.cache.items()
+                          if path in self._touched or not path.startswith(prefixes)}
+            self._save_cache()
+            self.stats = stats
+            duplicates = [(size, sorted(paths)) for (size, _), paths in groups.items() if len(paths) > 1]
+            duplicates.sort(key=lambda item: item[0] * (len(item[1]) - 1), reverse=True)
+            return [paths for _, paths in duplicates]
+
+
+class DiskUsageAnalyzer:
+    """Aggregated directory size tree with an incremental, mtime-validated cache
+
+    Each directory record holds the allocated size of its own files, its
+    largest files and its subdirectory names. A directory whose mtime is
+    unchanged is not listed again, so re-scans only stat directories and
+    descend into changed subtrees. Growth of an existing file doesn't change
+    its directory's mtime, so records are also refreshed after `max_age`.
+    """
+    
+    TOP_FILES = 10
+    
+    def __init__(self, safety_manager: SafetyManager, cache_path: Optional[Path] = None,
+                 workers: int = 8, max_age: float = 86400.0):
+        self.safety_manager = safety_manager
+        self.cache_path = cache_path or get_data_dir() / 'disk_usage_cache.json'
+        self.workers = workers
+        self.max_age = max_age
+        self.cache = None
+        self.totals = {}
+        self.scanned_at = {}
+        self.stats = {}
+        self._touched = set()
+        self.lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+    
+    @staticmethod
+    def format_size(num_bytes: float) -> str:
+        """Human readable size"""
+        for unit in ('bytes', 'KB', 'MB', 'GB'):
+            if num_bytes < 1024 or unit == 'GB':
+                return f"{num_bytes:.0f} {unit}" if unit == 'bytes' else f"{num_bytes:.1f} {unit}"
+            num_bytes /= 1024
+    
+    def _load_cache(self):
+        if self.cache is not None:
+            return
+        self.cache = {}
+        if self.cache_path.exists():
+            try:
+                with open(self.cache_path, 'r') as f:
+                    self.cache = json.load(f)
+            except Exception as e:
+                logging.error(f"Error loading disk usage cache: {e}")
+    
+    def _save_cache(self):
+        try:
+            tmp_path = self.cache_path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(self.cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logging.error(f"Error saving disk usage cache: {e}")
+    
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+    
+    def _scan_batch(self, path: str, batch: int = 64) -> List[str]:
+        """Scan a directory and its descendants depth first, handing back what's left after a batch"""
+        stack = [path]
+        for _ in range(batch):
+            if not stack:
+                break
+            stack.extend(self._scan_dir(stack.pop()))
+        return stack
+    
+    def _scan_dir(self, path: str) -> List[str]:
+        """Refresh one directory's record if it changed; returns its subdirectory paths"""
+        try:
+            st = os.stat(path, follow_symlinks=False)
+        except OSError:
+            return []
+        self._touched.add(path)
+        record = self.cache.get(path)
+        if record and record['mtime_ns'] == st.st_mtime_ns and time.time() - record['scanned'] < self.max_age:
+            self._count('reused')
+            return [os.path.join(path, name) for name in record['dirs']]
+        
+        self._count('listed')
+        files_size = 0
+        largest = []
+        dirs = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.safety_manager.is_safe_path(entry.path):
+                                dirs.append(entry.name)
+                        elif entry.is_file(follow_symlinks=False):
+                            est = entry.stat(follow_symlinks=False)
+                            # Allocated size where the platform reports blocks
+                            blocks = getattr(est, 'st_blocks', None)
+                            size = blocks * 512 if blocks is not None else est.st_size
+                            files_size += size
+                            if len(largest) < self.TOP_FILES:
+                                heapq.heappush(largest, (size, entry.name))
+                            elif size > largest[0][0]:
+                                heapq.heapreplace(largest, (size, entry.name))
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        self.cache[path] = {'mtime_ns': st.st_mtime_ns, 'scanned': time.time(), 'files_size': files_size,
+                            'files': sorted(largest, reverse=True), 'dirs': dirs}
+        return [os.path.join(path, name) for name in dirs]
+    
+    def _aggregate(self, root: str):
+        """Compute subtree totals under root from the directory records"""
+        order = []
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            record = self.cache.get(path)
+            if record is None:
+                continue
+            order.append(path)
+            stack.extend(os.path.join(path, name) for name in record['dirs'])
+        for path in reversed(order):
+            record = self.cache[path]
+            self.totals[path] = record['files_size'] + sum(self.totals.get(os.path.join(path, name), 0)
+                                                           for name in record['dirs'])
+    
+    @staticmethod
+    def independent_roots(roots: List[str]) -> List[str]:
+        """Drop roots nested inside other roots so nothing is counted twice"""
+        roots = sorted({os.path.abspath(r) for r in roots if os.path.isdir(r)})
+        kept = []
+        for root in roots:
+            if not any(root == k or root.startswith(k.rstrip(os.sep) + os.sep) for k in kept):
+                kept.append(root)
+        return kept
+    
+    def has_cache(self, roots: List[str]) -> bool:
+        """True when every root has a record from this or a previous run"""
+        self._load_cache()
+        return all(os.path.abspath(r) in self.cache for r in roots)
+    
+    def is_fresh(self, roots: List[str], ttl: float) -> bool:
+        """True when every root was scanned in this run within ttl seconds"""
+        now = time.monotonic()
+        fresh = [root for root, when in self.scanned_at.items() if now - when < ttl]
+        return all(any(path == root or path.startswith(root.rstrip(os.sep) + os.sep) for root in fresh)
+                   for path in (os.path.abspath(r) for r in roots))
+    
+    def scan(self, roots: List[str], checkpoint: Optional[Callable[[], None]] = None) -> Dict[str, int]:
+        """Walk roots in parallel, reusing records of unchanged directories
+
+        checkpoint, if given, is called before each round of new batches.
+        """
+        with self.lock:
+            self._load_cache()
+            self._touched = set()
+            self.stats = {'listed': 0, 'reused': 0}
+            roots = self.independent_roots(roots)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='jarvis-du') as pool:
+                # Each task walks a batch of directories; what's left is spread over the pool
+                pending = {pool.submit(self._scan_batch, root) for root in roots}
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    if checkpoint:
+                        checkpoint()
+                    for future in done:
+                        pending.update(pool.submit(self._scan_batch, child) for child in future.result())
+            
+            # Forget directories under the scanned roots that no longer exist
+            prefixes = tuple(root.rstrip(os.sep) + os.sep for root in roots)
+            for path in [p for p in self.cache if p.startswith(prefixes) and p not in self._touched]:
+                del self.cache[path]
+            for path in [p for p in self.totals if p.startswith(prefixes)]:
+                del self.totals[path]
+            for root in roots:
+                self._aggregate(root)
+                self.scanned_at[root] = time.monotonic()
+            self._save_cache()
+            self.stats['seconds'] = round(time.perf_counter() - start, 3)
+            return dict(self.stats)
+    
+    def _under(self, roots: List[str]) -> Iterator[str]:
+        prefixes = tuple(os.path.abspath(r).rstrip(os.sep) + os.sep for r in roots)
+        return (path for path in self.totals if path.startswith(prefixes))
+    
+    def total(self, root: str) -> int:
+        """Bytes used under a scanned root"""
+        return self.totals.get(os.path.abspath(root), 0)
+    
+    def largest_folders(self, roots: List[str], limit: int = 5) -> List[tuple]:
+        """Biggest folders as (bytes, path), preferring a subfolder that holds most of its parent"""
+        candidates = heapq.nlargest(limit * 20, ((self.totals[p], p) for p in self._under(roots)))
+        chosen = []
+        for size, path in candidates:
+            parent = next((i for i, (_, c) in enumerate(chosen) if path.startswith(c + os.sep)), None)
+            if parent is None:
+                if len(chosen) < limit:
+                    chosen.append((size, path))
+            elif size >= 0.9 * chosen[parent][0]:
+                chosen[parent] = (size, path)  # More specific answer, same space
+        return sorted(chosen, reverse=True)
+    
+    def largest_files(self, roots: List[str], limit: int = 5) -> List[tuple]:
+        """Biggest files as (bytes, path)"""
+        abs_roots = [os.path.abspath(r) for r in roots]
+        paths = list(self._under(roots)) + [r for r in abs_roots if r in self.cache]
+        return heapq.nlargest(limit, ((size, os.path.join(path, name))
+                                      for path in paths for size, name in self.cache[path]['files']))
+
+
+class IntentClassifier:
+    """Maps free-form utterances to local handlers with character n-gram TF-IDF"""
+    
+    # Example utterances per handler. The 'cloud' examples are open-ended
+    # questions that should still go to the AI providers.
+    EXAMPLES = {
+        'get_time': ["what time is it", "current time", "what's the clock say", "tell me the time",
+                     "what's the time now", "what hour is it", "do you have the time", "clock"],
+        'get_date': ["what date is it", "what's the date today", "what day is it", "today's date",
+                     "which day of the week is it", "what's today", "calendar date"],
+        'list_files': ["list files", "show files", "show what's on my desktop", "what's in my documents",
+                       "what files are in my downloads", "show me my desktop", "what do i have in downloads",
+                       "list my documents folder", "what's on the desktop", "what's in my pictures folder",
+                       "show my music folder", "what videos do i have"],
+        'search_files': ["search file", "find file", "where is my file", "locate the document",
+                         "can you find my report", "look for a file named"],
+        'control_volume': ["volume up", "volume down", "how loud is it", "turn it up", "turn it down",
+                           "make it louder", "make it quieter", "increase the sound", "lower the sound",
+                           "what's the volume level", "too loud"],
+        'get_system_status': ["system status", "system info", "computer status", "how is my computer doing",
+                              "how busy is the cpu", "how much memory is used", "is my pc running slow",
+                              "check the processor load", "how full is my disk"],
+        'take_screenshot': ["take screenshot", "capture my screen", "grab the screen", "snap the screen",
+                            "screen capture", "save a picture of my screen"],
+        'open_application': ["open calculator", "launch the calculator", "start notepad", "bring up the browser",
+                             "open file explorer", "launch chrome", "start the text editor"],
+        'toggle_mute': ["mute", "unmute", "be quiet", "silence your voice", "turn your voice back on"],
+        'get_help': ["help", "what can you do", "commands", "what are your features", "how do i use you"],
+        'get_command_history': ["history", "what did i ask", "show my previous commands", "recent commands"],
+        'analyze_disk_usage': ["disk usage", "what's eating my disk", "what is taking up space",
+                               "largest folders", "biggest files", "why is my disk full", "free up space"],
+        'get_diagnostics': ["diagnostics", "run diagnostics", "how much memory are you using",
+                            "check for memory leaks", "resource usage", "how many threads are running"],
+        'ai_status': ["ai status", "api status", "integration status", "are the ai services working"],
+        'cloud': ["explain quantum physics", "tell me about the roman empire", "who won the world cup",
+                  "write a poem about the sea", "how do airplanes fly", "what is machine learning",
+                  "give me a recipe for pancakes", "translate hello into french", "why is the sky blue",
+                  "summarize the history of rome", "what should i name my dog", "tell me a joke",
+                  "who is the president", "how tall is mount everest", "what is the capital of japan",
+                  "how do magnets work", "what should i cook for dinner", "how does a computer work",
+                  "how does the internet work", "who invented the telephone", "who invented the light bulb",
+                  "what is the history of the printing press", "tell me the history of computers",
+                  "is it going to rain today", "what's the weather like tomorrow", "will it be sunny this weekend",
+                  "what is a black hole", "what is a noun", "what does mute mean", "what is photosynthesis",
+                  "what year did the war end", "how many people live in china", "when was the first camera made",
+                  "what is the best laptop to buy", "how do i fix a slow computer", "what is the meaning of life"]
+    }
+    
+    # Handlers that change the machine; a guess only runs them for an utterance
+    # that starts with an action verb, never for a question
+    SIDE_EFFECT_INTENTS = {'open_application', 'take_screenshot', 'toggle_mute', 'control_volume'}
+    ACTION_VERBS = {'open', 'launch', 'start', 'bring', 'run', 'take', 'capture', 'grab', 'snap', 'save',
+                    'turn', 'make', 'increase', 'decrease', 'lower', 'raise', 'mute', 'unmute', 'silence', 'be'}
+    POLITE_PREFIX = re.compile(r'^(?:(?:please|jarvis|can you|could you|would you)\s+)+')
+    
+    # Function words carry no intent and would make unrelated requests look alike
+    STOP_WORDS = {'a', 'an', 'the', 'is', 'it', 'its', 'me', 'my', 'i', 'you', 'your', 'can', 'could',
+                  'please', 'what', 'whats', 'tell', 'do', 'does', 'of', 'to', 'on', 'in', 'for',
+                  'and', 'are', 'be', 'how', 'hows', 'this', 'that', 'some', 'now', 'jarvis'}
+    
+    FOLDERS = ['desktop', 'documents', 'downloads', 'pictures', 'music', 'videos']
+    APPS = ['calculator', 'notepad', 'text editor', 'browser', 'chrome', 'file explorer']
+    
+    def __init__(self, examples: Optional[Dict[str, List[str]]] = None):
+        self.examples = examples or self.EXAMPLES
+        self.labels = []
+        documents = []
+        for intent, phrases in self.examples.items():
+            for phrase in phrases:
+                self.labels.append(intent)
+                documents.append(self._features(phrase))
+        
+        document_frequency = {}
+        for features in documents:
+            for feature in set(features):
+                document_frequency[feature] = document_frequency.get(feature, 0) + 1
+        total = len(documents)
+        self.vocabulary = {feature: i for i, feature in enumerate(sorted(document_frequency))}
+        self.idf = [math.log((1 + total) / (1 + document_frequency[f])) + 1 for f in sorted(document_frequency)]
+        
+        vectors = [self._vectorize(features) for features in documents]
+        if np is not None:
+            self.idf = np.array(self.idf)
+            self.matrix = np.zeros((len(vectors), len(self.vocabulary)))
+            for row, vector in enumerate(vectors):
+                for column, weight in vector.items():
+                    self.matrix[row, column] = weight
+        else:
+            self.matrix = vectors
+    
+    def _features(self, text: str) -> List[str]:
+        """Word unigrams plus character 3-grams of each padded word"""
+        features = []
+        for word in re.findall(r"[a-z0-9']+", text.lower()):
+            word = word.replace("'", "")
+            if word in self.STOP_WORDS:
+                continue
+            features.append(f"w:{word}")
+            padded = f" {word} "
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+    
+    def _vectorize(self, features: List[str]) -> Dict[int, float]:
+        """Sparse L2-normalized TF-IDF vector over the training vocabulary"""
+        counts = {}
+        for feature in features:
+            column = self.vocabulary.get(feature)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        vector = {column: count * self.idf[column] for column, count in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {column: v / norm for column, v in vector.items()} if norm else {}
+    
+    def scores(self, text: str) -> Dict[str, float]:
+        """Similarity of the closest training example for each intent"""
+        vector = self._vectorize(self._features(text))
+        if not vector:
+            return {}
+        if np is not None:
+            columns = np.fromiter(vector.keys(), dtype=np.int64, count=len(vector))
+            weights = np.fromiter(vector.values(), dtype=float, count=len(vector))
+            row_scores = (self.matrix[:, columns] @ weights).tolist()
+        else:
+            row_scores = [sum(weight * example.get(column, 0.0) for column, weight in vector.items())
+                          for example in self.matrix]
+        best = {}
+        for label, score in zip(self.labels, row_scores):
+            if score > best.get(label, -1.0):
+                best[label] = score
+        return best
+    
+    def classify(self, text: str) -> tuple:
+        """Return (intent, similarity) of the closest training example"""
+        scores = self.scores(text)
+        if not scores:
+            return 'cloud', 0.0
+        intent = max(scores, key=scores.get)
+        return intent, scores[intent]
+    
+    def has_action_verb(self, text: str) -> bool:
+        """Whether an utterance starts like an instruction rather than a question"""
+        words = self.POLITE_PREFIX.sub('', text.lower().strip()).split()
+        return bool(words) and words[0] in self.ACTION_VERBS
+    
+    def extract_arguments(self, intent: str, text: str) -> Dict[str, Any]:
+        """Pull the handler arguments out of an utterance"""
+        lowered = text.lower()
+        arguments = {}
+        if intent == 'list_files':
+            folder = next((f for f in self.FOLDERS if f.rstrip('s') in lowered), None)
+            if folder:
+                arguments['folder'] = folder
+        elif intent == 'control_volume':
+            if any(w in lowered for w in ['up', 'louder', 'increase', 'raise', 'higher']):
+                arguments['direction'] = 'up'
+            elif any(w in lowered for w in ['down', 'quieter', 'lower', 'decrease', 'softer', 'too loud']):
+                arguments['direction'] = 'down'
+        elif intent == 'open_application':
+            app = next((a for a in self.APPS if a in lowered), None)
+            if app:
+                arguments['app'] = app
+        elif intent == 'search_files':
+            match = re.search(r'(?:named|called|find|locate|where is)\s+(?:my\s+|the\s+)?(.+)', lowered)
+            if match:
+                arguments['name'] = match.group(1).replace('file', '').replace('document', '').strip()
+        return arguments
+
+
+class DeferredResponse(str):
+    """An immediate acknowledgement whose full answer arrives later
+
+    The string value is the acknowledgement, so callers that only speak or
+    log responses keep working. `future` resolves to the rest of the answer
+    (or None when there is nothing more to say).
+    """
+    
+    def __new__(cls, acknowledgement: str, future: Future, kind: str = 'default',
+                request: Optional[str] = None):
+        response = super().__new__(cls, acknowledgement)
+        response.future = future
+        response.kind = kind
+        response.request = request
+        response.superseded = False
+        return response
+    
+    def result(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Wait for the deferred part of the answer"""
+        return self.future.result(timeout)
+    
+    def cancel(self):
+        """Drop the pending answer; work that already started is left to finish unheard"""
+        self.superseded = True
+        self.future.cancel()
+
+
+class TextExtractor:
+    """Extracts text from office documents page by page, with an on-disk cache
+
+    Pages are produced lazily, so a preview only extracts the first page.
+    Extracted pages are cached by (path, size, mtime) and extraction resumes
+    from where the cache left off. The cache is capped at max_cache_mb,
+    evicting the least recently used documents first.
+    """
+    
+    SUPPORTED_EXTENSIONS = ['.pdf', '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.rtf']
+    PAGE_CHARS = 3000  # Page size for formats without real pages
+    
+    def __init__(self, cache_dir: Optional[Path] = None, max_cache_mb: float = 200.0):
+        self.cache_dir = cache_dir or get_data_dir() / 'text_cache'
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_cache_bytes = int(max_cache_mb * 1024 * 1024)
+        self._cache_bytes = None  # Measured on the first write
+        self.lock = threading.Lock()
+    
+    def supports(self, file_path: str) -> bool:
+        return os.path.splitext(file_path.lower())[1] in self.SUPPORTED_EXTENSIONS
+    
+    def _cache_file(self, file_path: str) -> Path:
+        key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{key}.json"
+    
+    def _load_cached(self, file_path: str, st: os.stat_result) -> Dict[str, Any]:
+        cache_file = self._cache_file(file_path)
+        if cache_file.exists():
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached.get('size') == st.st_size and cached.get('mtime_ns') == st.st_mtime_ns:
+                    os.utime(cache_file)  # Recently used documents are evicted last
+                    return cached
+            except Exception as e:
+                logging.error(f"Error reading text cache for {file_path}: {e}")
+        return {'path': file_path, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                'pages': [], 'complete': False, 'page_count': None}
+    
+    def _save_cached(self, file_path: str, cached: Dict[str, Any]):
+        try:
+            cache_file = self._cache_file(file_path)
+            previous = cache_file.stat().st_size if cache_file.exists() else 0
+            tmp_file = cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(cached, f)
+            written = tmp_file.stat().st_size
+            os.replace(tmp_file, cache_file)
+            self._account(written - previous)
+        except Exception as e:
+            logging.error(f"Error writing text cache for {file_path}: {e}")
+    
+    def _account(self, delta: int):
+        """Track the cache size and evict least recently used documents past the cap"""
+        with self.lock:
+            if self._cache_bytes is None:
+                self._cache_bytes = sum(f.stat().st_size for f in self.cache_dir.glob('*.json'))
+            else:
+                self._cache_bytes += delta
+            if self._cache_bytes <= self.max_cache_bytes:
+                return
+            files = sorted(((f.stat().st_mtime, f.stat().st_size, f) for f in self.cache_dir.glob('*.json')),
+                           key=lambda item: item[0])
+            self._cache_bytes = sum(size for _, size, _ in files)
+            target = self.max_cache_bytes * 0.8  # Leave headroom so eviction doesn't run on every write
+            for _, size, f in files:
+                if self._cache_bytes <= target:
+                    break
+                try:
+                    f.unlink()
+                    self._cache_bytes -= size
+                except OSError:
+                    continue
+    
+    def get_pages(self, file_path: str, max_pages: Optional[int] = None,
+                  checkpoint: Optional[Callable[[], None]] = None, max_chars: Optional[int] = None) -> tuple:
+        """Return (pages, page_count) with at least max_pages pages if the document has them
+
+        Extraction also stops once the pages hold max_chars characters.
+        page_count is None when it isn't known without extracting everything.
+        checkpoint, if given, is called between pages.
+        """
+        st = os.stat(file_path)
+        cached = self._load_cached(file_path, st)
+        pages = cached['pages']
+        
+        def enough() -> bool:
+            return ((max_pages is not None and len(pages) >= max_pages) or
+                    (max_chars is not None and sum(len(page) for page in pages) >= max_chars))
+        
+        if cached['complete'] or enough():
+            return pages[:max_pages], cached['page_count']
+        
+        start = len(pages)
+        for index, text in enumerate(self._iter_pages(file_path, cached), start=0):
+            if index < start:
+                continue  # Already cached
+            if checkpoint:
+                checkpoint()
+            pages.append(text)
+            if enough():
+                break
+        else:
+            cached['complete'] = True
+            cached['page_count'] = len(pages)
+        
+        self._save_cached(file_path, cached)
+        return pages[:max_pages], cached['page_count']
+    
+    def get_text(self, file_path: str, checkpoint: Optional[Callable[[], None]] = None,
+                 max_chars: Optional[int] = None) -> str:
+        """Text of a document, only extracting as far as max_chars when given"""
+        pages, _ = self.get_pages(file_path, checkpoint=checkpoint, max_chars=max_chars)
+        text = "\n\n".join(pages)
+        return text[:max_chars] if max_chars is not None else text
+    
+    def _iter_pages(self, file_path: str, cached: Dict[str, Any]) -> Iterator[str]:
+        ext = os.path.splitext(file_path.lower())[1]
+        if ext == '.pdf':
+            yield from self._pdf_pages(file_path, cached)
+        elif ext == '.docx':
+            yield from self._chunk(self._docx_paragraphs(file_path))
+        elif ext == '.pptx':
+            yield from self._pptx_slides(file_path)
+        elif ext == '.xlsx':
+            yield from self._xlsx_sheets(file_path)
+        elif ext in ('.odt', '.ods', '.odp'):
+            yield from self._chunk(self._odf_paragraphs(file_path))
+        elif ext == '.rtf':
+            yield from self._chunk(self._rtf_paragraphs(file_path))
+        else:
+            raise ValueError(f"Unsupported document type: {ext}")
+    
+    def _chunk(self, paragraphs: Iterator[Optional[str]]) -> Iterator[str]:
+        """Group paragraphs into pages; None marks an explicit page break"""
+        page, size = [], 0
+        for paragraph in paragraphs:
+            if paragraph is None or size >= self.PAGE_CHARS:
+                if page:
+                    yield "\n".join(page)
+                page, size = [], 0
+            if paragraph:
+                page.append(paragraph)
+                size += len(paragraph)
+        if page:
+            yield "\n".join(page)
+    
+    def _pdf_pages(self, file_path: str, cached: Dict[str, Any]) -> Iterator[str]:
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            try:
+                from PyPDF2 import PdfReader
+            except ImportError:
+                raise ImportError("PDF text extraction requires the 'pypdf' package")
+        reader = PdfReader(file_path)
+        cached['page_count'] = len(reader.pages)
+        start = len(cached['pages'])
+        for index in range(len(reader.pages)):
+            # PDF pages are random access, so skip straight past cached ones
+            yield "" if index < start else (reader.pages[index].extract_text() or "").strip()
+    
+    def _docx_paragraphs(self, file_path: str) -> Iterator[Optional[str]]:
+        with zipfile.ZipFile(file_path) as archive:
+            with archive.open('word/document.xml') as document:
+                parts = []
+                for event, element in ET.iterparse(document, events=('end',)):
+                    tag = element.tag.rsplit('}', 1)[-1]
+                    if tag == 't':
+                        parts.append(element.text or '')
+                    elif tag == 'tab':
+                        parts.append('\t')
+                    elif tag in ('br', 'lastRenderedPageBreak'):
+                        if tag == 'lastRenderedPageBreak' or element.get(
+                                '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}type') == 'page':
+                            yield ''.join(parts).strip()
+                            parts = []
+                            yield None
+                    elif tag == 'p':
+                        yield ''.join(parts).strip()
+                        parts = []
+                        element.clear()
+    
+    def _pptx_slides(self, file_path: str) -> Iterator[str]:
+        with zipfile.ZipFile(file_path) as archive:
+            slides = [n for n in archive.namelist() if re.match(r'ppt/slides/slide\d+\.xml$', n)]
+            slides.sort(key=lambda n: int(re.search(r'(\d+)\.xml$', n).group(1)))
+            for name in slides:
+                root = ET.fromstring(archive.read(name))
+                paragraphs = [''.join(t.text or '' for t in p.iterfind('.//{*}t')) for p in root.iterfind('.//{*}p')]
+                yield "\n".join(p for p in paragraphs if p.strip())
+    
+    def _xlsx_sheets(self, file_path: str) -> Iterator[str]:
+        with zipfile.ZipFile(file_path) as archive:
+            shared = []
+            if 'xl/sharedStrings.xml' in archive.namelist():
+                root = ET.fromstring(archive.read('xl/sharedStrings.xml'))
+                shared = [''.join(t.text or '' for t in si.iterfind('.//{*}t')) for si in root.iterfind('.//{*}si')]
+            sheets = [n for n in archive.namelist() if re.match(r'xl/worksheets/sheet\d+\.xml$', n)]
+            sheets.sort(key=lambda n: int(re.search(r'(\d+)\.xml$', n).group(1)))
+            for name in sheets:
+                rows = []
+                root = ET.fromstring(archive.read(name))
+                for row in root.iterfind('.//{*}row'):
+                    cells = []
+                    for cell in row.iterfind('.//{*}c'):
+                        kind = cell.get('t')
+                        if kind == 'inlineStr':
+                            cells.append(''.join(t.text or '' for t in cell.iterfind('.//{*}t')))
+                            continue
+                        value = cell.find('{*}v')
+                        if value is None or value.text is None:
+                            cells.append('')
+                        elif kind == 's':
+                            cells.append(shared[int(value.text)] if int(value.text) < len(shared) else '')
+                        else:
+                            cells.append(value.text)
+                    if any(cells):
+                        rows.append("\t".join(cells))
+                yield "\n".join(rows)
+    
+    def _odf_paragraphs(self, file_path: str) -> Iterator[Optional[str]]:
+        with zipfile.ZipFile(file_path) as archive:
+            root = ET.fromstring(archive.read('content.xml'))
+            for element in root.iter():
+                tag = element.tag.rsplit('}', 1)[-1]
+                if tag in ('p', 'h'):
+                    yield ''.join(element.itertext()).strip()
+    
+    def _rtf_paragraphs(self, file_path: str) -> Iterator[Optional[str]]:
+        with open(file_path, 'r', encoding='latin-1') as f:
+            data = f.read()
+        # Drop destinations such as font tables, then control words and braces
+        data = re.sub(r'\{\\(?:\*|fonttbl|colortbl|stylesheet|info)[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', '', data)
+        data = re.sub(r'\\par[d]?\b', '\n', data)
+        data = re.sub(r"\\'[0-9a-f]{2}", '', data)
+        data = re.sub(r'\\[a-z]+-?\d* ?', '', data)
+        data = data.replace('{', '').replace('}', '')
+        for line in data.splitlines():
+            yield line.strip()
+
+
+class AudioPreprocessor:
+    """Shrinks captured speech before upload: trims silence, downmixes to mono, downsamples to 16 kHz"""
+    
+    def __init__(self, target_rate: int = 16000, frame_ms: int = 20, padding_ms: int = 200,
+                 noise_ratio: float = 3.0):
+        self.target_rate = target_rate
+        self.frame_ms = frame_ms
+        self.padding_ms = padding_ms
+        self.noise_ratio = noise_ratio
+        self.stats = {'requests': 0, 'bytes_in': 0, 'bytes_out': 0}
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def _to_samples(data: bytes, sample_width: int, channels: int):
+        """Decode PCM into a float array of 16-bit scale mono samples"""
+        usable = len(data) - len(data) % (sample_width * channels)
+        data = data[:usable]
+        if sample_width == 1:
+            samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float64) - 128) * 256
+        elif sample_width == 2:
+            samples = np.frombuffer(data, dtype='<i2').astype(np.float64)
+        elif sample_width == 3:
+            raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+            samples = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+            samples = np.where(samples & 0x800000, samples - 0x1000000, samples).astype(np.float64) / 256
+        else:
+            samples = np.frombuffer(data, dtype='<i4').astype(np.float64) / 65536
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1)
+        return samples
+    
+    def _trim(self, samples, sample_rate: int, min_energy: float):
+        """Cut leading and trailing frames whose energy is below the speech threshold"""
+        frame = max(1, int(sample_rate * self.frame_ms / 1000))
+        count = len(samples) // frame
+        if count == 0:
+            return samples
+        frames = samples[:count * frame].reshape(count, frame)
+        energy = np.sqrt(np.mean(frames ** 2, axis=1))
+        noise_floor = np.percentile(energy, 10)
+        voiced = np.flatnonzero(energy > max(min_energy, noise_floor * self.noise_ratio))
+        if voiced.size == 0:
+            return samples
+        padding = int(sample_rate * self.padding_ms / 1000)
+        start = max(0, voiced[0] * frame - padding)
+        end = min(len(samples), (voiced[-1] + 1) * frame + padding)
+        return samples[start:end]
+    
+    def _resample(self, samples, sample_rate: int):
+        """Low-pass and linearly interpolate down to the target rate
+
+        Audio at or below the target rate is left alone; upsampling would only
+        make the upload bigger.
+        """
+        if sample_rate <= self.target_rate or len(samples) < 2:
+            return samples
+        # Windowed-sinc low-pass at the new Nyquist frequency to avoid aliasing
+        cutoff = self.target_rate / sample_rate / 2
+        taps = np.arange(-32, 33)
+        kernel = np.sinc(2 * cutoff * taps) * np.hamming(len(taps))
+        samples = np.convolve(samples, kernel / kernel.sum(), mode='same')
+        duration = len(samples) / sample_rate
+        target_count = int(duration * self.target_rate)
+        positions = np.arange(target_count) * (sample_rate / self.target_rate)
+        return np.interp(positions, np.arange(len(samples)), samples)
+    
+    def process_pcm(self, data: bytes, sample_rate: int, sample_width: int, channels: int = 1,
+                    min_energy: float = 0.0) -> tuple:
+        """Convert raw PCM to trimmed mono 16-bit PCM at no more than 16 kHz; returns (data, sample_rate)"""
+        if np is None:
+            return data, sample_rate  # Needs NumPy; upload unchanged
+        samples = self._to_samples(data, sample_width, channels)
+        samples = self._trim(samples, sample_rate, min_energy)
+        samples = self._resample(samples, sample_rate)
+        processed = np.clip(np.round(samples), -32768, 32767).astype('<i2').tobytes()
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['bytes_in'] += len(data)
+            self.stats['bytes_out'] += len(processed)
+        return processed, min(sample_rate, self.target_rate)
+    
+    def process(self, audio, min_energy: float = 0.0):
+        """Preprocess a speech_recognition AudioData; returns (new AudioData, bytes saved)"""
+        data, rate = self.process_pcm(audio.frame_data, audio.sample_rate, audio.sample_width,
+                                      min_energy=min_energy)
+        if rate == audio.sample_rate and data is audio.frame_data:
+            return audio, 0
+        return sr.AudioData(data, rate, 2), len(audio.frame_data) - len(data)
+
+
+def audio_size_report(paths: List[str], target_rate: int = 16000) -> List[Dict[str, Any]]:
+    """Compare upload payload sizes of WAV fixtures before and after preprocessing"""
+    preprocessor = AudioPreprocessor(target_rate=target_rate)
+    wav_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            wav_files.extend(sorted(os.path.join(path, n) for n in os.listdir(path) if n.lower().endswith('.wav')))
+        else:
+            wav_files.append(path)
+    
+    report = []
+    for path in wav_files:
+        with wave.open(path, 'rb') as wav:
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            data = wav.readframes(wav.getnframes())
+        start = time.perf_counter()
+        processed, new_rate = preprocessor.process_pcm(data, rate, width, channels)
+        entry = {
+            'file': os.path.basename(path),
+            'input': f"{rate} Hz, {channels} ch, {width * 8}-bit",
+            'pcm_bytes_before': len(data),
+            'pcm_bytes_after': len(processed),
+            'duration_before_s': round(len(data) / (rate * width * channels), 2),
+            'duration_after_s': round(len(processed) / (new_rate * 2), 2),
+            'process_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+        # FLAC is what actually gets uploaded; needs the flac encoder speech_recognition uses
+        try:
+            if channels == 1:
+                entry['flac_bytes_before'] = len(sr.AudioData(data, rate, width).get_flac_data(convert_width=2))
+            entry['flac_bytes_after'] = len(sr.AudioData(processed, new_rate, 2).get_flac_data())
+        except Exception as e:
+            logging.debug(f"FLAC sizes unavailable: {e}")
+        entry['saved_percent'] = round(100 * (1 - len(processed) / len(data)), 1) if data else 0.0
+        report.append(entry)
+    return report
+
+
+class ListenerDutyCycle:
+    """Decides how hard the wake-word listener works while nobody is talking
+
+    Modes, from most to least expensive:
+      active - full listening; every sound above the threshold is transcribed
+      idle   - a local energy gate reads the microphone continuously and only
+               sends audio for recognition after several voiced frames
+      deep   - the microphone is opened for a short energy probe and then
+               released, so it is read only a fraction of the time
+      sleep  - like deep, entered with the "go to sleep" command and left
+               only when the wake word is heard
+    The listener drops a level after a stretch without speech (sooner during
+    quiet hours). Voiced energy in a gated mode ramps straight back to
+    continuous listening so the rest of the phrase is not lost, and
+    recognized speech returns it to active. Recent frame energies give a
+    noise floor, so a humming fan does not keep waking the gate.
+    """
+    
+    MODES = ('active', 'idle', 'deep', 'sleep')
+    
+    def __init__(self, enabled: bool = True, idle_after: float = 60.0, deep_after: float = 600.0,
+                 quiet_hours: Optional[List[int]] = None, probe_seconds: float = 0.25,
+                 deep_interval: float = 1.0, ramp_seconds: float = 20.0, trigger_frames: int = 3,
+                 noise_ratio: float = 2.5):
+        self.enabled = enabled
+        self.idle_after = idle_after
+        self.deep_after = deep_after
+        self.quiet_hours = quiet_hours  # [start_hour, end_hour], may wrap midnight
+        self.probe_seconds = probe_seconds
+        self.deep_interval = deep_interval
+        self.ramp_seconds = ramp_seconds
+        self.trigger_frames = trigger_frames
+        self.noise_ratio = noise_ratio
+        self.forced = None  # Pins a mode, e.g. for benchmarks
+        self.asleep = False
+        self.last_activity = time.monotonic()
+        self.ramp_until = 0.0
+        self.energy_history = deque(maxlen=400)
+        self.wakeup = threading.Event()  # Cuts a deep-idle pause short
+        self.lock = threading.Lock()
+        self.current = 'active'
+        self.stats = {mode: {'seconds': 0.0, 'cpu_seconds': 0.0, 'triggers': 0, 'recognitions': 0}
+                      for mode in self.MODES}
+        self._accounted = (time.monotonic(), time.process_time())
+    
+    def in_quiet_hours(self, now: Optional[datetime.datetime] = None) -> bool:
+        """Whether the local time falls in the configured quiet hours"""
+        if not self.quiet_hours:
+            return False
+        start, end = self.quiet_hours
+        hour = (now or datetime.datetime.now()).hour
+        return start <= hour < end if start <= end else hour >= start or hour < end
+    
+    def mode(self) -> str:
+        """Mode for the next listening cycle"""
+        if self.forced:
+            return self.forced
+        if not self.enabled:
+            return 'active'
+        now = time.monotonic()
+        if self.asleep:
+            return 'idle' if now < self.ramp_until else 'sleep'
+        quiet = now - self.last_activity
+        deep_after = self.idle_after if self.in_quiet_hours() else self.deep_after
+        if quiet < self.idle_after:
+            return 'active'
+        if quiet < deep_after or now < self.ramp_until:
+            return 'idle'
+        return 'deep'
+    
+    def account(self, mode: str):
+        """Charge wall and CPU time since the last call to mode"""
+        with self.lock:
+            wall, cpu = time.monotonic(), time.process_time()
+            last_wall, last_cpu = self._accounted
+            self._accounted = (wall, cpu)
+            self.stats[mode]['seconds'] += wall - last_wall
+            self.stats[mode]['cpu_seconds'] += cpu - last_cpu
+            if mode != self.current:
+                logging.info(f"Wake-word listener: {self.current} -> {mode}")
+                self.current = mode
+    
+    def threshold(self, base: float) -> float:
+        """Energy a frame needs to count as voiced"""
+        if len(self.energy_history) < 20:
+            return base
+        floor = sorted(self.energy_history)[len(self.energy_history) // 5]
+        return max(base, floor * self.noise_ratio)
+    
+    def observe(self, energy: float):
+        """Record the energy of a quiet frame"""
+        self.energy_history.append(energy)
+    
+    def triggered(self, mode: str):
+        """Voiced energy in a gated mode: listen continuously for a while"""
+        self.stats[mode]['triggers'] += 1
+        self.ramp_until = time.monotonic() + self.ramp_seconds
+    
+    def sent(self, mode: str):
+        """Audio is going to the recognizer"""
+        self.stats[mode]['recognitions'] += 1
+    
+    def recognized(self, text: str, wake_word: bool):
+        """Speech came back from recognition"""
+        if text and (wake_word or not self.asleep):
+            self.activity()
+    
+    def activity(self):
+        """The user is around: return to full listening"""
+        self.asleep = False
+        self.last_activity = time.monotonic()
+        self.wakeup.set()
+    
+    def sleep(self):
+        """Enter deep idle until the wake word is heard"""
+        self.asleep = True
+        self.ramp_until = 0.0
+        self.last_activity = time.monotonic() - self.deep_after
+    
+    def pause(self, mode: str):
+        """Release the microphone between deep-idle probes"""
+        interval = self.deep_interval * (2 if self.in_quiet_hours() else 1)
+        self.wakeup.clear()
+        self.wakeup.wait(max(0.0, interval - self.probe_seconds))
+    
+    def report(self) -> Dict[str, Any]:
+        """Time, CPU share and recognitions per mode"""
+        with self.lock:
+            modes = {}
+            for mode, entry in self.stats.items():
+                if entry['seconds'] <= 0:
+                    continue
+                modes[mode] = {'seconds': round(entry['seconds'], 1),
+                               'cpu_percent': round(100 * entry['cpu_seconds'] / entry['seconds'], 2),
+                               'triggers': entry['triggers'], 'recognitions': entry['recognitions']}
+            return {'mode': self.current, 'asleep': self.asleep, 'modes': modes}
+
+
+class ResourceMonitor:
+    """Periodic memory and resource diagnostics for long-running sessions
+
+    Cheap counters (RSS, threads, registered queue and cache sizes) are always
+    sampled. tracemalloc is only started when `tracemalloc_frames` > 0, since
+    tracing every allocation costs noticeable CPU and memory.
+    """
+    
+    def __init__(self, interval: float = 600.0, tracemalloc_frames: int = 0, top: int = 10,
+                 history: int = 144, leak_mb_per_hour: float = 20.0):
+        self.interval = interval
+        self.tracemalloc_frames = tracemalloc_frames
+        self.top = top
+        self.leak_mb_per_hour = leak_mb_per_hour
+        self.probes = {}
+        self.rss_history = deque(maxlen=history)
+        self.last_report = None
+        self._snapshot = None
+        self.lock = threading.Lock()
+        if tracemalloc_frames > 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(tracemalloc_frames)
+    
+    def register(self, name: str, probe: Callable[[], int]):
+        """Track the size of a queue, cache or buffer in every report"""
+        self.probes[name] = probe
+    
+    def _allocation_growth(self) -> List[Dict[str, Any]]:
+        """Top allocation sites by growth since the previous sample"""
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        previous, self._snapshot = self._snapshot, snapshot
+        if previous is None:
+            stats = snapshot.statistics('lineno')[:self.top]
+            return [{'site': str(stat.traceback[0]), 'size_kb': round(stat.size / 1024, 1),
+                     'count': stat.count} for stat in stats]
+        stats = snapshot.compare_to(previous, 'lineno')[:self.top]
+        return [{'site': str(stat.traceback[0]), 'size_kb': round(stat.size / 1024, 1),
+                 'growth_kb': round(stat.size_diff / 1024, 1), 'count': stat.count}
+                for stat in stats if stat.size_diff > 0]
+    
+    def rss_trend(self) -> Optional[float]:
+        """Least-squares RSS growth in MB per hour over the sample history"""
+        if len(self.rss_history) < 3:
+            return None
+        times = [t for t, _ in self.rss_history]
+        sizes = [rss for _, rss in self.rss_history]
+        mean_t = sum(times) / len(times)
+        mean_rss = sum(sizes) / len(sizes)
+        var = sum((t - mean_t) ** 2 for t in times)
+        if var == 0:
+            return None
+        slope = sum((t - mean_t) * (rss - mean_rss) for t, rss in zip(times, sizes)) / var
+        return slope * 3600 / (1024 * 1024)
+    
+    def sample(self) -> Dict[str, Any]:
+        """Collect one diagnostics report"""
+        with self.lock:
+            rss = psutil.Process(os.getpid()).memory_info().rss
+            self.rss_history.append((time.monotonic(), rss))
+            sizes = {}
+            for name, probe in self.probes.items():
+                try:
+                    sizes[name] = probe()
+                except Exception as e:
+                    sizes[name] = f"error: {e}"
+            trend = self.rss_trend()
+            report = {
+                'timestamp': datetime.datetime.now().isoformat(),
+                'rss_mb': round(rss / (1024 * 1024), 1),
+                'rss_trend_mb_per_hour': round(trend, 2) if trend is not None else None,
+                'threads': threading.active_count(),
+                'thread_names': sorted({re.sub(r'[_-]?\d+$', '', t.name) for t in threading.enumerate()}),
+                'sizes': sizes,
+                'tracemalloc': tracemalloc.is_tracing(),
+                'top_allocations': self._allocation_growth(),
+            }
+            self.last_report = report
+        return report
+    
+    def report(self):
+        """Log one report and warn about sustained memory growth"""
+        try:
+            report = self.sample()
+            logging.info(f"Diagnostics: {json.dumps(report)}")
+            trend = report['rss_trend_mb_per_hour']
+            if trend is not None and len(self.rss_history) >= 6 and trend > self.leak_mb_per_hour:
+                logging.warning(f"Memory grows {trend:.1f} MB/hour; top allocations: {report['top_allocations'][:3]}")
+        except Exception as e:
+            logging.error(f"Diagnostics error: {e}")
+    
+    def start(self, scheduler: 'TaskScheduler'):
+        """Report periodically as a background job; an interval of 0 disables reports"""
+        if self.interval > 0:
+            scheduler.schedule_every(self.interval, self.report, name='diagnostics')
+    
+    @staticmethod
+    def describe(report: Dict[str, Any]) -> str:
+        """Spoken summary of a report"""
+        text = f"Memory {report['rss_mb']:.0f} megabytes"
+        if report['rss_trend_mb_per_hour'] is not None:
+            text += f", changing {report['rss_trend_mb_per_hour']:+.1f} per hour"
+        text += f". {report['threads']} threads running. "
+        sizes = [f"{name.replace('_', ' ')} {value}" for name, value in report['sizes'].items()
+                 if isinstance(value, int) and value]
+        if sizes:
+            text += "Sizes: " + ", ".join(sizes) + ". "
+        if report['top_allocations']:
+            site = report['top_allocations'][0]
+            text += f"Largest allocation growth at {os.path.basename(site['site'])}."
+        elif not report['tracemalloc']:
+            text += "Allocation tracing is off."
+        return text.strip()
+
+
+class TaskScheduler:
+    """Runs work in priority classes so maintenance never slows down commands
+
+    Interactive, normal and background work each get a bounded worker pool.
+    Background jobs wait before starting, and at every `checkpoint()`, while a
+    wake word or command is being handled or while CPU or disk load is above
+    the configured limits.
+    """
+    
+    PRIORITIES = ('interactive', 'normal', 'background')
+    
+    def __init__(self, workers: Optional[Dict[str, int]] = None, cpu_limit: float = 80.0,
+                 io_limit_mb: float = 50.0, load_interval: float = 1.0, max_throttle: float = 30.0):
+        workers = dict({'interactive': 4, 'normal': 4, 'background': 2}, **(workers or {}))
+        self.pools = {priority: ThreadPoolExecutor(max_workers=workers[priority],
+                                                   thread_name_prefix=f'jarvis-{priority}')
+                      for priority in self.PRIORITIES}
+        self.cpu_limit = cpu_limit
+        self.io_limit = io_limit_mb * 1024 * 1024
+        self.load_interval = load_interval
+        self.max_throttle = max_throttle
+        self.stats = {'yields': 0, 'throttled': 0}
+        self._active = 0
+        self._idle = threading.Condition()
+        self._local = threading.local()
+        self._load = (0.0, 0.0)
+        self._load_sampled = 0.0
+        self._io_last = None
+        self._timers = []
+        self._timer_seq = 0
+        self._timer_cond = threading.Condition()
+        self._timer_thread = None
+    
+    @contextlib.contextmanager
+    def interactive(self):
+        """Mark a wake word or command as in progress; background work pauses meanwhile"""
+        with self._idle:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._active -= 1
+                if not self._active:
+                    self._idle.notify_all()
+    
+    def busy(self) -> bool:
+        """True while interactive work is in progress"""
+        return self._active > 0
+    
+    def system_load(self) -> tuple:
+        """(CPU percent, disk bytes per second), sampled at most once per load interval"""
+        now = time.monotonic()
+        if now - self._load_sampled < self.load_interval:
+            return self._load
+        cpu = psutil.cpu_percent(interval=None)
+        io_rate = 0.0
+        try:
+            counters = psutil.disk_io_counters()
+            total = counters.read_bytes + counters.write_bytes
+            if self._io_last is not None:
+                io_rate = (total - self._io_last[1]) / max(now - self._io_last[0], 1e-3)
+            self._io_last = (now, total)
+        except Exception:
+            pass  # Not available on every platform
+        self._load, self._load_sampled = (cpu, io_rate), now
+        return self._load
+    
+    def overloaded(self) -> bool:
+        """True when CPU or disk throughput is above the throttling limits"""
+        cpu, io_rate = self.system_load()
+        return cpu > self.cpu_limit or io_rate > self.io_limit
+    
+    def checkpoint(self):
+        """Pause a background job while commands are running or the system is busy
+
+        Long background jobs should call this between units of work. It is a
+        no-op outside background workers.
+        """
+        if not getattr(self._local, 'background', False):
+            return
+        # Don't wait forever on a machine that is always busy, or on a command
+        # that is itself waiting for this job
+        deadline = time.monotonic() + self.max_throttle
+        yielded = False
+        with self._idle:
+            while self._active and time.monotonic() < deadline:
+                if not yielded:
+                    self.stats['yields'] += 1
+                    yielded = True
+                self._idle.wait(0.5)
+        throttled = False
+        while time.monotonic() < deadline and (self.busy() or self.overloaded()):
+            if not throttled:
+                self.stats['throttled'] += 1
+                throttled = True
+            time.sleep(self.load_interval / 2)
+    
+    def submit(self, fn: Callable, *args, priority: str = 'normal', **kwargs) -> Future:
+        """Run fn in the pool for its priority class"""
+        def run():
+            if priority == 'interactive':
+                with self.interactive():
+                    return fn(*args, **kwargs)
+            if priority == 'background':
+                self._local.background = True
+                try:
+                    self.checkpoint()
+                    return fn(*args, **kwargs)
+                finally:
+                    self._local.background = False
+            return fn(*args, **kwargs)
+        return self.pools[priority].submit(run)
+    
+    def schedule_every(self, interval: float, fn: Callable[[], Any], priority: str = 'background',
+                       name: str = ''):
+        """Run fn every interval seconds"""
+        with self._timer_cond:
+            self._timer_seq += 1
+            heapq.heappush(self._timers, (time.monotonic() + interval, self._timer_seq, interval, fn, priority, name))
+            if self._timer_thread is None:
+                self._timer_thread = threading.Thread(target=self._timer_loop, name='jarvis-scheduler', daemon=True)
+                self._timer_thread.start()
+            self._timer_cond.notify()
+    
+    def _timer_loop(self):
+        """Submit periodic jobs as they come due"""
+        while True:
+            with self._timer_cond:
+                while not self._timers or self._timers[0][0] > time.monotonic():
+                    timeout = self._timers[0][0] - time.monotonic() if self._timers else None
+                    self._timer_cond.wait(timeout)
+                due, seq, interval, fn, priority, name = heapq.heappop(self._timers)
+                # Schedule from the due time so jobs don't drift, skipping missed runs
+                next_due = max(due + interval, time.monotonic())
+                heapq.heappush(self._timers, (next_due, seq, interval, fn, priority, name))
+            try:
+                future = self.submit(fn, priority=priority)
+            except RuntimeError:
+                return  # Interpreter is shutting down
+            future.add_done_callback(lambda f, name=name: f.exception() and
+                                     logging.error(f"Scheduled job {name} failed: {f.exception()}"))
+    
+    def queue_depths(self) -> Dict[str, int]:
+        """Jobs waiting for a worker in each priority class"""
+        return {priority: pool._work_queue.qsize() for priority, pool in self.pools.items()}
+
+
+class WarmStartSnapshot:
+    """Versioned on-disk snapshot of learned state so restarts don't start cold"""
+    
+    VERSION = 1
+    
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or get_data_dir() / 'warm_start.json'
+        self.lock = threading.Lock()
+    
+    def load(self) -> Dict[str, Any]:
+        """Return the saved state, or an empty dict if missing, unreadable or from another version"""
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.error(f"Error loading warm-start snapshot: {e}")
+            return {}
+        if data.get('version') != self.VERSION:
+            logging.info(f"Ignoring warm-start snapshot version {data.get('version')}")
+            return {}
+        return data
+    
+    def save(self, state: Dict[str, Any]):
+        """Write the snapshot atomically so a crash mid-write keeps the previous one"""
+        state = dict(state, version=self.VERSION, saved=datetime.datetime.now().isoformat())
+        with self.lock:
             try:
-                from openai import OpenAI
-                self.openai_client = OpenAI(api_key=self.openai_key)
-                logging.info("OpenAI client initialized successfully")
+                fd, tmp_path = tempfile.mkstemp(dir=str(self.path.parent), suffix='.tmp')
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.path)
             except Exception as e:
-                logging.error(f"Failed to initialize OpenAI client: {e}")
-        
-        # Initialize Gemini model if key is available
-        if self.gemini_key:
+                logging.error(f"Error saving warm-start snapshot: {e}")
+
+
+class TimerEngine:
+    """Persistent timers and reminders served by a single scheduler thread
+
+    Pending timers sit in a heap ordered by due time. Cancelling removes the
+    timer from the index and the heap skips it when it surfaces, so insert
+    and cancel are O(log n) with no thread or polling per timer. Changes are
+    appended to a JSON Lines journal (compacted on load), and a timer is
+    journaled as fired before it is announced, so restarts never repeat it.
+    Timers that came due while the assistant was off fire on startup.
+    """
+    
+    MAX_WAIT = 300.0  # Re-check at least this often in case the wall clock jumps
+    
+    def __init__(self, path: Optional[Path] = None, on_due: Optional[Callable[[Dict[str, Any], float], None]] = None):
+        self.path = path or get_data_dir() / 'timers.jsonl'
+        self.on_due = on_due
+        self.timers = {}
+        self.heap = []
+        self.cond = threading.Condition()
+        self._journal = None
+        self._journal_records = 0
+        self._thread = None
+        self._load()
+    
+    def _load(self):
+        """Rebuild pending timers from the journal and compact it"""
+        if self.path.exists():
             try:
-                import google.generativeai as genai
-                genai.configure(api_key=self.gemini_key)
-                # FIX 1: Use correct model name for current Gemini API
-                self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')  # Changed from gemini-1.5-pro-latest
-                logging.info("Gemini model initialized successfully")
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue  # Torn last line after a crash
+                        if record.get('op') == 'add':
+                            self.timers[record['timer']['id']] = record['timer']
+                        else:
+                            self.timers.pop(record.get('id'), None)
             except Exception as e:
-                logging.error(f"Failed to initialize Gemini model: {e}")
+                logging.error(f"Error loading timers: {e}")
+        self.heap = [(timer['due'], timer_id) for timer_id, timer in self.timers.items()]
+        heapq.heapify(self.heap)
+        self._compact()
     
-    def query_openai(self, prompt: str) -> str:
-        """Query OpenAI GPT for complex tasks - FIXED VERSION"""
-        if not self.openai_key or not self.openai_client:
-            return "OpenAI API key not configured or client not initialized"
-        
-        try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are JARVIS, a helpful assistant. Provide concise, accurate responses."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=200,
-                temperature=0.7
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            error_msg = str(e)
-            if "insufficient_quota" in error_msg:
-                return "OpenAI quota exceeded. Please check your billing details."
-            elif "rate_limit" in error_msg:
-                return "OpenAI rate limit reached. Please try again later."
-            else:
-                logging.error(f"OpenAI API error: {e}")
-                return f"Error querying OpenAI: {str(e)}"
+    def _compact(self):
+        """Rewrite the journal with only the pending timers"""
+        if self._journal:
+            self._journal.close()
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for timer in self.timers.values():
+                f.write(json.dumps({'op': 'add', 'timer': timer}) + "\n")
+        os.replace(tmp_path, self.path)
+        self._journal = open(self.path, 'a', encoding='utf-8')
+        self._journal_records = len(self.timers)
     
-    def query_gemini(self, prompt: str) -> str:
-        """Query Google Gemini for complex tasks - FIXED VERSION"""
-        if not self.gemini_key or not self.gemini_model:
-            return "Gemini API key not configured or model not initialized"
-        
-        try:
-            response = self.gemini_model.generate_content(prompt)
-            if response.text:
-                return response.text
-            else:
-                return "Gemini returned empty response"
-        except Exception as e:
-            error_msg = str(e)
-            if "quota" in error_msg.lower():
-                return "Gemini quota exceeded. Please check your billing details or try again later."
-            elif "rate" in error_msg.lower():
-                return "Gemini rate limit reached. Please try again later."
-            else:
-                logging.error(f"Gemini API error: {e}")
-                return f"Error querying Gemini: {str(e)}"
+    def _append(self, record: Dict[str, Any]):
+        """Durably journal one change; caller holds the lock"""
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._journal_records += 1
+        if self._journal_records > 2 * len(self.timers) + 100:
+            self._compact()
     
-    def is_available(self) -> bool:
-        """Check if any AI service is available"""
-        return bool(self.openai_client or self.gemini_model)
+    def start(self):
+        """Start the scheduler thread"""
+        with self.cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='jarvis-timers', daemon=True)
+                self._thread.start()
     
-    def get_status(self) -> str:
-        """Get status of AI integrations"""
-        status = []
-        if self.openai_client:
-            status.append("OpenAI: Ready")
-        else:
-            status.append("OpenAI: Not configured")
-        
-        if self.gemini_model:
-            status.append("Gemini: Ready")
-        else:
-            status.append("Gemini: Not configured")
-        
-        return " | ".join(status)
+    def add(self, seconds: float, label: str, kind: str = 'timer') -> Dict[str, Any]:
+        """Schedule a timer or reminder seconds from now"""
+        now = time.time()
+        timer = {'id': uuid.uuid4().hex[:12], 'kind': kind, 'label': label,
+                 'due': now + seconds, 'duration': seconds, 'created': now}
+        with self.cond:
+            self.timers[timer['id']] = timer
+            heapq.heappush(self.heap, (timer['due'], timer['id']))
+            self._append({'op': 'add', 'timer': timer})
+            self.cond.notify()
+        return timer
+    
+    def cancel(self, timer_id: str) -> bool:
+        """Cancel a pending timer"""
+        with self.cond:
+            if self.timers.pop(timer_id, None) is None:
+                return False
+            self._append({'op': 'cancel', 'id': timer_id})
+            self.cond.notify()
+            return True
+    
+    def pending(self, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Pending timers, soonest first"""
+        with self.cond:
+            timers = [t for t in self.timers.values() if kind is None or t['kind'] == kind]
+        return sorted(timers, key=lambda t: t['due'])
+    
+    def _run(self):
+        while True:
+            due = []
+            with self.cond:
+                while not due:
+                    # Drop cancelled entries as they reach the top of the heap
+                    while self.heap and self.heap[0][1] not in self.timers:
+                        heapq.heappop(self.heap)
+                    now = time.time()
+                    while self.heap and self.heap[0][0] <= now:
+                        _, timer_id = heapq.heappop(self.heap)
+                        timer = self.timers.pop(timer_id, None)
+                        if timer:
+                            self._append({'op': 'fired', 'id': timer_id})
+                            due.append(timer)
+                    if not due:
+                        timeout = min(self.heap[0][0] - now, self.MAX_WAIT) if self.heap else self.MAX_WAIT
+                        self.cond.wait(timeout)
+            for timer in due:
+                try:
+                    if self.on_due:
+                        self.on_due(timer, time.time() - timer['due'])
+                except Exception as e:
+                    logging.error(f"Timer callback error: {e}")
+
+
+class SessionRecorder:
+    """Captures voice sessions into a zip archive for later replay
+
+    Raw audio clips are stored as WAV members; transcripts, routing decisions,
+    provider replies and timings go to JSON Lines members written in chunks,
+    so a crash loses at most the last few events.
+    """
+    
+    FLUSH_EVERY = 50
+    
+    def __init__(self, directory: Optional[Path] = None):
+        directory = Path(directory) if directory else get_data_dir() / 'recordings'
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / f"session-{datetime.datetime.now():%Y%m%d-%H%M%S}.zip"
+        self.archive = zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_DEFLATED)
+        self.start = time.monotonic()
+        self.events = []
+        self.seq = 0
+        self.clips = 0
+        self.chunks = 0
+        self.lock = threading.Lock()
+        atexit.register(self.close)
+        logging.info(f"Recording voice sessions to {self.path}")
+    
+    def record(self, kind: str, **fields) -> int:
+        """Add an event; returns its sequence number"""
+        with self.lock:
+            if self.archive is None:
+                return -1
+            self.seq += 1
+            self.events.append(dict(fields, seq=self.seq, t=round(time.monotonic() - self.start, 3), type=kind))
+            if len(self.events) >= self.FLUSH_EVERY:
+                self._flush()
+            return self.seq
+    
+    def add_audio(self, audio, stage: str) -> str:
+        """Store a captured clip as WAV; returns its name in the archive"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(audio.sample_width)
+            wav.setframerate(audio.sample_rate)
+            wav.writeframes(audio.frame_data)
+        with self.lock:
+            if self.archive is None:
+                return ''
+            self.clips += 1
+            name = f"audio/{self.clips:05d}-{stage}.wav"
+            self.archive.writestr(name, buffer.getvalue())
+        return name
+    
+    def _flush(self):
+        if self.events:
+            self.chunks += 1
+            self.archive.writestr(f"events/{self.chunks:05d}.jsonl",
+                                  "".join(json.dumps(event) + "\n" for event in self.events))
+            self.events = []
+    
+    def close(self):
+        """Write remaining events and close the archive"""
+        with self.lock:
+            if self.archive is None:
+                return
+            self._flush()
+            self.archive.close()
+            self.archive = None
+
 
 class JarvisEnhanced:
     """Enhanced JARVIS AI Desktop Assistant - FIXED VERSION"""
     
-    def __init__(self):
+    def __init__(self, headless: bool = False):
         self.is_listening = False
         self.is_muted = False
         self.wake_word = "jarvis"
         self.safety_manager = SafetyManager()
         
+        # Headless mode (batch runs, servers) has no microphone or voice output
+        self.headless = headless
+        
         # Initialize speech components
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
-        self.tts_engine = pyttsx3.init()
+        self.microphone = None if headless else sr.Microphone()
+        self.tts_engine = None if headless else pyttsx3.init()
+        
+        # Browser, program launches and volume changes go through here so they can be switched off
+        self.host_actions = HostActions()
+        
+        # Trims and downsamples audio before it is sent for recognition
+        self.audio_preprocessor = AudioPreprocessor()
+        
+        # One TTS thread speaks queued utterances so they can be interrupted (barge-in)
+        self._tts_queue = queue.Queue()
+        self._tts_active = threading.Event()
+        self._tts_current = ""
+        self._recently_spoken = deque(maxlen=5)
+        if self.tts_engine:
+            threading.Thread(target=self._tts_loop, name='jarvis-tts', daemon=True).start()
 
         # FIX 2: Add microphone lock for threading safety
         self.microphone_lock = threading.Lock()
@@ -196,6 +2633,63 @@ class JarvisEnhanced:
         self.command_history = []
         self.user_preferences = {}
         
+        # Central scheduler for deferred answers and background maintenance
+        self.scheduler = TaskScheduler(workers={'interactive': self.config.get('scheduler_interactive_workers', 4),
+                                                'background': self.config.get('scheduler_background_workers', 2)},
+                                       cpu_limit=self.config.get('scheduler_cpu_limit', 80.0),
+                                       io_limit_mb=self.config.get('scheduler_io_limit_mb', 50.0))
+        self._pending_deferred = {}
+        self._compound_local = threading.local()
+        self._route_local = threading.local()
+        self.recorder = None
+        
+        # Timers and reminders; loaded at startup so ones due while we were off still fire
+        self.timers = None
+        self._timers_lock = threading.Lock()
+        if not headless and (get_data_dir() / 'timers.jsonl').exists():
+            self.get_timers()
+        
+        # Backs the wake-word listener off while nobody is talking
+        self.duty_cycle = ListenerDutyCycle(enabled=self.config.get('duty_cycle', True),
+                                            idle_after=self.config.get('duty_cycle_idle_after', 60),
+                                            deep_after=self.config.get('duty_cycle_deep_after', 600),
+                                            quiet_hours=self.config.get('duty_cycle_quiet_hours'),
+                                            probe_seconds=self.config.get('duty_cycle_probe_seconds', 0.25),
+                                            deep_interval=self.config.get('duty_cycle_deep_interval', 1.0))
+        
+        # Prime CPU sampling so system status doesn't have to block for a second
+        psutil.cpu_percent(interval=None)
+        
+        # Created on first use
+        self.screenshot_pipeline = None
+        self.duplicate_finder = None
+        self.disk_usage = None
+        self.intent_classifier = None
+        self.text_extractor = None
+        
+        # Directory listing cache and "show more" continuation state
+        self._listing_cache = {}
+        self._listing_state = None
+        
+        # Restore calibration, preferences and provider health from the last run
+        self.calibrated = False
+        self.snapshot = WarmStartSnapshot()
+        self._warm_state = self.snapshot.load()
+        self.restore_snapshot()
+        if not headless:
+            # Only the interactive assistant owns the snapshot; batch, gateway and benchmark
+            # runs would overwrite it with their own (possibly stubbed) state
+            atexit.register(self.save_snapshot)
+            self.scheduler.schedule_every(max(self.config.get('snapshot_interval', 300), 10), self.save_snapshot,
+                                          name='snapshot')
+        
+        # Resource diagnostics; periodic reports catch slow leaks in long sessions
+        self.monitor = ResourceMonitor(interval=self.config.get('diagnostics_interval', 600),
+                                       tracemalloc_frames=self.config.get('diagnostics_tracemalloc_frames', 0))
+        self._log_lines = 0  # GUI log length, maintained on the Tk thread
+        self.register_diagnostics()
+        self.monitor.start(self.scheduler)
+        
         # GUI components
         self.root = None
         self.status_var = None
@@ -204,6 +2698,138 @@ class JarvisEnhanced:
         logging.info("JARVIS Enhanced initialized successfully")
         self.speak("JARVIS Enhanced AI Assistant is online and ready for voice commands")
     
+    def register_diagnostics(self):
+        """Expose queue depths and cache sizes to the resource monitor"""
+        probes = {
+            'command_history': lambda: len(self.command_history),
+            'tts_queue': self._tts_queue.qsize,
+            'pending_deferred': lambda: len(self._pending_deferred),
+            'interactive_queue': lambda: self.scheduler.queue_depths()['interactive'],
+            'background_queue': lambda: self.scheduler.queue_depths()['background'],
+            'background_yields': lambda: self.scheduler.stats['yields'],
+            'listing_cache': lambda: len(self._listing_cache),
+            'file_access_counts': lambda: len(self.user_preferences.get('file_access_counts', {})),
+            'duplicate_hash_cache': lambda: len(self.duplicate_finder.cache or {}) if self.duplicate_finder else 0,
+            'disk_usage_cache': lambda: len(self.disk_usage.cache or {}) if self.disk_usage else 0,
+            'pending_timers': lambda: len(self.timers.timers) if self.timers else 0,
+            'listener_mode': lambda: self.duty_cycle.current,
+            'listener_cpu_percent': lambda: {mode: entry['cpu_percent']
+                                             for mode, entry in self.duty_cycle.report()['modes'].items()},
+            'screenshot_queue': lambda: self.screenshot_pipeline.pending() if self.screenshot_pipeline else 0,
+            'gui_log_lines': lambda: self._log_lines,  # Kept on the Tk thread; probes must not call into Tk
+        }
+        for name, probe in probes.items():
+            self.monitor.register(name, probe)
+
+    def get_diagnostics(self) -> str:
+        """Report memory, threads, queue depths and cache sizes"""
+        try:
+            report = self.monitor.sample()
+            logging.info(f"Diagnostics: {json.dumps(report)}")
+            return ResourceMonitor.describe(report)
+        except Exception as e:
+            return f"Error collecting diagnostics: {str(e)}"
+
+    def record_history(self, entry: Dict[str, Any]):
+        """Append to the command history, keeping only the most recent entries"""
+        self.command_history.append(entry)
+        limit = self.config.get('max_command_history', 1000)
+        if len(self.command_history) > limit:
+            del self.command_history[:-limit]
+
+    def append_log(self, text: str):
+        """Add a line to the GUI log from any thread
+
+        speak() calls this from scheduler, timer and listener threads, so the
+        widget update is handed to the Tk main loop.
+        """
+        if not self.log_text:
+            return
+        if self.root:
+            self.root.after(0, self._append_log_now, text)
+        else:
+            self._append_log_now(text)
+
+    def _append_log_now(self, text: str):
+        """Insert into the GUI log on the Tk thread, dropping the oldest lines beyond the limit"""
+        if not self.log_text:
+            return
+        self.log_text.insert(tk.END, text)
+        lines = int(self.log_text.index('end-1c').split('.')[0])
+        excess = lines - self.config.get('gui_log_lines', 1000)
+        if excess > 0:
+            self.log_text.delete('1.0', f'{excess + 1}.0')
+            lines -= excess
+        self._log_lines = lines
+        self.log_text.see(tk.END)
+
+    def restore_snapshot(self):
+        """Apply the warm-start snapshot; slow rebuilds happen in the background"""
+        state = self._warm_state
+        if not state:
+            return
+        preferences = state.get('user_preferences')
+        if isinstance(preferences, dict):
+            self.user_preferences.update(preferences)
+        if state.get('provider_stats'):
+            self.ai.stats.merge(state['provider_stats'])
+        
+        # A stale calibration is worse than a fresh one, so only trust recent values
+        try:
+            saved = datetime.datetime.fromisoformat(state.get('saved', ''))
+            max_age = datetime.timedelta(days=self.config.get('snapshot_max_age_days', 7))
+            if state.get('energy_threshold') and datetime.datetime.now() - saved < max_age:
+                self.recognizer.energy_threshold = state['energy_threshold']
+                self.calibrated = True
+        except ValueError:
+            pass
+        
+        components = state.get('components', [])
+        if components:
+            self.scheduler.submit(self._prewarm_components, components, priority='background')
+        logging.info(f"Warm start from snapshot saved {state.get('saved')}")
+
+    def _prewarm_components(self, components: List[str]):
+        """Rebuild components that were in use last session before they are first needed"""
+        builders = {
+            'intent_classifier': lambda: self.intent_classifier or IntentClassifier(),
+            'text_extractor': lambda: self.text_extractor or TextExtractor(
+                max_cache_mb=self.config.get('text_cache_mb', 200)),
+        }
+        for name in components:
+            if name in builders:
+                self.scheduler.checkpoint()
+                try:
+                    setattr(self, name, builders[name]())
+                except Exception as e:
+                    logging.error(f"Prewarm error ({name}): {e}")
+
+    def snapshot_state(self) -> Dict[str, Any]:
+        """Collect the state worth keeping across restarts"""
+        preferences = dict(self.user_preferences)
+        counts = preferences.get('file_access_counts')
+        if counts and len(counts) > 500:
+            preferences['file_access_counts'] = dict(heapq.nlargest(500, counts.items(), key=lambda item: item[1]))
+        with self.ai.stats.lock:
+            provider_stats = {name: dict(entry) for name, entry in self.ai.stats.providers.items()}
+        return {
+            'energy_threshold': self.recognizer.energy_threshold if self.calibrated else None,
+            'user_preferences': preferences,
+            'provider_stats': provider_stats,
+            'components': [name for name in ('intent_classifier', 'text_extractor') if getattr(self, name)],
+            'caches': {
+                'duplicate_hashes': len(self.duplicate_finder.cache or {}) if self.duplicate_finder else None,
+                'text_cache_dir': str(self.text_extractor.cache_dir) if self.text_extractor else None,
+            }
+        }
+
+    def save_snapshot(self):
+        """Write the warm-start snapshot"""
+        try:
+            self.snapshot.save(self.snapshot_state())
+        except Exception as e:
+            logging.error(f"Error saving snapshot: {e}")
+
     def load_api_keys(self):
         """Load and validate API keys - FIXED VERSION"""
         # Load from environment variables first (recommended)
@@ -217,7 +2843,22 @@ class JarvisEnhanced:
             gemini_key = self.config.get('gemini_api_key', '').strip()
         
         # Initialize AI integration
-        self.ai = AIIntegration(openai_key, gemini_key)
+        # Keep learned provider statistics when the keys are reloaded
+        previous = getattr(self, 'ai', None)
+        openai_base_url = os.getenv('OPENAI_BASE_URL', '') or self.config.get('openai_base_url', '')
+        gemini_base_url = os.getenv('GEMINI_BASE_URL', '') or self.config.get('gemini_base_url', '')
+        exploration = self.config.get('provider_exploration', 0.05)
+        if previous and (previous.openai_key, previous.gemini_key, previous.openai_base_url, previous.gemini_base_url) == \
+                (openai_key, gemini_key, openai_base_url, gemini_base_url):
+            # Unchanged settings: keep the existing SDK clients and their connection pools
+            previous.exploration = exploration
+            return
+        self.ai = AIIntegration(openai_key, gemini_key,
+                                stats=previous.stats if previous else None,
+                                exploration=exploration,
+                                openai_base_url=openai_base_url,
+                                gemini_base_url=gemini_base_url)
+        self.ai.recorder = previous.recorder if previous else None
         
         # Log status
         if openai_key:
@@ -232,6 +2873,66 @@ class JarvisEnhanced:
         
         logging.info(f"AI Integration Status: {self.ai.get_status()}")
 
+    @contextlib.contextmanager
+    def dry_run(self) -> Iterator[DryRunHostActions]:
+        """Run commands without touching the host; yields the recorder of skipped actions
+
+        Only this instance (and sessions spawned inside the block) is affected.
+        Screenshots go to a synthetic capture in a temporary folder.
+        """
+        previous_actions, previous_pipeline = self.host_actions, self.screenshot_pipeline
+        self.host_actions = DryRunHostActions()
+        output_dir = tempfile.mkdtemp(prefix='jarvis-dry-run-')
+        try:
+            self.screenshot_pipeline = ScreenshotPipeline(SyntheticCaptureBackend(640, 360), output_dir)
+        except Exception as e:
+            logging.warning(f"Screenshots unavailable during dry run: {e}")
+        try:
+            yield self.host_actions
+        finally:
+            if self.screenshot_pipeline is not previous_pipeline:
+                self.screenshot_pipeline.flush()
+            self.host_actions, self.screenshot_pipeline = previous_actions, previous_pipeline
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+    # Handlers process_command and route_locally dispatch to
+    COMMAND_HANDLERS = ('go_to_sleep', 'handle_timers', 'cancel_pending', 'handle_file_operations',
+                        'find_duplicate_files', 'analyze_disk_usage', 'search_files', 'list_files_next_page',
+                        'list_files', 'web_search', 'open_website', 'open_application', 'close_application',
+                        'get_system_status', 'get_time', 'get_date', 'get_diagnostics', 'handle_complex_query',
+                        'take_screenshot', 'control_volume', 'change_voice_settings', 'toggle_mute',
+                        'get_help', 'get_command_history')
+
+    def restrict_handlers(self, allowed: frozenset):
+        """Refuse every command handler not in allowed, for this instance only"""
+        for name in self.COMMAND_HANDLERS:
+            if name not in allowed:
+                setattr(self, name, lambda *args, **kwargs: "Sorry, that command isn't available in this session.")
+
+    def spawn_session(self) -> 'JarvisEnhanced':
+        """Create a headless assistant with its own history and preferences
+
+        Provider clients, statistics, caches and indexes stay shared with this
+        instance, so many sessions cost little more than one.
+        """
+        session = copy.copy(self)
+        session.headless = True
+        session.microphone = None
+        session.tts_engine = None
+        session.is_muted = False
+        session.is_listening = False
+        session.config = dict(self.config)
+        session.command_history = []
+        session.user_preferences = {}
+        session._listing_state = None
+        session._pending_deferred = {}
+        session.get_timers = self.get_timers  # One engine and journal, announced by this instance
+        session.root = None
+        session.status_var = None
+        session.log_text = None
+        session._log_lines = 0
+        return session
+
     def load_config(self) -> Dict[str, Any]:
         """Load configuration from file"""
         config_file = Path.home() / '.jarvis_enhanced_config.json'
@@ -241,10 +2942,65 @@ class JarvisEnhanced:
             'voice_id': 0,
             'openai_api_key': '',
             'gemini_api_key': '',
+            'openai_base_url': '',
+            'gemini_base_url': '',
             'weather_api_key': '',
             'safe_mode': True,
             'auto_save_history': True,
             'max_search_results': 5,
+            'audio_preprocessing': True,
+            'record_sessions': False,
+            'duty_cycle': True,
+            'duty_cycle_idle_after': 60,
+            'duty_cycle_deep_after': 600,
+            'duty_cycle_quiet_hours': [23, 7],
+            'duty_cycle_probe_seconds': 0.25,
+            'duty_cycle_deep_interval': 1.0,
+            'snapshot_interval': 300,
+            'diagnostics_interval': 600,
+            'scheduler_interactive_workers': 4,
+            'scheduler_background_workers': 2,
+            'scheduler_cpu_limit': 80.0,
+            'scheduler_io_limit_mb': 50.0,
+            'diagnostics_tracemalloc_frames': 0,
+            'max_command_history': 1000,
+            'gui_log_lines': 1000,
+            'snapshot_max_age_days': 7,
+            'barge_in': True,
+            'barge_in_energy_factor': 1.5,
+            'barge_in_echo_margin': 2.0,
+            'barge_in_frames': 2,
+            'echo_window': 3.0,
+            'echo_min_chars': 12,
+            'echo_similarity': 0.9,
+            'supersede_similarity': 0.8,
+            'gateway_workers': 4,
+            'gateway_session_concurrency': 2,
+            'gateway_max_queue': 32,
+            'gateway_session_ttl': 3600,
+            'provider_exploration': 0.05,
+            'probe_requests': 5,
+            'local_intent_threshold': 0.55,
+            'local_intent_margin': 0.1,
+            'screenshot_format': 'png',
+            'screenshot_png_level': 1,
+            'screenshot_quality': 85,
+            'summary_max_chars': 12000,
+            'text_cache_mb': 200,
+            'screenshot_region': None,
+            'screenshot_monitor': None,
+            'screenshot_skip_duplicates': True,
+            'batch_workers': 4,
+            'list_page_size': 20,
+            'listing_cache_ttl': 30,
+            'listing_cache_size': 8,
+            'disk_usage_ttl': 300,
+            'disk_usage_workers': 8,
+            'file_search_time_budget': 2.0,
+            'file_search_workers': 4,
+            'file_rank_candidates': 200,
+            'file_match_min_score': 0.35,
+            'file_match_confident_score': 0.75,
             'default_browser': 'default'
         }
         
@@ -277,6 +3033,8 @@ class JarvisEnhanced:
 
     def setup_tts(self):
         """Configure text-to-speech engine"""
+        if not self.tts_engine:
+            return
         try:
             voices = self.tts_engine.getProperty('voices')
             if voices and len(voices) > self.config.get('voice_id', 0):
@@ -289,45 +3047,208 @@ class JarvisEnhanced:
 
     def speak(self, text: str):
         """Convert text to speech with error handling"""
+        if self.headless:
+            if text:
+                logging.info(f"JARVIS: {text}")
+            return
         if not self.is_muted and text:
             try:
                 print(f"JARVIS: {text}")
                 if self.log_text:
-                    self.log_text.insert(tk.END, f"JARVIS: {text}\n")
-                    self.log_text.see(tk.END)
+                    self.append_log(f"JARVIS: {text}\n")
                 
-                # Run TTS in separate thread to prevent blocking
-                def speak_async():
-                    try:
-                        self.tts_engine.say(text)
-                        self.tts_engine.runAndWait()
-                    except Exception as e:
-                        logging.error(f"TTS error: {e}")
-                
-                threading.Thread(target=speak_async, daemon=True).start()
+                # Spoken by the TTS thread so the caller never blocks
+                self._tts_queue.put(text)
             except Exception as e:
                 logging.error(f"Speak error: {e}")
 
-    def listen_for_wake_word(self):
+    def start_recording(self, directory: Optional[str] = None) -> 'SessionRecorder':
+        """Record voice sessions for replay"""
+        self.recorder = SessionRecorder(directory)
+        self.ai.recorder = self.recorder
+        return self.recorder
+
+    def recognize(self, audio, stage: str = "command") -> str:
+        """Preprocess and transcribe captured audio, recording clip and transcript when enabled"""
+        recorder = self.recorder
+        clip = recorder.add_audio(audio, stage) if recorder else None
+        start = time.perf_counter()
+        audio = self.prepare_audio(audio, label="wake word" if stage == "wake" else "command")
+        prepared = time.perf_counter()
+        text, error = None, None
+        try:
+            text = self.recognizer.recognize_google(audio, language='en-US')
+            return text
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            if recorder:
+                recorder.record('transcript', clip=clip, stage=stage, text=text, error=error,
+                                preprocess_ms=round((prepared - start) * 1000, 2),
+                                recognize_ms=round((time.perf_counter() - prepared) * 1000, 1))
+
+    def execute_voice_command(self, command: str) -> str:
+        """Process a spoken command, recording route, response and timing when enabled"""
+        self.duty_cycle.activity()
+        self._route_local.route = 'keyword'
+        start = time.perf_counter()
+        response = self.process_command(command)
+        elapsed = time.perf_counter() - start
+        recorder = self.recorder
+        if recorder:
+            seq = recorder.record('command', command=command, response=str(response),
+                                  route=self._route_local.route, process_ms=round(elapsed * 1000, 2),
+                                  deferred=isinstance(response, DeferredResponse))
+            if isinstance(response, DeferredResponse):
+                def on_done(future: Future):
+                    answer = None if future.cancelled() or future.exception() else future.result()
+                    recorder.record('answer', command_seq=seq, answer=answer,
+                                    total_ms=round((time.perf_counter() - start) * 1000, 1))
+                response.future.add_done_callback(on_done)
+        return response
+
+    def prepare_audio(self, audio, label: str = "command"):
+        """Apply upload preprocessing to captured audio when enabled"""
+        if not self.config.get('audio_preprocessing', True):
+            return audio
+        try:
+            processed, saved = self.audio_preprocessor.process(audio, min_energy=self.recognizer.energy_threshold * 0.5)
+            if saved:
+                log = logging.debug if label == "wake word" else logging.info
+                log(f"Audio preprocessing ({label}): {len(audio.frame_data)} -> "
+                    f"{len(processed.frame_data)} bytes, saved {saved}")
+            return processed
+        except Exception as e:
+            logging.error(f"Audio preprocessing error: {e}")
+            return audio
+
+    def _tts_loop(self):
+        """Speak queued utterances one at a time"""
+        while True:
+            text = self._tts_queue.get()
+            self._tts_current = text
+            self._tts_active.set()
+            try:
+                self.tts_engine.say(text)
+                self.tts_engine.runAndWait()
+            except Exception as e:
+                logging.error(f"TTS error: {e}")
+            finally:
+                self._recently_spoken.append((text.lower(), time.monotonic()))
+                self._tts_active.clear()
+
+    def is_speaking(self) -> bool:
+        """Whether speech is playing or waiting to be played"""
+        return self._tts_active.is_set() or not self._tts_queue.empty()
+
+    def stop_speaking(self):
+        """Cut off the current utterance and drop anything queued behind it"""
+        while True:
+            try:
+                self._tts_queue.get_nowait()
+            except queue.Empty:
+                break
+        if self.tts_engine:
+            try:
+                self.tts_engine.stop()
+            except Exception as e:
+                logging.error(f"TTS stop error: {e}")
+
+    def is_own_echo(self, heard: str) -> bool:
+        """Whether a transcript is just the microphone picking up our own recent speech"""
+        heard = heard.lower().strip()
+        # Short transcripts such as the wake word or "volume up" are too likely to be real
+        # commands that happen to appear in something we just said
+        if len(heard) < self.config.get('echo_min_chars', 12):
+            return False
+        window = self.config.get('echo_window', 3.0)
+        now = time.monotonic()
+        recent = [text for text, ended in self._recently_spoken if now - ended < window]
+        if self._tts_active.is_set():
+            recent.append(self._tts_current.lower())
+        for spoken in recent:
+            if difflib.SequenceMatcher(None, heard, spoken).ratio() >= self.config.get('echo_similarity', 0.9):
+                return True
+        return False
+
+    def _wait_for_barge_in(self, source) -> bytes:
+        """Watch the microphone while we speak and interrupt when the user talks over us
+
+        The first ~300 ms of playback measures how loud our own voice is in
+        the microphone, so echo does not count as the user speaking. Returns
+        the audio that triggered the interruption, or b'' if the speech
+        finished uninterrupted.
+        """
+        factor = self.config.get('barge_in_energy_factor', 1.5)
+        echo_margin = self.config.get('barge_in_echo_margin', 2.0)
+        frames_needed = self.config.get('barge_in_frames', 2)
+        calibration_frames = max(1, int(0.3 * source.SAMPLE_RATE / source.CHUNK))
+        
+        echo_level = 0.0
+        frames = 0
+        triggered = []
+        while self.is_speaking():
+            buffer = source.stream.read(source.CHUNK)
+            energy = audio_rms(buffer, source.SAMPLE_WIDTH)
+            frames += 1
+            if frames <= calibration_frames:
+                echo_level = max(echo_level, energy)
+                continue
+            
+            threshold = max(self.recognizer.energy_threshold * factor, echo_level * echo_margin)
+            if energy > threshold:
+                triggered.append(buffer)
+                if len(triggered) >= frames_needed:
+                    self.stop_speaking()
+                    logging.info(f"Barge-in: user spoke over TTS (energy {energy:.0f} > {threshold:.0f})")
+                    return b''.join(triggered)
+            else:
+                triggered = []
+                # Follow our own voice's level slowly as the utterance gets louder or softer
+                echo_level = max(energy, echo_level * 0.98)
+        return b''
+
+    def listen_for_wake_word(self, stop: Optional[threading.Event] = None):
         """Continuously listen for wake word - FIXED VERSION"""
         try:
             # FIX 4: Better microphone initialization
-            with self.microphone as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=1)
+            if self.calibrated:
+                # Start from the saved threshold and refine it with a short sample instead of a full second
+                saved = self.recognizer.energy_threshold
+                with self.microphone as source:
+                    self.recognizer.adjust_for_ambient_noise(source, duration=0.25)
+                logging.info(f"Refined saved microphone calibration ({saved:.0f} -> "
+                             f"{self.recognizer.energy_threshold:.0f})")
+            else:
+                with self.microphone as source:
+                    self.recognizer.adjust_for_ambient_noise(source, duration=1)
+                self.calibrated = True
                 logging.info("Microphone calibrated for wake word detection")
             
-            while True:
+            duty = self.duty_cycle
+            while not (stop and stop.is_set()):
+                mode = duty.mode()
                 try:
-                    with self.microphone_lock:
-                        if self.status_var:
-                            self.status_var.set("Listening for wake word...")
-                        
-                        with self.microphone as source:
-                            audio = self.recognizer.listen(source, timeout=1, phrase_time_limit=3)
+                    if mode == 'active':
+                        with self.microphone_lock:
+                            if self.status_var:
+                                self.status_var.set("Listening for wake word...")
+                            
+                            with self.microphone as source:
+                                audio = self.recognizer.listen(source, timeout=1, phrase_time_limit=3)
+                    else:
+                        audio = self._gated_listen(mode)
+                        if audio is None:
+                            continue
                     
-                    command = self.recognizer.recognize_google(audio, language='en-US').lower()
+                    with self.scheduler.interactive():
+                        duty.sent(mode)
+                        command = self.recognize(audio, "wake").lower()
+                    heard = self.wake_word in command
+                    duty.recognized(command, heard)
                     
-                    if self.wake_word in command:
+                    if heard:
                         self.speak("Yes, I'm listening. How can I help you?")
                         if self.status_var:
                             self.status_var.set("Processing commands...")
@@ -344,25 +3265,85 @@ class JarvisEnhanced:
                     if "context manager" not in str(e):  # FIX 5: Reduce log spam for known issue
                         logging.error(f"Wake word detection error: {e}")
                     time.sleep(0.5)
+                finally:
+                    duty.account(mode)
                     
         except Exception as e:
             logging.error(f"Wake word listener setup error: {e}")
 
+    def _gated_listen(self, mode: str):
+        """Energy-only wake detection for idle modes
+
+        Reads the microphone in blocks of trigger_frames chunks and only hands
+        audio to the recognizer when every chunk in a block is voiced; the
+        audio leading up to the trigger is kept so the start of the phrase is
+        not lost. Energies come from a decimated block in one vectorized
+        pass and the noise-floor threshold is computed once per cycle, so
+        the gate costs less than speech_recognition's per-chunk listen loop.
+        In idle mode the gate runs for about a second per cycle; in deep
+        idle and sleep it probes briefly and then releases the microphone.
+        Returns the phrase audio, or None if nothing was heard.
+        """
+        duty = self.duty_cycle
+        threshold = duty.threshold(self.recognizer.energy_threshold)
+        with self.microphone_lock:
+            if self.status_var:
+                self.status_var.set("Sleeping..." if mode == 'sleep' else "Idle - listening for voice...")
+            
+            with self.microphone as source:
+                block_size = source.CHUNK * duty.trigger_frames
+                seconds = 1.0 if mode == 'idle' else duty.probe_seconds
+                blocks = max(1, int(seconds * source.SAMPLE_RATE / block_size))
+                pre_roll = deque(maxlen=max(1, int(0.5 * source.SAMPLE_RATE / block_size)))
+                for _ in range(blocks):
+                    buffer = source.stream.read(block_size)
+                    energies = audio_block_rms(buffer, source.SAMPLE_WIDTH, parts=duty.trigger_frames)
+                    if min(energies) <= threshold:
+                        pre_roll.append(buffer)
+                        duty.observe(min(energies))
+                        continue
+                    
+                    duty.triggered(mode)
+                    captured = b''.join(pre_roll) + buffer
+                    try:
+                        rest = self.recognizer.listen(source, timeout=1, phrase_time_limit=3)
+                        captured += rest.frame_data
+                    except sr.WaitTimeoutError:
+                        pass  # The phrase was short and already ended
+                    return sr.AudioData(captured, source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        
+        if mode != 'idle':
+            duty.pause(mode)
+        return None
+
+    def go_to_sleep(self) -> str:
+        """Stop full listening until the wake word is heard"""
+        self.duty_cycle.sleep()
+        return f"Going to sleep. Say '{self.wake_word.title()}' when you need me."
+
     def listen_for_command(self, timeout: int = 5) -> Optional[str]:
         """Listen for a single command"""
         try:
             with self.microphone_lock:
                 with self.microphone as source:
+                    interruption = b''
+                    if self.config.get('barge_in', True) and self.is_speaking():
+                        interruption = self._wait_for_barge_in(source)
                     if self.status_var:
                         self.status_var.set("Listening for command...")
                     audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=8)
+                    if interruption:
+                        # Keep the start of what the user said while we were talking
+                        audio = sr.AudioData(interruption + audio.frame_data, audio.sample_rate, audio.sample_width)
             
-            command = self.recognizer.recognize_google(audio, language='en-US')
+            command = self.recognize(audio)
+            if self.is_own_echo(command):
+                logging.info(f"Ignored echo of our own speech: {command}")
+                return None
             print(f"You said: {command}")
             
             if self.log_text:
-                self.log_text.insert(tk.END, f"You: {command}\n")
-                self.log_text.see(tk.END)
+                self.append_log(f"You: {command}\n")
             
             return command.lower()
             
@@ -377,40 +3358,409 @@ class JarvisEnhanced:
             self.speak("I didn't hear anything. Say 'Jarvis' to wake me up.")
             return None
 
+    # Whole utterances that idle the wake-word listener; checked before EXIT_PHRASES
+    SLEEP_PHRASES = frozenset({'go to sleep', 'sleep', 'sleep mode', 'stop listening', 'stop listening for now'})
+    # Whole utterances that end a voice session; "stop the timer" is a command
+    EXIT_PHRASES = frozenset({'stop', 'exit', 'quit', 'goodbye', 'good bye', 'bye', 'bye bye',
+                              "that's all", 'that is all', 'thanks jarvis', 'thank you jarvis'})
+
     def process_command_session(self):
         """Process multiple commands in a session"""
         session_active = True
         while session_active:
             command = self.listen_for_command()
             if command:
+                if command.strip(' .!') in self.SLEEP_PHRASES:
+                    self.speak(self.go_to_sleep())
+                    session_active = False
+                    continue
+                
                 # Check for exit commands
-                if any(word in command for word in ['stop', 'exit', 'quit', 'goodbye', 'bye']):
+                if command.strip(' .!') in self.EXIT_PHRASES:
                     self.speak("Goodbye! Say 'Jarvis' to wake me up again.")
                     session_active = False
                     continue
                 
-                # Process the command
-                response = self.process_command(command)
-                if response:
-                    self.speak(response)
-                
-                # Save command to history
-                self.command_history.append({
-                    'timestamp': datetime.datetime.now().isoformat(),
-                    'command': command,
-                    'response': response
-                })
+                # Process the command; deferred answers are spoken when ready
+                # while we go back to listening. Background jobs pause only
+                # while a command is actually being handled.
+                with self.scheduler.interactive():
+                    response = self.execute_voice_command(command)
+                    self.deliver_response(command, response)
+                if self.duty_cycle.asleep:
+                    session_active = False
+
+    def deliver_response(self, command: str, response: str, record: bool = True):
+        """Speak a response and, for deferred ones, its answer once it arrives"""
+        if response:
+            self.speak(response)
+        
+        entry = {
+            'timestamp': datetime.datetime.now().isoformat(),
+            'command': command,
+            'response': str(response) if response is not None else response
+        }
+        if record:
+            # Save command to history
+            self.record_history(entry)
+        
+        if isinstance(response, DeferredResponse):
+            def on_done(future: Future):
+                if response.superseded or future.cancelled():
+                    return
+                try:
+                    answer = future.result()
+                except Exception as e:
+                    logging.error(f"Deferred response error for '{command}': {e}")
+                    answer = f"Sorry, that failed: {str(e)}"
+                if answer:
+                    entry['response'] = f"{entry['response']} {answer}"
+                    self.speak(answer)
+            response.future.add_done_callback(on_done)
+
+    def defer(self, acknowledgement: str, work: Callable[[], Optional[str]], kind: str,
+              priority: str = 'interactive', request: Optional[str] = None) -> DeferredResponse:
+        """Run slow work in the background, superseding unfinished work of the same kind
+
+        When `request` is given, only a request that repeats or refines the
+        pending one supersedes it; a different question is answered as well.
+        Disk-heavy work such as scans, hashing and extraction uses the
+        'background' priority and calls scheduler.checkpoint() as it goes.
+        """
+        response = DeferredResponse(acknowledgement, self.scheduler.submit(work, priority=priority), kind, request)
+        if getattr(self._compound_local, 'active', False):
+            # Parts of one compound utterance don't supersede each other
+            key = f"{kind}:{id(response)}"
+            self._pending_deferred[key] = response
+            response.future.add_done_callback(lambda _: self._pending_deferred.pop(key, None))
+            return response
+        previous = self._pending_deferred.get(kind)
+        if previous is not None and not previous.future.done():
+            if request is None or previous.request is None or self.refines_request(previous.request, request):
+                previous.cancel()
+                logging.info(f"Superseded pending {kind} request")
+            else:
+                # A different question; keep the earlier answer coming
+                key = f"{kind}:{id(previous)}"
+                self._pending_deferred[key] = previous
+                previous.future.add_done_callback(lambda _: self._pending_deferred.pop(key, None))
+        self._pending_deferred[kind] = response
+        return response
+
+    def refines_request(self, previous: str, current: str) -> bool:
+        """Whether a new request repeats or refines a pending one"""
+        previous, current = previous.lower().strip(), current.lower().strip()
+        if previous in current or current in previous:
+            return True
+        return difflib.SequenceMatcher(None, previous, current).ratio() >= self.config.get('supersede_similarity', 0.8)
+
+    def cancel_pending(self) -> str:
+        """Cancel every deferred answer that hasn't been spoken yet"""
+        pending = [r for r in self._pending_deferred.values() if not r.future.done()]
+        for response in pending:
+            response.cancel()
+        self._pending_deferred.clear()
+        return "Okay, cancelled." if pending else "There's nothing to cancel."
+
+    @staticmethod
+    def resolve_response(response: str, timeout: Optional[float] = None) -> str:
+        """Wait for a deferred response and combine it into one string"""
+        if isinstance(response, DeferredResponse):
+            answer = response.result(timeout)
+            return f"{response} {answer}" if answer else str(response)
+        return response
+
+    # Words a sub-command of a compound utterance can start with; only the
+    # action verbs split on a bare "and"
+    ACTION_STARTS = ('open', 'close', 'launch', 'start', 'take', 'capture', 'grab', 'show', 'list', 'find',
+                     'search', 'read', 'summarize', 'summarise', 'look', 'google', 'go', 'visit', 'volume',
+                     'turn', 'mute', 'unmute', 'check', 'increase', 'decrease', 'lower', 'raise', 'set',
+                     'cancel')
+    COMMAND_STARTS = ACTION_STARTS + ('tell', 'what', "what's", 'whats', 'how', "how's", 'who', 'when', 'where',
+                                      'why', 'explain', 'give', 'describe', 'system', 'ai', 'help')
+    SEQUENCE_SEPARATOR = re.compile(r'\s*,?\s*\b(?:and then|and after that|after that|afterwards|then)\b\s*')
+    PARALLEL_SEPARATOR = re.compile(r'\s*(?:[,;]\s*(?:and\s+|also\s+)?|\band also\b|\band\b|\bplus\b)\s*')
+
+    def split_compound(self, command: str) -> List[List[str]]:
+        """Split an utterance into stages of sub-commands
+
+        "then"-style words start a new stage that runs after the previous one;
+        "and" separates sub-commands that may run at the same time. A piece
+        that doesn't start like a command stays part of the previous one, so
+        "search for salt and pepper" is not split, and a bare "and" only
+        splits before an action verb, so "explain recursion and how it
+        works" stays one question.
+        """
+        if command.startswith(('remind me', 'please remind me')):
+            return [[command]]  # "remind me to open the report and send it" is one reminder
+        
+        def looks_like_command(piece: str, starts: tuple) -> bool:
+            return piece.split(' ', 1)[0] in starts
+        
+        def split(text: str, separator: re.Pattern) -> List[str]:
+            pieces = []
+            position = 0
+            for match in separator.finditer(text):
+                starts = self.ACTION_STARTS if match.group(0).strip() in ('and', 'plus') else self.COMMAND_STARTS
+                if text[position:match.start()].strip() and looks_like_command(text[match.end():], starts):
+                    pieces.append(text[position:match.start()].strip())
+                    position = match.end()
+            pieces.append(text[position:].strip())
+            return [piece for piece in pieces if piece]
+        
+        return [split(stage, self.PARALLEL_SEPARATOR) for stage in split(command, self.SEQUENCE_SEPARATOR)]
+
+    def process_compound(self, stages: List[List[str]]) -> str:
+        """Run a compound utterance, sub-commands of a stage concurrently, and merge the replies"""
+        def run_part(part: str) -> str:
+            self._compound_local.active = True
+            try:
+                return self.process_command(part)
+            finally:
+                self._compound_local.active = False
+        
+        stateful = BatchCommandRunner.STATEFUL_PHRASES
+        responses = []
+        for stage in stages:
+            # Sub-commands that touch session state run in order on this thread
+            independent = [part for part in stage if not any(phrase in part for phrase in stateful)]
+            futures = {part: self.scheduler.submit(run_part, part, priority='interactive')
+                       for part in independent} if len(independent) > 1 else {}
+            for part in stage:
+                try:
+                    responses.append(futures[part].result() if part in futures else run_part(part))
+                except Exception as e:
+                    logging.error(f"Compound command error for '{part}': {e}")
+                    responses.append(f"Sorry, {part} failed: {str(e)}")
+        self._route_local.route = 'compound'
+        return self.merge_responses(responses)
+
+    def merge_responses(self, responses: List[str]) -> str:
+        """Combine sub-command replies into one; deferred answers are combined into one future"""
+        def sentence(text: str) -> str:
+            text = str(text).strip()
+            return text if not text or text[-1] in '.!?' else f"{text}."
+        
+        # Identical acknowledgements ("One moment.") are said once
+        acknowledgement = " ".join(dict.fromkeys(sentence(r) for r in responses if r))
+        pending = [r for r in responses if isinstance(r, DeferredResponse)]
+        if not pending:
+            return acknowledgement
+        
+        combined = Future()
+        lock = threading.Lock()
+        
+        def on_child_done(_):
+            with lock:
+                if combined.done() or not all(r.future.done() for r in pending):
+                    return
+                answers = []
+                for r in pending:
+                    if r.future.cancelled() or r.superseded:
+                        continue
+                    try:
+                        answer = r.future.result()
+                    except Exception as e:
+                        answer = f"Sorry, that failed: {str(e)}"
+                    if answer:
+                        answers.append(sentence(answer))
+                try:
+                    combined.set_result(" ".join(answers) or None)
+                except InvalidStateError:
+                    pass  # Cancelled meanwhile
+        
+        combined.add_done_callback(lambda f: f.cancelled() and [r.cancel() for r in pending])
+        for r in pending:
+            r.future.add_done_callback(on_child_done)
+        response = DeferredResponse(acknowledgement, combined, 'compound')
+        key = f"compound:{id(combined)}"
+        self._pending_deferred[key] = response
+        combined.add_done_callback(lambda _: self._pending_deferred.pop(key, None))
+        return response
+
+    TIMER_COMMAND = re.compile(r'^(?:please )?(?:remind me|set (?:a |an |my )?(?:timer|reminder|alarm)|'
+                               r'(?:start )?(?:a )?timer for)\b|'
+                               r'\b(?:cancel|stop|delete|clear) (?:the |my |all |all my |that )?(?:timers?|reminders?|alarms?)\b|'
+                               r'\b(?:list|what|show|any) (?:are )?(?:my )?(?:timers?|reminders?)\b|'
+                               r'\b(?:timers?|reminders?) (?:do i have|are set|left)\b|\bhow (?:long|much time) (?:is )?left\b')
+    NUMBER_WORDS = {'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+                    'eight': 8, 'nine': 9, 'ten': 10, 'fifteen': 15, 'twenty': 20, 'thirty': 30, 'forty': 40,
+                    'forty five': 45, 'fifty': 50, 'sixty': 60, 'ninety': 90, 'half an': 0.5, 'half a': 0.5}
+    DURATION = re.compile(r'\b(\d+(?:\.\d+)?|half an?|forty five|an?|one|two|three|four|five|six|seven|eight|nine|'
+                          r'ten|fifteen|twenty|thirty|forty|fifty|sixty|ninety)\s*'
+                          r'(seconds?|secs?|minutes?|mins?|hours?|hrs?)\b')
+    CLOCK_TIME = re.compile(r'(\d{1,2})(?::(\d{2}))?\s*(a\.?m\.?|p\.?m\.?)?(?!\w)')
+    TIMER_PREFIX = re.compile(r'^(?:please )?(?:remind me|set (?:a |an |my )?(?:timer|reminder|alarm)|'
+                              r'(?:start )?(?:a )?timer)\s*')
+
+    def get_timers(self) -> TimerEngine:
+        """Get the timer engine, starting it on first use"""
+        with self._timers_lock:
+            if self.timers is None:
+                self.timers = TimerEngine(on_due=self._timer_due)
+                self.timers.start()
+        return self.timers
+
+    def _timer_due(self, timer: Dict[str, Any], late: float):
+        """Announce a timer or reminder through the normal speech path"""
+        if timer['kind'] == 'reminder':
+            text = f"Reminder: {timer['label']}."
+        else:
+            text = f"Your {timer['label']} is done."
+        if late > 60:
+            due = datetime.datetime.fromtimestamp(timer['due'])
+            text += f" It was due at {due.strftime('%I:%M %p')}."
+        logging.info(f"Timer fired: {timer['label']} ({late:.1f}s late)")
+        self.speak(text)
+
+    @staticmethod
+    def describe_seconds(seconds: float) -> str:
+        """Spoken form of a duration, e.g. '1 hour 5 minutes'"""
+        seconds = int(round(seconds))
+        parts = []
+        for unit, size in (('hour', 3600), ('minute', 60), ('second', 1)):
+            value, seconds = divmod(seconds, size)
+            if value:
+                parts.append(f"{value} {unit}{'s' if value != 1 else ''}")
+        return " ".join(parts[:2]) or "0 seconds"
+
+    def _clock_seconds(self, match) -> Optional[float]:
+        """Seconds until the next occurrence of a CLOCK_TIME match"""
+        hour, minute = int(match.group(1)), int(match.group(2) or 0)
+        meridiem = (match.group(3) or '').replace('.', '')
+        if meridiem == 'pm' and hour < 12:
+            hour += 12
+        elif meridiem == 'am' and hour == 12:
+            hour = 0
+        if hour > 23 or minute > 59:
+            return None
+        now = datetime.datetime.now()
+        target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if target <= now and not meridiem and hour < 12:
+            target += datetime.timedelta(hours=12)  # "at 5" in the afternoon means 5 pm
+        if target <= now:
+            target += datetime.timedelta(days=1)
+        return (target - now).total_seconds()
+
+    def parse_timer_request(self, text: str) -> tuple:
+        """Find when a timer should fire
+
+        Only the time clause right after the command ("remind me in 10
+        minutes to ...", "set a timer for an hour and 5 minutes", "remind me
+        at 5 pm to ...") or at the very end ("remind me to stretch in 20
+        minutes") counts, so durations inside the label are left alone.
+        Returns (seconds from now or None, the rest of the text verbatim).
+        """
+        rest = self.TIMER_PREFIX.sub('', text, count=1)
+        durations = self.DURATION.pattern + r'(?:\s*,?\s*(?:and\s+)?' + self.DURATION.pattern + ')*'
+        clock = self.CLOCK_TIME.pattern
+        for pattern in (r'^(?:(?:in|for|after)\s+)?' + durations + r'(?!\w)',
+                        r'\s+(?:in|for|after)\s+' + durations + r'\s*[.!?]?$'):
+            match = re.search(pattern, rest)
+            if match:
+                total = 0.0
+                for part in self.DURATION.finditer(match.group(0)):
+                    amount, unit = part.group(1), part.group(2)
+                    value = float(amount) if amount[0].isdigit() else self.NUMBER_WORDS[amount]
+                    total += value * (3600 if unit.startswith('h') else 60 if unit.startswith('m') else 1)
+                return total, (rest[:match.start()] + rest[match.end():]).strip()
+        
+        for pattern in (r'^at\s+' + clock, r'\s+at\s+' + clock + r'\s*[.!?]?$'):
+            match = re.search(pattern, rest)
+            if match:
+                seconds = self._clock_seconds(self.CLOCK_TIME.search(match.group(0)))
+                return seconds, (rest[:match.start()] + rest[match.end():]).strip()
+        return None, rest
+
+    def handle_timers(self, command: str) -> str:
+        """Set, list and cancel timers and reminders"""
+        try:
+            engine = self.get_timers()
+            kind = 'reminder' if 'remind' in command else 'timer' if ('timer' in command or 'alarm' in command) else None
+            
+            if re.search(r'\b(?:cancel|stop|delete|clear)\b', command):
+                timers = engine.pending(kind)
+                if not timers:
+                    return f"You don't have any {kind or 'timer'}s set."
+                if ' all' not in command:
+                    # "cancel the reminder to call mom" picks by label, otherwise the most recent one
+                    words = set(re.findall(r'\w+', command)) - {'cancel', 'stop', 'delete', 'clear', 'the', 'my', 'to',
+                                                               'timer', 'reminder', 'alarm', 'that', 'about', 'for'}
+                    if words:
+                        scored = [(len(words & set(re.findall(r'\w+', t['label'].lower()))), t['created'], t)
+                                  for t in timers]
+                        best = max(scored, key=lambda item: item[:2])
+                        timers = [best[2]] if best[0] else [max(timers, key=lambda t: t['created'])]
+                    else:
+                        timers = [max(timers, key=lambda t: t['created'])]
+                for timer in timers:
+                    engine.cancel(timer['id'])
+                if len(timers) == 1:
+                    return f"Cancelled your {timers[0]['label']}." if timers[0]['kind'] == 'timer' \
+                        else f"Cancelled the reminder to {timers[0]['label']}."
+                return f"Cancelled {len(timers)} {kind or 'timer'}s."
+            
+            if not re.match(r'^(?:please )?(?:remind me|set |(?:start )?(?:a )?timer for)', command):
+                timers = engine.pending(kind)
+                if not timers:
+                    return f"You don't have any {kind or 'timer'}s set."
+                now = time.time()
+                lines = [f"{t['label']} - {self.describe_seconds(t['due'] - now)} left" for t in timers[:5]]
+                more = f" and {len(timers) - 5} more" if len(timers) > 5 else ""
+                return f"You have {len(timers)} pending: " + "; ".join(lines) + more + "."
+            
+            seconds, rest = self.parse_timer_request(command)
+            if not seconds:
+                return "For how long? Say, for example, 'set a timer for 5 minutes' or 'remind me in 20 minutes to stretch'."
+            
+            if command.startswith(('remind me', 'please remind me')) or kind == 'reminder':
+                label = re.sub(r'^(?:to|that|about|of)\s+', '', rest).strip(' .,') or "your reminder"
+                timer = engine.add(seconds, label, kind='reminder')
+                due = datetime.datetime.fromtimestamp(timer['due'])
+                return f"Okay, I'll remind you to {label} at {due.strftime('%I:%M %p')}."
+            
+            label = f"{self.describe_seconds(seconds)} timer"
+            engine.add(seconds, label, kind='timer')
+            return f"Timer set for {self.describe_seconds(seconds)}."
+        except Exception as e:
+            return f"Error handling timer: {str(e)}"
 
     def process_command(self, command: str) -> str:
         """Process and execute commands with enhanced capabilities"""
         command = command.lower().strip()
         
         try:
+            # "open calculator and take a screenshot" runs both
+            stages = self.split_compound(command)
+            if len(stages) > 1 or len(stages[0]) > 1:
+                return self.process_compound(stages)
+            
+            # Idle the wake-word listener until it hears the wake word again
+            if command in self.SLEEP_PHRASES:
+                return self.go_to_sleep()
+            
+            # Timers and reminders
+            elif self.TIMER_COMMAND.search(command):
+                return self.handle_timers(command)
+            
+            # Cancel answers still being worked on
+            elif command in ['cancel', 'cancel that', 'never mind', 'nevermind', 'forget it']:
+                return self.cancel_pending()
+            
             # File operations
-            if any(phrase in command for phrase in ['read file', 'open file', 'show me file']):
+            elif any(phrase in command for phrase in ['read file', 'open file', 'show me file',
+                                                        'summarize file', 'summarise file']):
                 return self.handle_file_operations(command)
+            elif 'duplicate' in command:
+                return self.find_duplicate_files(command)
+            elif any(phrase in command for phrase in ['disk usage', 'eating my disk', 'taking up space',
+                                                        'largest folder', 'biggest folder', 'largest files',
+                                                        'biggest files', 'largest file', 'biggest file']):
+                return self.analyze_disk_usage(command)
             elif any(phrase in command for phrase in ['search file', 'find file']):
                 return self.search_files(command)
+            elif any(phrase in command for phrase in ['show more', 'more files', 'next page']):
+                return self.list_files_next_page()
             elif 'list files' in command or 'show files' in command:
                 return self.list_files(command)
             
@@ -431,20 +3781,24 @@ class JarvisEnhanced:
                 return self.get_system_status()
             elif any(phrase in command for phrase in ['what time', 'current time', 'time']):
                 return self.get_time()
-            elif any(phrase in command for phrase in ['what date', 'today', 'date']):
+            elif any(phrase in command for phrase in ['what date', "what's today", 'what is today', 'what day',
+                                                        "today's date", 'date']):
                 return self.get_date()
             
+            elif any(phrase in command for phrase in ['diagnostics', 'memory usage', 'resource usage']):
+                return self.get_diagnostics()
+            
             # AI status check - FIX 6: Add AI status command
             elif any(phrase in command for phrase in ['ai status', 'api status', 'integration status']):
                 return f"AI Integration Status: {self.ai.get_status()}"
             
             # AI-powered queries for complex tasks
             elif any(phrase in command for phrase in ['explain', 'tell me about', 'what is', 'how to']):
-                return self.handle_complex_query(command)
+                return self.route_locally(command, question=True) or self.handle_complex_query(command)
             
             # System control (safe operations only)
             elif 'take screenshot' in command:
-                return self.take_screenshot()
+                return self.take_screenshot(command)
             elif 'volume' in command:
                 return self.control_volume(command)
             
@@ -460,55 +3814,99 @@ class JarvisEnhanced:
             elif 'history' in command:
                 return self.get_command_history()
             
-            # Default: Use AI for complex interpretation
+            # Default: Try the local intent classifier, then AI for complex interpretation
             else:
-                return self.handle_complex_query(command)
+                return self.route_locally(command) or self.handle_complex_query(command)
                 
         except Exception as e:
             error_msg = f"Error processing command: {str(e)}"
             logging.error(error_msg)
             return error_msg
 
+    def route_locally(self, command: str, question: bool = False) -> Optional[str]:
+        """Answer near-miss phrasings with a local handler; None if the cloud should handle it
+
+        A question is never routed to a handler that changes the machine.
+        """
+        if self.intent_classifier is None:
+            start = time.perf_counter()
+            self.intent_classifier = IntentClassifier()
+            logging.info(f"Intent classifier built in {(time.perf_counter() - start) * 1000:.1f} ms")
+        
+        scores = self.intent_classifier.scores(command)
+        if not scores:
+            return None
+        intent = max(scores, key=scores.get)
+        score = scores[intent]
+        if intent == 'cloud' or score < self.config.get('local_intent_threshold', 0.55):
+            return None
+        if score - scores.get('cloud', 0.0) < self.config.get('local_intent_margin', 0.1):
+            return None  # Too close to an open-ended question to be sure
+        if intent in IntentClassifier.SIDE_EFFECT_INTENTS and (
+                question or not self.intent_classifier.has_action_verb(command)):
+            return None
+        
+        args = self.intent_classifier.extract_arguments(intent, command)
+        logging.info(f"Local intent '{intent}' ({score:.2f}) for: {command}")
+        self._route_local.route = f"local:{intent}"
+        if intent == 'list_files':
+            return self.list_files(f"list files in {args['folder']}" if 'folder' in args else "list files")
+        elif intent == 'search_files':
+            return self.search_files(f"find file {args['name']}") if args.get('name') else None
+        elif intent == 'control_volume':
+            return self.control_volume(f"volume {args.get('direction', 'level')}")
+        elif intent == 'open_application':
+            return self.open_application(f"open {args['app']}") if 'app' in args else None
+        elif intent == 'take_screenshot':
+            return self.take_screenshot(command)
+        elif intent == 'analyze_disk_usage':
+            return self.analyze_disk_usage(command)
+        elif intent == 'ai_status':
+            return f"AI Integration Status: {self.ai.get_status()}"
+        return getattr(self, intent)()
+
     def handle_complex_query(self, command: str) -> str:
         """Handle complex queries using AI - FIXED VERSION"""
         try:
             # FIX 7: Better AI integration checking
             if not self.ai.is_available():
-                return "AI services not available. Please configure your OpenAI or Gemini API keys in the settings."
-            
-            # Try Gemini first (usually faster and has higher free tier)
-            if self.ai.gemini_model:
-                response = self.ai.query_gemini(command)
-                if response and not any(error in response.lower() for error in ['error', 'quota', 'rate limit']):
-                    return response
-            
-            # Fallback to OpenAI
-            if self.ai.openai_client:
-                response = self.ai.query_openai(command)
-                if response and not any(error in response.lower() for error in ['error', 'quota', 'rate limit']):
-                    return response
+                return "AI services not available. Please configure your OpenAI or Gemini API keys in the settings."
             
-            # Fallback for basic queries when AI is unavailable
-            if 'what time' in command:
-                return self.get_time()
-            elif 'what date' in command:
-                return self.get_date()
-            elif 'weather' in command:
-                return "Weather information requires AI integration or weather API setup."
-            else:
-                return "AI services are temporarily unavailable due to quota limits. Please try again later or configure different API keys."
+            self._route_local.route = 'cloud'
+            return self.defer("One moment.", lambda: self._answer_complex_query(command), kind='ai', request=command)
                 
         except Exception as e:
             logging.error(f"Complex query error: {e}")
             return f"Error processing complex query: {str(e)}"
 
+    def _answer_complex_query(self, command: str) -> str:
+        """Get an AI answer, falling back to local answers when providers fail"""
+        # Route to the provider with the best observed latency and reliability
+        response = self.ai.query(command)
+        if not self.ai.is_error_response(response):
+            return response
+        
+        # Fallback for basic queries when AI is unavailable
+        if 'what time' in command:
+            return self.get_time()
+        elif 'what date' in command:
+            return self.get_date()
+        elif 'weather' in command:
+            return "Weather information requires AI integration or weather API setup."
+        else:
+            return "AI services are temporarily unavailable due to quota limits. Please try again later or configure different API keys."
+
     # ... (rest of the methods remain the same, just including a few key ones)
 
+    # Files read directly as text; office documents go through TextExtractor
+    TEXT_FILE_EXTENSIONS = ('.txt', '.md', '.py', '.js', '.html', '.css', '.json', '.csv')
+
     def handle_file_operations(self, command: str) -> str:
         """Handle file reading and opening operations"""
         try:
             # Extract filename from command
-            file_keywords = ['read file', 'open file', 'show me file', 'read', 'open']
+            file_keywords = ['read file', 'open file', 'show me file', 'summarize file', 'summarise file',
+                             'read', 'open']
             filename = command
             for keyword in file_keywords:
                 if keyword in command:
@@ -519,25 +3917,47 @@ class JarvisEnhanced:
                 return "Please specify which file you'd like me to open or read."
             
             # Search for the file
-            found_files = self.find_files_by_name(filename)
+            ranked_files = self.rank_files_by_name(filename)
             
-            if not found_files:
+            if not ranked_files:
                 return f"I couldn't find any file matching '{filename}'"
             
-            if len(found_files) > 1:
+            # Open the top hit when it matches well and clearly beats the runner-up;
+            # weak fallback matches are only offered, never opened
+            top_score = ranked_files[0][0]
+            if len(ranked_files) == 1:
+                confident = top_score >= self.config.get('file_match_min_score', 0.35)
+            else:
+                confident = (top_score >= self.config.get('file_match_confident_score', 0.75) and
+                             top_score - ranked_files[1][0] >= 0.1)
+            if not confident and len(ranked_files) == 1:
+                path = ranked_files[0][1]
+                return (f"The closest match for '{filename}' is {os.path.basename(path)} in {os.path.dirname(path)}. "
+                        f"Say its full name if that's the file you want.")
+            if not confident:
                 files_list = "\n".join([f"{i+1}. {os.path.basename(f)} in {os.path.dirname(f)}" 
-                                      for i, f in enumerate(found_files[:5])])
+                                      for i, (_, f) in enumerate(ranked_files[:5])])
                 return f"I found multiple files matching '{filename}':\n{files_list}\nPlease be more specific."
             
-            file_path = found_files[0]
+            file_path = ranked_files[0][1]
             
             # Safety check
             if not self.safety_manager.is_safe_path(file_path) or not self.safety_manager.is_safe_file(file_path):
                 return f"Sorry, I cannot open this file for security reasons: {file_path}"
             
+            self.record_file_access(file_path)
+            
+            if self.text_extractor is None:
+                self.text_extractor = TextExtractor(max_cache_mb=self.config.get('text_cache_mb', 200))
+            
+            if 'summari' in command:
+                return self.summarize_document(file_path)
+            
             # Read file content if it's a text file
-            if any(file_path.lower().endswith(ext) for ext in ['.txt', '.md', '.py', '.js', '.html', '.css', '.json', '.csv']):
+            if file_path.lower().endswith(self.TEXT_FILE_EXTENSIONS):
                 return self.read_text_file(file_path)
+            elif 'open' not in command and self.text_extractor.supports(file_path):
+                return self.read_document(file_path)
             else:
                 # Open with default application
                 return self.open_file_with_default_app(file_path)
@@ -561,19 +3981,20 @@ class JarvisEnhanced:
             
             # Open search in browser
             search_url = f"https://www.google.com/search?q={search_term.replace(' ', '+')}"
-            webbrowser.open(search_url)
+            self.host_actions.open_url(search_url)
             
-            # Try to get quick information using AI
-            ai_summary = ""
+            # Get quick information using AI without holding up the session
             if self.ai.is_available():
                 prompt = f"Provide a brief, accurate summary about '{search_term}' in 2-3 sentences."
-                if self.ai.gemini_model:
-                    ai_summary = self.ai.query_gemini(prompt)
-                elif self.ai.openai_client:
-                    ai_summary = self.ai.query_openai(prompt)
                 
-                if ai_summary and not any(error in ai_summary.lower() for error in ['error', 'quota', 'rate limit']):
-                    return f"Searching for '{search_term}' and opened results in browser. Here's what I found: {ai_summary}"
+                def summarize() -> Optional[str]:
+                    ai_summary = self.ai.query(prompt)
+                    if not self.ai.is_error_response(ai_summary):
+                        return f"Here's what I found: {ai_summary}"
+                    return None
+                
+                return self.defer(f"Searching for '{search_term}' and opened results in browser.",
+                                  summarize, kind='search', request=search_term)
             
             return f"I've opened Google search results for '{search_term}' in your browser."
             
@@ -585,7 +4006,8 @@ class JarvisEnhanced:
     def get_system_status(self) -> str:
         """Get system status information"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=1)
+            # Usage since the previous sample; primed at startup so this never blocks
+            cpu_percent = psutil.cpu_percent(interval=None)
             memory = psutil.virtual_memory()
             disk = psutil.disk_usage('/')
             
@@ -613,9 +4035,13 @@ class JarvisEnhanced:
         return f"""I can help you with:
 
 File Operations:
-- "Read file [filename]" - Read and open files
+- "Read file [filename]" - Read and open files, including PDF and Office documents
+- "Summarize file [filename]" - AI summary of a document
 - "Search file [filename]" - Find files by name
-- "List files in [folder]" - Show files in directory
+- "Find duplicate files [in folder]" - Find identical copies
+- "What's eating my disk?" / "Largest files [in folder]" - Find what uses the most space
+- "List files in [folder]" - Show files in directory (add "by date" or "by size" to sort)
+- "Show more files" - Next page of the last listing
 
 Web & Search:
 - "Search for [topic]" - Google search with AI summary
@@ -626,8 +4052,12 @@ System Control:
 - "Open calculator/notepad/browser/file explorer"
 - "Take screenshot" - Capture screen
 - "System status" - Check CPU, memory, disk
+- "Diagnostics" - JARVIS's own memory, threads and cache sizes
 - "What time is it?" - Current time
 - "What's the date?" - Today's date
+- "Go to sleep" - Listen for the wake word only, using less CPU
+- "Set a timer for [duration]" / "Remind me in [duration] to [task]" - Timers and reminders
+- "What timers do I have?" / "Cancel the timer" - Manage them
 
 AI Features (Status: {ai_status}):
 - "Explain [topic]" - Get detailed explanations
@@ -637,6 +4067,7 @@ AI Features (Status: {ai_status}):
 
 Settings:
 - "Mute/Unmute" - Toggle voice
+- "Cancel" - Drop answers that are still being worked on
 - "Help" - Show this help
 
 Say 'Stop' or 'Goodbye' to end the session.
@@ -759,10 +4190,10 @@ Current AI Status: {self.ai.get_status()}"""
         
         # Log initial message
         if self.log_text:
-            self.log_text.insert(tk.END, "JARVIS Enhanced AI Assistant Started\n")
-            self.log_text.insert(tk.END, f"AI Status: {self.ai.get_status()}\n")
-            self.log_text.insert(tk.END, "Say 'Jarvis' to activate voice commands\n")
-            self.log_text.insert(tk.END, "=" * 50 + "\n")
+            self.append_log("JARVIS Enhanced AI Assistant Started\n")
+            self.append_log(f"AI Status: {self.ai.get_status()}\n")
+            self.append_log("Say 'Jarvis' to activate voice commands\n")
+            self.append_log("=" * 50 + "\n")
 
     def toggle_listening(self):
         """Toggle manual listening mode"""
@@ -780,12 +4211,15 @@ Current AI Status: {self.ai.get_status()}"""
         while self.is_listening:
             command = self.listen_for_command(timeout=3)
             if command:
-                if any(word in command for word in ['stop listening', 'stop', 'exit']):
+                if command.strip(' .!') in self.SLEEP_PHRASES:
+                    self.speak(self.go_to_sleep())
+                    break
+                if command.strip(' .!') in self.EXIT_PHRASES:
                     break
                 
-                response = self.process_command(command)
-                if response:
-                    self.speak(response)
+                with self.scheduler.interactive():
+                    response = self.execute_voice_command(command)
+                    self.deliver_response(command, response, record=False)
             time.sleep(0.5)
         
         self.is_listening = False
@@ -800,8 +4234,7 @@ Current AI Status: {self.ai.get_status()}"""
         status = "🔇 Muted" if self.is_muted else "🔊 Unmuted"
         self.mute_button.config(text=status)
         if self.log_text:
-            self.log_text.insert(tk.END, f"System: Voice {status.split()[1]}\n")
-            self.log_text.see(tk.END)
+            self.append_log(f"System: Voice {status.split()[1]}\n")
 
     def open_settings_window(self):
         """Open settings configuration window - FIXED VERSION"""
@@ -835,7 +4268,7 @@ Current AI Status: {self.ai.get_status()}"""
         notebook.add(ai_frame, text="AI Settings")
         
         # Current status display
-        tk.Label(ai_frame, text=f"Current Status: {self.ai.get_status()}", 
+        tk.Label(ai_frame, text=f"Current Status: {self.ai.get_status()}", wraplength=560, justify=tk.LEFT,
                 bg='#1a1a2e', fg='#00ff00', font=('Arial', 10, 'bold')).pack(anchor=tk.W, padx=10, pady=10)
         
         tk.Label(ai_frame, text="OpenAI API Key:", bg='#1a1a2e', fg='#00d4ff').pack(anchor=tk.W, padx=10, pady=5)
@@ -877,35 +4310,43 @@ Current Detection:
         def test_ai_connections():
             test_window = tk.Toplevel(settings_window)
             test_window.title("AI Connection Test")
-            test_window.geometry("500x300")
+            test_window.geometry("700x400")
             test_window.configure(bg='#1a1a2e')
             
             test_text = tk.Text(test_window, bg='#2a2a3e', fg='#00d4ff', font=('Consolas', 10))
             test_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
             
-            test_text.insert(tk.END, "Testing AI connections...\n\n")
-            test_window.update()
+            providers = self.ai.available_providers()
+            if not providers:
+                test_text.insert(tk.END, "No AI providers configured.\n")
+                return
             
-            # Test OpenAI
-            if self.ai.openai_client:
-                test_text.insert(tk.END, "Testing OpenAI...\n")
-                test_window.update()
-                result = self.ai.query_openai("Say 'OpenAI test successful' in exactly those words.")
-                test_text.insert(tk.END, f"OpenAI Result: {result}\n\n")
-            else:
-                test_text.insert(tk.END, "OpenAI: Not configured\n\n")
-            
-            # Test Gemini
-            if self.ai.gemini_model:
-                test_text.insert(tk.END, "Testing Gemini...\n")
-                test_window.update()
-                result = self.ai.query_gemini("Say 'Gemini test successful' in exactly those words.")
-                test_text.insert(tk.END, f"Gemini Result: {result}\n\n")
-            else:
-                test_text.insert(tk.END, "Gemini: Not configured\n\n")
+            count = self.config.get('probe_requests', 5)
+            test_text.insert(tk.END, f"Probing {', '.join(providers)} with {count} requests each...\n\n")
             
-            test_text.insert(tk.END, "Test completed!")
-            test_text.config(state=tk.DISABLED)
+            # Probe on a worker thread; results are handed to Tk through a queue
+            updates = queue.Queue()
+            probe = ProviderProbe(self.ai, requests_per_provider=count)
+            future = self.scheduler.submit(probe.run, updates.put)
+            
+            def poll():
+                if not test_window.winfo_exists():
+                    return
+                while not updates.empty():
+                    test_text.insert(tk.END, ProviderProbe.format_result(updates.get()) + "\n")
+                    test_text.see(tk.END)
+                if not future.done():
+                    test_window.after(100, poll)
+                    return
+                try:
+                    summary = ProviderProbe.format_summary(future.result())
+                except Exception as e:
+                    summary = f"Probe failed: {e}"
+                test_text.insert(tk.END, f"\n{summary}\n\nTest completed!")
+                test_text.see(tk.END)
+                test_text.config(state=tk.DISABLED)
+            
+            poll()
         
         test_button = tk.Button(ai_frame, text="🧪 Test AI Connections", 
                                command=test_ai_connections,
@@ -934,8 +4375,7 @@ Current Detection:
             
             # Update GUI status
             if hasattr(self, 'log_text') and self.log_text:
-                self.log_text.insert(tk.END, f"Settings updated. New AI Status: {self.ai.get_status()}\n")
-                self.log_text.see(tk.END)
+                self.append_log(f"Settings updated. New AI Status: {self.ai.get_status()}\n")
         
         # Save button
         save_button = tk.Button(settings_window, text="💾 Save Settings", 
@@ -944,9 +4384,9 @@ Current Detection:
         save_button.pack(pady=20)
 
     # Include other missing methods
-    def find_files_by_name(self, filename: str, limit: int = 10) -> List[str]:
-        """Find files by name in common directories"""
-        search_dirs = [
+    def get_search_dirs(self) -> List[str]:
+        """Get the directories searched for user files"""
+        return [
             os.path.expanduser("~/Desktop"),
             os.path.expanduser("~/Documents"),
             os.path.expanduser("~/Downloads"),
@@ -955,31 +4395,192 @@ Current Detection:
             os.path.expanduser("~/Videos"),
             os.getcwd()  # Current directory
         ]
-        
-        found_files = []
-        
-        for search_dir in search_dirs:
-            if os.path.exists(search_dir):
+
+    def find_files_by_name(self, filename: str, limit: int = 10) -> List[str]:
+        """Find files by name in common directories, best match first"""
+        return [path for _, path in self.rank_files_by_name(filename, limit=limit)]
+
+    def rank_files_by_name(self, filename: str, limit: int = 10) -> List[tuple]:
+        """Find files matching a spoken name and return (score, path) pairs, best first"""
+        ranker = FilenameRanker(filename, self.user_preferences.get('file_access_counts'))
+        if not ranker.tokens and not ranker.wanted_ext:
+            return []
+        candidate_limit = max(limit, self.config.get('file_rank_candidates', 200))
+        candidates = list(self.iter_files_by_name(ranker.is_candidate, limit=candidate_limit))
+        ranked = ranker.rank(candidates)
+        min_score = self.config.get('file_match_min_score', 0.35)
+        confident = [item for item in ranked if item[0] >= min_score]
+        # Every candidate already matched the name; short names like "log" score
+        # low against long filenames, so fall back to them rather than nothing
+        return (confident or ranked)[:limit]
+
+    def record_file_access(self, file_path: str):
+        """Remember that a file was opened so it ranks higher next time"""
+        counts = self.user_preferences.setdefault('file_access_counts', {})
+        counts[file_path] = counts.get(file_path, 0) + 1
+
+    def iter_files_by_name(self, matches: Callable[[str], bool], limit: int = 10,
+                           time_budget: Optional[float] = None) -> Iterator[str]:
+        """Stream matching files from all search directories as they are found
+
+        Each search root is walked concurrently. Work is cancelled as soon as
+        `limit` matches have been yielded or the time budget runs out, so a
+        voice command always gets an answer within a bounded latency.
+        """
+        if time_budget is None:
+            time_budget = self.config.get('file_search_time_budget', 2.0)
+        deadline = time.monotonic() + time_budget
+
+        roots = [d for d in dict.fromkeys(self.get_search_dirs()) if os.path.isdir(d)]
+        if not roots or limit <= 0:
+            return
+
+        results = queue.Queue()
+        stop_event = threading.Event()
+        workers = max(1, min(len(roots), self.config.get('file_search_workers', 4)))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='jarvis-search')
+        for root in roots:
+            executor.submit(self._scan_search_root, root, matches, results, stop_event, deadline)
+
+        pending = len(roots)
+        seen = set()
+        try:
+            while pending and len(seen) < limit:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logging.info(f"File search time budget of {time_budget}s exhausted")
+                    break
                 try:
-                    for root, dirs, files in os.walk(search_dir):
-                        if len(found_files) >= limit:
-                            break
-                        
-                        # Skip hidden directories and system directories
-                        dirs[:] = [d for d in dirs if not d.startswith('.') and 
-                                 self.safety_manager.is_safe_path(os.path.join(root, d))]
-                        
-                        for file in files:
-                            if filename.lower() in file.lower():
-                                file_path = os.path.join(root, file)
-                                if self.safety_manager.is_safe_path(file_path):
-                                    found_files.append(file_path)
-                                    if len(found_files) >= limit:
-                                        break
-                except PermissionError:
+                    item = results.get(timeout=remaining)
+                except queue.Empty:
+                    logging.info(f"File search time budget of {time_budget}s exhausted")
+                    break
+                if item is None:
+                    pending -= 1
+                elif item not in seen:
+                    # Search roots may overlap (e.g. the current directory)
+                    seen.add(item)
+                    yield item
+        finally:
+            stop_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _scan_search_root(self, root: str, matches: Callable[[str], bool], results: queue.Queue,
+                          stop_event: threading.Event, deadline: float):
+        """Breadth-first scandir walk of one search root, posting matches to results"""
+        pending_dirs = deque([root])
+        try:
+            while pending_dirs and not stop_event.is_set() and time.monotonic() < deadline:
+                current = pending_dirs.popleft()
+                try:
+                    with os.scandir(current) as entries:
+                        for entry in entries:
+                            if stop_event.is_set():
+                                return
+                            name = entry.name
+                            try:
+                                # is_dir(follow_symlinks=False) uses the cached d_type, no stat needed
+                                if entry.is_dir(follow_symlinks=False):
+                                    # Skip hidden directories and system directories
+                                    if not name.startswith('.') and self.safety_manager.is_safe_path(entry.path):
+                                        pending_dirs.append(entry.path)
+                                elif matches(name) and entry.is_file() and self.safety_manager.is_safe_path(entry.path):
+                                    results.put(entry.path)
+                            except OSError:
+                                continue
+                except OSError:  # PermissionError, vanished directories, ...
                     continue
+        except Exception as e:
+            logging.error(f"File search error in {root}: {e}")
+        finally:
+            results.put(None)  # Signals this root is finished
+
+    def find_duplicate_files(self, command: str) -> str:
+        """Find duplicate files in the search directories"""
+        try:
+            roots = self.get_search_dirs()
+            # "find duplicates in downloads" narrows the scan to one folder
+            match = re.search(r'\bin\s+(?:my\s+)?([\w ]+)$', command)
+            if match:
+                folder = match.group(1).strip()
+                scoped = [d for d in roots if os.path.basename(d).lower() == folder]
+                if scoped:
+                    roots = scoped
+            
+            if self.duplicate_finder is None:
+                self.duplicate_finder = DuplicateFinder(self.safety_manager)
+            finder = self.duplicate_finder
+            scope = ", ".join(os.path.basename(r) for r in roots)
+            
+            def answer() -> str:
+                groups = finder.find(roots, checkpoint=self.scheduler.checkpoint)
+                stats = finder.stats
+                logging.info(f"Duplicate scan: {stats}")
+                if not groups:
+                    return f"No duplicate files found in {scope} ({stats['files']} files checked)."
+                
+                wasted = sum(os.path.getsize(paths[0]) * (len(paths) - 1) for paths in groups if os.path.exists(paths[0]))
+                result = (f"Found {len(groups)} set(s) of duplicate files in {scope}, "
+                          f"using {wasted / (1024 * 1024):.1f} MB of extra space:\n")
+                for i, paths in enumerate(groups[:5], 1):
+                    result += f"{i}. {os.path.basename(paths[0])} - {len(paths)} copies in {', '.join(os.path.dirname(p) for p in paths)}\n"
+                return result
+            
+            # Hashing is disk-heavy, so it runs as throttled background work
+            return self.defer(f"Checking {scope} for duplicates.", answer, kind='duplicates', priority='background')
+        except Exception as e:
+            return f"Error finding duplicate files: {str(e)}"
+
+    def analyze_disk_usage(self, command: str) -> str:
+        """Report the folders or files using the most space"""
+        try:
+            roots = DiskUsageAnalyzer.independent_roots([os.path.expanduser("~")] + self.get_search_dirs())
+            match = re.search(r'\bin\s+(?:my\s+)?([\w ]+)$', command)
+            if match:
+                folder = match.group(1).strip()
+                scoped = [d for d in self.get_search_dirs() if os.path.basename(d).lower() == folder]
+                if scoped:
+                    roots = scoped
+            want_files = 'file' in command
+            
+            if self.disk_usage is None:
+                self.disk_usage = DiskUsageAnalyzer(self.safety_manager,
+                                                    workers=self.config.get('disk_usage_workers', 8))
+            analyzer = self.disk_usage
+            
+            if analyzer.is_fresh(roots, self.config.get('disk_usage_ttl', 300)):
+                return self.describe_disk_usage(roots, want_files)
+            
+            def answer() -> str:
+                logging.info(f"Disk usage scan: {analyzer.scan(roots, checkpoint=self.scheduler.checkpoint)}")
+                return self.describe_disk_usage(roots, want_files)
+            
+            # Any scan can walk the whole home folder (a cold cache, or records past max_age),
+            # so it always runs as throttled background work
+            acknowledgement = ("Updating the folder sizes." if analyzer.has_cache(roots)
+                               else "Measuring your folders, this may take a minute.")
+            return self.defer(acknowledgement, answer, kind='disk', priority='background')
+        except Exception as e:
+            return f"Error analyzing disk usage: {str(e)}"
+
+    def describe_disk_usage(self, roots: List[str], want_files: bool, limit: int = 5) -> str:
+        """Spoken summary of the largest folders or files under roots"""
+        analyzer = self.disk_usage
+        fmt = DiskUsageAnalyzer.format_size
+        home = os.path.expanduser("~")
         
-        return found_files
+        def short(path: str) -> str:
+            return "~" + path[len(home):] if path.startswith(home + os.sep) else path
+        
+        total = sum(analyzer.total(r) for r in roots)
+        scope = ", ".join(short(r) if r != home else "your home folder" for r in roots)
+        items = analyzer.largest_files(roots, limit) if want_files else analyzer.largest_folders(roots, limit)
+        if not items:
+            return f"I couldn't find any {'files' if want_files else 'folders'} in {scope}."
+        result = f"{fmt(total)} used in {scope}. Largest {'files' if want_files else 'folders'}:\n"
+        for i, (size, path) in enumerate(items, 1):
+            result += f"{i}. {short(path)} - {fmt(size)}\n"
+        return result
 
     def read_text_file(self, file_path: str) -> str:
         """Read and return content of text files"""
@@ -997,16 +4598,55 @@ Current Detection:
         except Exception as e:
             return f"Error reading file: {str(e)}"
 
+    def read_document(self, file_path: str) -> str:
+        """Read a preview of a PDF or office document"""
+        try:
+            pages, page_count = self.text_extractor.get_pages(file_path, max_pages=1)
+            text = pages[0] if pages else ""
+            if not text.strip():
+                return f"I couldn't find any readable text on the first page of {os.path.basename(file_path)}."
+            
+            name = os.path.basename(file_path)
+            pages_note = f" (page 1 of {page_count})" if page_count else ""
+            if len(text) > 500:
+                return f"Content preview from {name}{pages_note}:\n{text[:500]}..."
+            return f"Content of {name}{pages_note}:\n{text}"
+        except Exception as e:
+            return f"Error reading document: {str(e)}"
+
+    def summarize_document(self, file_path: str) -> str:
+        """Summarize a document with AI; extracted text is cached so repeat requests are fast"""
+        if not self.ai.is_available():
+            return "Summaries need AI services. Please configure your OpenAI or Gemini API keys in the settings."
+        
+        name = os.path.basename(file_path)
+        is_text = file_path.lower().endswith(self.TEXT_FILE_EXTENSIONS)
+        if not is_text and not self.text_extractor.supports(file_path):
+            return f"I can only summarize text files and documents, not {name}."
+        
+        # Keep the prompt within a sensible size for the providers; only that much is extracted
+        max_chars = self.config.get('summary_max_chars', 12000)
+        
+        def summarize() -> str:
+            if not is_text:
+                text = self.text_extractor.get_text(file_path, checkpoint=self.scheduler.checkpoint,
+                                                    max_chars=max_chars)
+            else:
+                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                    text = f.read(max_chars)
+            if not text.strip():
+                return f"{name} doesn't contain any text I can read."
+            summary = self.ai.query(f"Summarize this document in 3-4 sentences:\n\n{text}")
+            if self.ai.is_error_response(summary):
+                return f"I couldn't summarize {name} right now: {summary}"
+            return summary
+        
+        return self.defer(f"Summarizing {name}.", summarize, kind='summary', priority='background')
+
     def open_file_with_default_app(self, file_path: str) -> str:
         """Open file with default application"""
         try:
-            if sys.platform.startswith('darwin'):  # macOS
-                subprocess.call(['open', file_path])
-            elif sys.platform.startswith('linux'):  # Linux
-                subprocess.call(['xdg-open', file_path])
-            elif sys.platform.startswith('win'):  # Windows
-                os.startfile(file_path)
-            
+            self.host_actions.open_path(file_path)
             return f"Opened {os.path.basename(file_path)} with default application"
         except Exception as e:
             return f"Error opening file: {str(e)}"
@@ -1032,9 +4672,20 @@ Current Detection:
     def list_files(self, command: str) -> str:
         """List files in specified directory"""
         try:
+            # Extract sort order from command
+            sort_by = 'name'
+            for phrase, key in [('by date', 'mtime'), ('newest', 'mtime'), ('recent', 'mtime'),
+                                ('by size', 'size'), ('largest', 'size'), ('biggest', 'size'),
+                                ('by name', 'name')]:
+                if phrase in command:
+                    sort_by = key
+                    command = command.replace(phrase, ' ')
+            command = command.replace('sorted', ' ').strip()
+            
             # Extract directory from command
-            if 'in' in command:
-                directory = command.split('in')[-1].strip()
+            parts = re.split(r'\s+in\s+', command, maxsplit=1)
+            if len(parts) == 2:
+                directory = parts[1].strip()
                 if directory in ['desktop', 'my desktop']:
                     directory = os.path.expanduser("~/Desktop")
                 elif directory in ['documents', 'my documents']:
@@ -1049,22 +4700,91 @@ Current Detection:
             if not os.path.exists(directory) or not self.safety_manager.is_safe_path(directory):
                 return f"Cannot access directory: {directory}"
             
-            files = []
-            for item in os.listdir(directory):
-                item_path = os.path.join(directory, item)
-                if os.path.isfile(item_path) and self.safety_manager.is_safe_file(item_path):
-                    files.append(item)
-            
-            if not files:
-                return f"No accessible files found in {directory}"
-            
-            files = sorted(files)[:20]  # Limit to 20 files
-            files_list = "\n".join(f"{i+1}. {file}" for i, file in enumerate(files))
-            return f"Files in {os.path.basename(directory)}:\n{files_list}"
+            self._listing_state = {'directory': directory, 'sort_by': sort_by, 'offset': 0}
+            return self._render_listing_page()
             
         except Exception as e:
             return f"Error listing files: {str(e)}"
 
+    def list_files_next_page(self) -> str:
+        """Continue the previous file listing with the next page"""
+        if not self._listing_state:
+            return "Ask me to list files in a folder first."
+        try:
+            self._listing_state['offset'] += self.config.get('list_page_size', 20)
+            return self._render_listing_page()
+        except Exception as e:
+            return f"Error listing files: {str(e)}"
+
+    def _get_directory_listing(self, directory: str) -> Dict[str, Any]:
+        """Get the accessible files of a directory, reusing a recent scan if the directory is unchanged"""
+        dir_mtime = os.stat(directory).st_mtime_ns
+        ttl = self.config.get('listing_cache_ttl', 30)
+        cached = self._listing_cache.pop(directory, None)
+        if cached and cached['dir_mtime'] == dir_mtime and time.monotonic() - cached['scanned_at'] < ttl:
+            self._listing_cache[directory] = cached  # Most recently used last
+            return cached
+        
+        entries = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    # is_safe_file only inspects the extension, so check it before touching d_type
+                    if self.safety_manager.is_safe_file(entry.name) and entry.is_file():
+                        entries.append(entry)
+                except OSError:
+                    continue
+        
+        now = time.monotonic()
+        listing = {'dir_mtime': dir_mtime, 'scanned_at': now,
+                   'names': [entry.name for entry in entries], 'entries': entries, 'stats': {}}
+        # Drop expired scans, then the least recently used beyond the size limit
+        for key, old in list(self._listing_cache.items()):
+            if now - old['scanned_at'] >= ttl:
+                self._listing_cache.pop(key, None)
+        self._listing_cache[directory] = listing
+        while len(self._listing_cache) > self.config.get('listing_cache_size', 8):
+            self._listing_cache.pop(next(iter(self._listing_cache)), None)
+        return listing
+
+    def _render_listing_page(self) -> str:
+        """Format the page of the current listing selected by its offset"""
+        state = self._listing_state
+        directory, sort_by, offset = state['directory'], state['sort_by'], state['offset']
+        page_size = self.config.get('list_page_size', 20)
+        listing = self._get_directory_listing(directory)
+        names = listing['names']
+        
+        if not names:
+            return f"No accessible files found in {directory}"
+        if offset >= len(names):
+            state['offset'] = max(0, offset - page_size)
+            return f"That's all {len(names)} files in {os.path.basename(directory)}."
+        
+        # Top-K selection only orders the entries needed for this page
+        wanted = offset + page_size
+        if sort_by == 'name':
+            selected = heapq.nsmallest(wanted, names, key=str.lower)
+        else:
+            stats = listing['stats']
+            if len(stats) < len(names):
+                for entry in listing['entries']:
+                    if entry.name not in stats:
+                        try:
+                            st = entry.stat()
+                            stats[entry.name] = (st.st_mtime, st.st_size)
+                        except OSError:
+                            stats[entry.name] = (0, 0)
+            index = 0 if sort_by == 'mtime' else 1
+            selected = heapq.nlargest(wanted, names, key=lambda name: stats[name][index])
+        
+        page = selected[offset:wanted]
+        files_list = "\n".join(f"{offset + i + 1}. {file}" for i, file in enumerate(page))
+        result = f"Files in {os.path.basename(directory)}:\n{files_list}"
+        if wanted < len(names):
+            result += f"\nShowing {offset + 1}-{offset + len(page)} of {len(names)}. Say 'show more files' for the next page."
+        return result
+
     def open_website(self, command: str) -> str:
         """Open specific websites"""
         try:
@@ -1092,7 +4812,7 @@ Current Detection:
                     }
                     site = common_sites.get(site.lower(), f"https://www.{site}.com")
             
-            webbrowser.open(site)
+            self.host_actions.open_url(site)
             return f"Opening {site} in your browser"
             
         except Exception as e:
@@ -1103,33 +4823,33 @@ Current Detection:
         try:
             if 'calculator' in command:
                 if sys.platform.startswith('win'):
-                    subprocess.Popen(['calc'])
+                    self.host_actions.launch(['calc'])
                 elif sys.platform.startswith('darwin'):
-                    subprocess.Popen(['open', '-a', 'Calculator'])
+                    self.host_actions.launch(['open', '-a', 'Calculator'])
                 else:
-                    subprocess.Popen(['gnome-calculator'])
+                    self.host_actions.launch(['gnome-calculator'])
                 return "Opening calculator"
             
             elif 'notepad' in command or 'text editor' in command:
                 if sys.platform.startswith('win'):
-                    subprocess.Popen(['notepad'])
+                    self.host_actions.launch(['notepad'])
                 elif sys.platform.startswith('darwin'):
-                    subprocess.Popen(['open', '-a', 'TextEdit'])
+                    self.host_actions.launch(['open', '-a', 'TextEdit'])
                 else:
-                    subprocess.Popen(['gedit'])
+                    self.host_actions.launch(['gedit'])
                 return "Opening text editor"
             
             elif 'browser' in command or 'chrome' in command:
-                webbrowser.open('https://www.google.com')
+                self.host_actions.open_url('https://www.google.com')
                 return "Opening web browser"
             
             elif 'file explorer' in command or 'files' in command:
                 if sys.platform.startswith('win'):
-                    subprocess.Popen(['explorer'])
+                    self.host_actions.launch(['explorer'])
                 elif sys.platform.startswith('darwin'):
-                    subprocess.Popen(['open', '-a', 'Finder'])
+                    self.host_actions.launch(['open', '-a', 'Finder'])
                 else:
-                    subprocess.Popen(['nautilus'])
+                    self.host_actions.launch(['nautilus'])
                 return "Opening file explorer"
             
             else:
@@ -1138,16 +4858,33 @@ Current Detection:
         except Exception as e:
             return f"Error opening application: {str(e)}"
 
-    def take_screenshot(self) -> str:
+    def get_screenshot_pipeline(self) -> ScreenshotPipeline:
+        """Get the screenshot pipeline, creating it on first use"""
+        if self.screenshot_pipeline is None:
+            self.screenshot_pipeline = ScreenshotPipeline(
+                PyAutoGUICaptureBackend(),
+                os.path.expanduser("~/Desktop"),
+                image_format=self.config.get('screenshot_format', 'png'),
+                png_compress_level=self.config.get('screenshot_png_level', 1),
+                quality=self.config.get('screenshot_quality', 85),
+                skip_duplicates=self.config.get('screenshot_skip_duplicates', True)
+            )
+        return self.screenshot_pipeline
+
+    def take_screenshot(self, command: str = "") -> str:
         """Take a screenshot"""
         try:
-            desktop_path = os.path.expanduser("~/Desktop")
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            screenshot_path = os.path.join(desktop_path, f"jarvis_screenshot_{timestamp}.png")
+            region = self.config.get('screenshot_region')
+            monitor = self.config.get('screenshot_monitor')
+            match = re.search(r'(?:monitor|screen|display)\s+(\d+)', command)
+            if match:
+                monitor = int(match.group(1))
             
-            screenshot = pyautogui.screenshot()
-            screenshot.save(screenshot_path)
+            screenshot_path, is_new = self.get_screenshot_pipeline().capture(
+                region=tuple(region) if region else None, monitor=monitor)
             
+            if not is_new:
+                return f"The screen hasn't changed since the last screenshot: {screenshot_path}"
             return f"Screenshot saved to {screenshot_path}"
         except Exception as e:
             return f"Error taking screenshot: {str(e)}"
@@ -1159,20 +4896,33 @@ Current Detection:
                 if sys.platform.startswith('win'):
                     return "Volume control requires additional setup on Windows"
                 elif sys.platform.startswith('darwin'):
-                    subprocess.run(['osascript', '-e', 'set volume output volume (output volume of (get volume settings) + 10)'])
+                    self.host_actions.run(['osascript', '-e', 'set volume output volume (output volume of (get volume settings) + 10)'])
                     return "Volume increased"
                 else:
-                    subprocess.run(['amixer', '-D', 'pulse', 'sset', 'Master', '10%+'])
+                    self.host_actions.run(['amixer', '-D', 'pulse', 'sset', 'Master', '10%+'])
                     return "Volume increased"
             
             elif 'down' in command or 'decrease' in command:
                 if sys.platform.startswith('darwin'):
-                    subprocess.run(['osascript', '-e', 'set volume output volume (output volume of (get volume settings) - 10)'])
+                    self.host_actions.run(['osascript', '-e', 'set volume output volume (output volume of (get volume settings) - 10)'])
                     return "Volume decreased"
                 else:
-                    subprocess.run(['amixer', '-D', 'pulse', 'sset', 'Master', '10%-'])
+                    self.host_actions.run(['amixer', '-D', 'pulse', 'sset', 'Master', '10%-'])
                     return "Volume decreased"
             
+            elif 'level' in command or 'how loud' in command:
+                if sys.platform.startswith('darwin'):
+                    result = self.host_actions.run(['osascript', '-e', 'output volume of (get volume settings)'],
+                                            capture_output=True, text=True)
+                    return f"Volume is at {result.stdout.strip()} percent"
+                elif not sys.platform.startswith('win'):
+                    result = self.host_actions.run(['amixer', '-D', 'pulse', 'sget', 'Master'],
+                                            capture_output=True, text=True)
+                    match = re.search(r'\[(\d+)%\]', result.stdout)
+                    if match:
+                        return f"Volume is at {match.group(1)} percent"
+                return "I can't read the volume level on this system. Say 'volume up' or 'volume down'"
+            
             else:
                 return "Say 'volume up' or 'volume down'"
                 
@@ -1206,13 +4956,1117 @@ Current Detection:
         return "For security reasons, I can only open applications, not close them. Please close applications manually."
 
 
+class BatchCommandRunner:
+    """Runs a list of commands through process_command with bounded parallelism"""
+    
+    # Commands that read or change session state must keep their input order
+    STATEFUL_PHRASES = ['list files', 'show files', 'show more', 'more files', 'next page',
+                        'mute', 'unmute', 'silence', 'history', 'change voice']
+    
+    def __init__(self, jarvis: JarvisEnhanced, workers: int = 4):
+        self.jarvis = jarvis
+        self.workers = max(1, workers)
+    
+    @staticmethod
+    def read_commands(lines) -> List[str]:
+        """Parse plain-text commands or JSON history records, skipping blanks and comments"""
+        commands = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(f"Skipping malformed batch record: {line[:80]}")
+                    continue
+                line = str(record.get('command', '')).strip()
+                if not line:
+                    continue
+            commands.append(line)
+        return commands
+    
+    def dependency_key(self, command: str) -> Optional[str]:
+        """Get the ordering lane of a command, or None if it is independent"""
+        lowered = command.lower()
+        if any(phrase in lowered for phrase in self.STATEFUL_PHRASES):
+            return 'session'
+        return None
+    
+    def _run_one(self, index: int, command: str) -> Dict[str, Any]:
+        started = datetime.datetime.now().isoformat()
+        start = time.perf_counter()
+        try:
+            with self.jarvis.scheduler.interactive():
+                response = self.jarvis.process_command(command)
+            # Wait for deferred answers outside the interactive block, which
+            # would otherwise hold back the background work being waited on
+            response = self.jarvis.resolve_response(response)
+            ok = True
+        except Exception as e:
+            response = f"Error processing command: {str(e)}"
+            ok = False
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.jarvis.record_history({
+            'timestamp': started,
+            'command': command,
+            'response': response
+        })
+        return {'index': index, 'command': command, 'response': response, 'ok': ok,
+                'started_at': started, 'elapsed_ms': round(elapsed_ms, 3)}
+    
+    def _run_lane(self, items: List[tuple]) -> List[Dict[str, Any]]:
+        return [self._run_one(index, command) for index, command in items]
+    
+    def run(self, commands: List[str]) -> Iterator[Dict[str, Any]]:
+        """Execute commands and yield their results in input order as they complete"""
+        lanes = {}
+        tasks = []
+        for index, command in enumerate(commands):
+            key = self.dependency_key(command)
+            if key is None:
+                tasks.append([(index, command)])
+            elif key in lanes:
+                lanes[key].append((index, command))
+            else:
+                lanes[key] = [(index, command)]
+                tasks.append(lanes[key])
+        
+        results = queue.Queue()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='jarvis-batch') as executor:
+            for items in tasks:
+                future = executor.submit(self._run_lane, items)
+                future.add_done_callback(lambda f: results.put(f.result()))
+            
+            # Release results strictly in input order
+            ready = {}
+            next_index = 0
+            while next_index < len(commands):
+                for result in results.get():
+                    ready[result['index']] = result
+                while next_index in ready:
+                    yield ready.pop(next_index)
+                    next_index += 1
+
+
+class GatewaySession:
+    """One client's isolated assistant state inside the gateway"""
+    
+    def __init__(self, session_id: str, jarvis: JarvisEnhanced):
+        self.session_id = session_id
+        self.jarvis = jarvis
+        self.pending = deque()
+        self.in_flight = 0
+        self.scheduled = False
+        self.completed = 0
+        self.last_seen = time.monotonic()
+
+
+class FairScheduler:
+    """Round-robin dispatch of queued session commands onto a bounded worker pool"""
+    
+    def __init__(self, workers: int = 4, per_session_limit: int = 2, max_queue: int = 32):
+        self.per_session_limit = max(1, per_session_limit)
+        self.max_queue = max_queue
+        self.condition = threading.Condition()
+        self.rotation = deque()  # Sessions with queued work, in turn order
+        self.closed = False
+        self.threads = [threading.Thread(target=self._worker, name=f'jarvis-gateway-{i}', daemon=True)
+                        for i in range(max(1, workers))]
+        for thread in self.threads:
+            thread.start()
+    
+    def submit(self, session: GatewaySession, fn: Callable[[float], Any]) -> Future:
+        """Queue fn(queued_at) for a session; raises queue.Full past the session's queue limit"""
+        future = Future()
+        with self.condition:
+            if len(session.pending) >= self.max_queue:
+                raise queue.Full(f"Session {session.session_id} has too many queued commands")
+            session.pending.append((fn, future, time.perf_counter()))
+            if not session.scheduled:
+                session.scheduled = True
+                self.rotation.append(session)
+            self.condition.notify()
+        return future
+    
+    def _next_job(self) -> Optional[tuple]:
+        """Take the next job in round-robin order; the condition must be held"""
+        for _ in range(len(self.rotation)):
+            session = self.rotation.popleft()
+            if not session.pending:
+                session.scheduled = False
+                continue
+            if session.in_flight >= self.per_session_limit:
+                self.rotation.append(session)
+                continue
+            fn, future, queued_at = session.pending.popleft()
+            session.in_flight += 1
+            if session.pending:
+                self.rotation.append(session)
+            else:
+                session.scheduled = False
+            return session, fn, future, queued_at
+        return None
+    
+    def _worker(self):
+        while True:
+            with self.condition:
+                job = self._next_job()
+                while job is None:
+                    if self.closed:
+                        return
+                    self.condition.wait()
+                    job = self._next_job()
+            
+            session, fn, future, queued_at = job
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(queued_at))
+                except Exception as e:
+                    future.set_exception(e)
+            
+            with self.condition:
+                session.in_flight -= 1
+                if session.pending and not session.scheduled:
+                    session.scheduled = True
+                    self.rotation.append(session)
+                self.condition.notify()
+    
+    def queue_depth(self) -> int:
+        """Total number of queued commands across sessions"""
+        with self.condition:
+            return sum(len(session.pending) for session in self.rotation)
+    
+    def close(self):
+        """Stop the workers once they are idle"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class JarvisGateway:
+    """Hosts many isolated assistant sessions in one process over HTTP"""
+    
+    # Remote clients get no host side effects: nothing that opens or reads
+    # files, launches apps, uses the browser, screen, speakers or timers,
+    # or starts long scans
+    ALLOWED_HANDLERS = frozenset({'cancel_pending', 'search_files', 'list_files', 'list_files_next_page',
+                                  'get_system_status', 'get_time', 'get_date', 'get_diagnostics',
+                                  'handle_complex_query', 'get_help', 'get_command_history'})
+    
+    def __init__(self, engine: JarvisEnhanced, workers: Optional[int] = None,
+                 per_session_limit: Optional[int] = None, max_queue: Optional[int] = None,
+                 session_ttl: Optional[float] = None, token: str = ""):
+        config = engine.config
+        self.engine = engine
+        self.session_ttl = session_ttl or config.get('gateway_session_ttl', 3600)
+        self.token = token
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.scheduler = FairScheduler(workers or config.get('gateway_workers', 4),
+                                       per_session_limit or config.get('gateway_session_concurrency', 2),
+                                       max_queue or config.get('gateway_max_queue', 32))
+        self.commands_completed = 0
+        
+        # Build shared components once so every session reuses them
+        if engine.intent_classifier is None:
+            engine.intent_classifier = IntentClassifier()
+        if engine.duplicate_finder is None:
+            engine.duplicate_finder = DuplicateFinder(engine.safety_manager)
+    
+    def create_session(self) -> GatewaySession:
+        """Start a new isolated session"""
+        self.expire_sessions()
+        jarvis = self.engine.spawn_session()
+        jarvis.restrict_handlers(self.ALLOWED_HANDLERS)
+        session = GatewaySession(uuid.uuid4().hex, jarvis)
+        with self.lock:
+            self.sessions[session.session_id] = session
+        logging.info(f"Gateway session {session.session_id} created")
+        return session
+    
+    def get_session(self, session_id: str) -> Optional[GatewaySession]:
+        with self.lock:
+            session = self.sessions.get(session_id)
+        if session:
+            session.last_seen = time.monotonic()
+        return session
+    
+    def close_session(self, session_id: str) -> bool:
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+    
+    def expire_sessions(self):
+        """Drop sessions idle for longer than the session TTL"""
+        cutoff = time.monotonic() - self.session_ttl
+        with self.lock:
+            expired = [sid for sid, session in self.sessions.items()
+                       if session.last_seen < cutoff and not session.in_flight and not session.pending]
+            for sid in expired:
+                del self.sessions[sid]
+        if expired:
+            logging.info(f"Gateway expired {len(expired)} idle session(s)")
+    
+    def run_command(self, session: GatewaySession, command: str, timeout: float = 60.0) -> Dict[str, Any]:
+        """Run a command in a session through the fair scheduler and wait for the result"""
+        def execute(queued_at: float) -> Dict[str, Any]:
+            started = time.perf_counter()
+            with session.jarvis.scheduler.interactive():
+                response = session.jarvis.process_command(command)
+            response = session.jarvis.resolve_response(response, timeout=timeout)
+            finished = time.perf_counter()
+            session.jarvis.record_history({
+                'timestamp': datetime.datetime.now().isoformat(),
+                'command': command,
+                'response': response
+            })
+            session.completed += 1
+            self.commands_completed += 1
+            return {'response': response,
+                    'queued_ms': round((started - queued_at) * 1000, 3),
+                    'elapsed_ms': round((finished - started) * 1000, 3)}
+        
+        return self.scheduler.submit(session, execute).result(timeout=timeout)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            sessions = len(self.sessions)
+        return {'sessions': sessions, 'queued': self.scheduler.queue_depth(),
+                'commands_completed': self.commands_completed}
+    
+    def make_server(self, host: str = '127.0.0.1', port: int = 8765) -> ThreadingHTTPServer:
+        """Create the HTTP server; call serve_forever() on it to start handling requests"""
+        server = GatewayHTTPServer((host, port), GatewayRequestHandler)
+        server.gateway = self
+        return server
+
+
+class GatewayHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a listen backlog sized for many clients"""
+    
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class GatewayRequestHandler(BaseHTTPRequestHandler):
+    """JSON API of the gateway
+
+    POST   /sessions                 create a session
+    POST   /sessions/<id>/commands   run {"command": "..."} in a session
+    GET    /sessions/<id>/history    command history of a session
+    DELETE /sessions/<id>            close a session
+    GET    /stats                    gateway statistics
+    """
+    
+    def log_message(self, format, *args):
+        logging.debug(f"Gateway {self.address_string()} - {format % args}")
+    
+    def _send(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _authorized(self) -> bool:
+        token = self.server.gateway.token
+        if token and not hmac.compare_digest(self.headers.get('Authorization', '').encode(),
+                                             f"Bearer {token}".encode()):
+            self._send(401, {'error': 'unauthorized'})
+            return False
+        return True
+    
+    def _session(self, parts: List[str]) -> Optional[GatewaySession]:
+        session = self.server.gateway.get_session(parts[1]) if len(parts) > 1 else None
+        if session is None:
+            self._send(404, {'error': 'unknown session'})
+        return session
+    
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts = self.path.strip('/').split('/')
+        if parts == ['stats']:
+            self._send(200, self.server.gateway.stats())
+        elif len(parts) == 3 and parts[0] == 'sessions' and parts[2] == 'history':
+            session = self._session(parts)
+            if session:
+                self._send(200, {'history': session.jarvis.command_history})
+        else:
+            self._send(404, {'error': 'not found'})
+    
+    def do_POST(self):
+        if not self._authorized():
+            return
+        gateway = self.server.gateway
+        parts = self.path.strip('/').split('/')
+        if parts == ['sessions']:
+            self._send(201, {'session_id': gateway.create_session().session_id})
+        elif len(parts) == 3 and parts[0] == 'sessions' and parts[2] == 'commands':
+            session = self._session(parts)
+            if not session:
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                command = str(json.loads(self.rfile.read(length) or b'{}').get('command', '')).strip()
+            except (ValueError, AttributeError):
+                self._send(400, {'error': 'invalid JSON body'})
+                return
+            if not command:
+                self._send(400, {'error': 'missing command'})
+                return
+            try:
+                self._send(200, gateway.run_command(session, command))
+            except queue.Full as e:
+                self._send(429, {'error': str(e)})
+            except Exception as e:
+                logging.error(f"Gateway command error: {e}")
+                self._send(500, {'error': str(e)})
+        else:
+            self._send(404, {'error': 'not found'})
+    
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        parts = self.path.strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'sessions' and self.server.gateway.close_session(parts[1]):
+            self._send(200, {'closed': parts[1]})
+        else:
+            self._send(404, {'error': 'unknown session'})
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def is_loopback_host(host: str) -> bool:
+    """Whether a bind address only accepts local connections"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def run_gateway_load_test(sessions: int = 50, commands_per_session: int = 20, workers: int = 4,
+                          think_time: float = 10.0) -> Dict[str, Any]:
+    """Drive a local gateway with many concurrent sessions and measure CPU cost per command"""
+    engine = JarvisEnhanced(headless=True)
+    gateway = JarvisGateway(engine, workers=workers)
+    server = gateway.make_server('127.0.0.1', 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    
+    # Local commands only, so the measurement is the gateway and handlers, not the network
+    script = ['what time is it', 'what is the date today', 'ai status', 'list files',
+              'show more files', "what's the clock say", 'history']
+    latencies = []
+    errors = []
+    
+    def post(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        request = urllib.request.Request(base_url + path, data=json.dumps(payload).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(request, timeout=60) as reply:
+            return json.loads(reply.read())
+    
+    def client():
+        try:
+            session_id = post('/sessions', {})['session_id']
+            for i in range(commands_per_session):
+                start = time.perf_counter()
+                post(f'/sessions/{session_id}/commands', {'command': script[i % len(script)]})
+                latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(str(e))
+    
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(sessions)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    server.shutdown()
+    gateway.scheduler.close()
+    
+    completed = len(latencies)
+    commands_per_cpu_second = completed / cpu if cpu > 0 else 0.0
+    return {
+        'sessions': sessions,
+        'commands': completed,
+        'errors': len(errors),
+        'wall_s': round(wall, 3),
+        'throughput_per_s': round(completed / wall, 1) if wall > 0 else 0.0,
+        'latency_p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+        'latency_p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+        'latency_p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+        'cpu_s': round(cpu, 3),
+        'commands_per_core_second': round(commands_per_cpu_second, 1),
+        # Clients and server share this process, so this is a conservative estimate
+        'sessions_per_core': int(commands_per_cpu_second * think_time),
+        'assumed_think_time_s': think_time
+    }
+
+
+class ProviderStubServer(ThreadingHTTPServer):
+    """Local stand-in for the OpenAI and Gemini endpoints used by AIIntegration
+
+    Latency follows a log-normal distribution around latency_ms, and each
+    error kind ('quota', 'rate_limit', 'empty', 'server') is injected with
+    its own probability.
+    """
+    
+    daemon_threads = True
+    request_queue_size = 256
+    
+    def __init__(self, address: tuple, latency_ms: float = 300.0, latency_sigma: float = 0.5,
+                 error_rates: Optional[Dict[str, float]] = None, stream_chunks: int = 5,
+                 reply_text: str = "This is a stubbed provider response."):
+        super().__init__(address, ProviderStubHandler)
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rates = error_rates or {}
+        self.stream_chunks = max(1, stream_chunks)
+        self.reply_text = reply_text
+        self.counts = {}
+        self.lock = threading.Lock()
+    
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+    
+    def count(self, key: str):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+    
+    def sample_latency(self) -> float:
+        """Seconds to wait before answering"""
+        if self.latency_ms <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(self.latency_ms / 1000), self.latency_sigma)
+    
+    def pick_error(self) -> Optional[str]:
+        roll = random.random()
+        for kind, rate in self.error_rates.items():
+            if roll < rate:
+                return kind
+            roll -= rate
+        return None
+
+
+class ProviderStubHandler(BaseHTTPRequestHandler):
+    """Speaks the subset of the OpenAI chat and Gemini generateContent APIs we use"""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    OPENAI_ERRORS = {
+        'quota': (429, {'error': {'message': 'You exceeded your current quota (insufficient_quota).',
+                                  'type': 'insufficient_quota', 'code': 'insufficient_quota'}}),
+        'rate_limit': (429, {'error': {'message': 'Rate limit reached (rate_limit_exceeded).',
+                                       'type': 'requests', 'code': 'rate_limit_exceeded'}}),
+        'server': (500, {'error': {'message': 'The server had an error.', 'type': 'server_error'}}),
+    }
+    GEMINI_ERRORS = {
+        'quota': (429, {'error': {'code': 429, 'status': 'RESOURCE_EXHAUSTED',
+                                  'message': 'Resource has been exhausted (e.g. check quota).'}}),
+        'rate_limit': (429, {'error': {'code': 429, 'status': 'RESOURCE_EXHAUSTED',
+                                       'message': 'Too many requests, rate limit exceeded.'}}),
+        'server': (500, {'error': {'code': 500, 'status': 'INTERNAL', 'message': 'Internal error.'}}),
+    }
+    
+    def log_message(self, format, *args):
+        logging.debug(f"Provider stub - {format % args}")
+    
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_stream(self, events: List[Dict[str, Any]], done_marker: bool, sse: bool = True):
+        """Stream events as server-sent events, or as a JSON array when the client didn't ask for SSE"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream' if sse else 'application/json')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        pause = self.server.sample_latency() / len(events)
+        try:
+            if not sse:
+                self.wfile.write(b"[")
+            for i, event in enumerate(events):
+                if sse:
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                else:
+                    self.wfile.write(((",\r\n" if i else "") + json.dumps(event)).encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(pause)
+            if not sse:
+                self.wfile.write(b"]")
+            elif done_marker:
+                self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client gave up on the stream
+    
+    def _chunks(self, text: str) -> List[str]:
+        words = text.split(' ')
+        size = max(1, math.ceil(len(words) / self.server.stream_chunks))
+        return [' '.join(words[i:i + size]) + (' ' if i + size < len(words) else '')
+                for i in range(0, len(words), size)]
+    
+    def do_POST(self):
+        stub = self.server
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': {'message': 'invalid JSON'}})
+            return
+        
+        path = self.path.split('?')[0]
+        if path.endswith('/chat/completions'):
+            provider = 'openai'
+            stream = bool(body.get('stream'))
+        elif ':generateContent' in path or ':streamGenerateContent' in path:
+            provider = 'gemini'
+            stream = ':streamGenerateContent' in path
+        else:
+            self._send_json(404, {'error': {'message': f'unknown path {path}'}})
+            return
+        
+        error = stub.pick_error()
+        stub.count(f"{provider}:{error or 'ok'}")
+        errors = self.OPENAI_ERRORS if provider == 'openai' else self.GEMINI_ERRORS
+        if error in errors:
+            time.sleep(stub.sample_latency() / 4)
+            self._send_json(*errors[error])
+            return
+        
+        text = '' if error == 'empty' else stub.reply_text
+        if provider == 'openai':
+            model = body.get('model', 'gpt-3.5-turbo')
+            if stream:
+                events = [{'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                           'model': model, 'choices': [{'index': 0, 'delta': {'content': chunk},
+                                                        'finish_reason': None}]}
+                          for chunk in self._chunks(text)]
+                events[-1]['choices'][0]['finish_reason'] = 'stop'
+                self._send_stream(events, done_marker=True)
+            else:
+                time.sleep(stub.sample_latency())
+                self._send_json(200, {
+                    'id': 'chatcmpl-stub', 'object': 'chat.completion', 'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text},
+                                 'finish_reason': 'stop'}],
+                    'usage': {'prompt_tokens': 10, 'completion_tokens': len(text.split()),
+                              'total_tokens': 10 + len(text.split())}
+                })
+        else:
+            def candidate(chunk: str) -> Dict[str, Any]:
+                parts = [{'text': chunk}] if chunk else []
+                return {'candidates': [{'content': {'parts': parts, 'role': 'model'},
+                                        'finishReason': 'STOP', 'index': 0}]}
+            if stream:
+                self._send_stream([candidate(chunk) for chunk in self._chunks(text)], done_marker=False,
+                                  sse='alt=sse' in self.path)
+            else:
+                time.sleep(stub.sample_latency())
+                self._send_json(200, candidate(text))
+
+
+class ReplayAIIntegration(AIIntegration):
+    """Answers AI queries from recorded provider replies instead of the network"""
+    
+    def __init__(self, events: List[Dict[str, Any]], speed: float = 0.0):
+        super().__init__(stats=ProviderStats(path=Path(tempfile.gettempdir()) / 'jarvis_replay_stats.json'))
+        self.speed = speed
+        self.replies = {}
+        for event in events:
+            self.replies.setdefault(event['prompt'], deque()).append(event)
+        self.providers = sorted({event['provider'] for event in events})
+        self.misses = 0
+    
+    def is_available(self) -> bool:
+        return bool(self.providers)
+    
+    def available_providers(self) -> List[str]:
+        return list(self.providers)
+    
+    def query(self, prompt: str) -> str:
+        """Return the reply recorded for this prompt, after its recorded latency scaled by speed"""
+        replies = self.replies.get(prompt)
+        if not replies:
+            self.misses += 1
+            return "Error: no recorded provider reply for this prompt"
+        event = replies.popleft() if len(replies) > 1 else replies[0]
+        if self.speed > 0:
+            time.sleep(event['latency_ms'] / 1000 / self.speed)
+        return event['response']
+    
+    def get_status(self) -> str:
+        return f"Replay: {sum(len(r) for r in self.replies.values())} recorded provider replies"
+
+
+class SessionReplayer:
+    """Feeds a recorded session back through the voice pipeline and compares timings
+
+    Audio clips go through the real preprocessing; recognition and provider
+    calls are answered from the recording. speed=1 replays in real time,
+    higher values accelerate and 0 runs without any waiting. Side effects
+    (browser, launched apps, volume, screen capture) are suppressed.
+    """
+    
+    def __init__(self, archive_path: str, speed: float = 0.0):
+        self.archive_path = archive_path
+        self.speed = speed
+        with zipfile.ZipFile(archive_path) as archive:
+            self.clips = {name: archive.read(name) for name in archive.namelist() if name.startswith('audio/')}
+            lines = [line for name in sorted(archive.namelist()) if name.startswith('events/')
+                     for line in archive.read(name).decode('utf-8').splitlines() if line.strip()]
+        self.events = sorted((json.loads(line) for line in lines), key=lambda e: e['seq'])
+    
+    def load_clip(self, name: str):
+        """Read a recorded clip as AudioData"""
+        with wave.open(io.BytesIO(self.clips[name]), 'rb') as wav:
+            return sr.AudioData(wav.readframes(wav.getnframes()), wav.getframerate(), wav.getsampwidth())
+    
+    @contextlib.contextmanager
+    def _sandbox(self, jarvis: JarvisEnhanced):
+        """Route AI calls to the recording and disable side effects"""
+        previous_ai = jarvis.ai
+        jarvis.ai = ReplayAIIntegration([e for e in self.events if e['type'] == 'provider'], self.speed)
+        try:
+            with jarvis.dry_run():
+                yield
+        finally:
+            jarvis.ai = previous_ai
+    
+    def _wait_until(self, event: Dict[str, Any], origin: float, started: float):
+        """In real-time or accelerated mode, keep the recorded spacing between events"""
+        if self.speed > 0:
+            delay = (event['t'] - origin) / self.speed - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+    
+    def run(self, jarvis: JarvisEnhanced) -> Dict[str, Any]:
+        """Replay every utterance and return a timing and accuracy report"""
+        random.seed(0)  # Provider exploration is the only randomness on this path
+        transcripts, commands = [], []
+        answers = {e['command_seq']: e for e in self.events if e['type'] == 'answer'}
+        origin = self.events[0]['t'] if self.events else 0.0
+        started = time.perf_counter()
+        with self._sandbox(jarvis):
+            for event in self.events:
+                if event['type'] == 'transcript' and event.get('clip') in self.clips:
+                    self._wait_until(event, origin, started)
+                    audio = self.load_clip(event['clip'])
+                    start = time.perf_counter()
+                    jarvis.prepare_audio(audio, label="wake word" if event['stage'] == 'wake' else "command")
+                    preprocess_ms = (time.perf_counter() - start) * 1000
+                    if self.speed > 0:
+                        time.sleep(event['recognize_ms'] / 1000 / self.speed)
+                    transcripts.append({'clip': event['clip'], 'stage': event['stage'],
+                                        'recorded_ms': event['preprocess_ms'],
+                                        'replay_ms': round(preprocess_ms, 2)})
+                elif event['type'] == 'command':
+                    self._wait_until(event, origin, started)
+                    start = time.perf_counter()
+                    with jarvis.scheduler.interactive():
+                        response = jarvis.execute_voice_command(event['command'])
+                    process_ms = (time.perf_counter() - start) * 1000
+                    full = jarvis.resolve_response(response, timeout=60)
+                    total_ms = (time.perf_counter() - start) * 1000
+                    answer = answers.get(event['seq'], {})
+                    recorded_full = f"{event['response']} {answer['answer']}" if answer.get('answer') else event['response']
+                    commands.append({
+                        'seq': event['seq'],
+                        'command': event['command'],
+                        'route': jarvis._route_local.route,
+                        'recorded_route': event.get('route'),
+                        'recorded_ms': event['process_ms'],
+                        'replay_ms': round(process_ms, 2),
+                        'recorded_total_ms': answer.get('total_ms', event['process_ms']),
+                        'replay_total_ms': round(total_ms, 2),
+                        'response_changed': str(full).strip() != str(recorded_full).strip(),
+                    })
+        
+        def timing(rows: List[Dict[str, Any]], recorded: str, replay: str) -> Dict[str, float]:
+            return {f"{key}_{p}": _percentile([row[key] for row in rows], p)
+                    for key in (recorded, replay) for p in (50, 95)}
+        
+        return {
+            'archive': str(self.archive_path),
+            'speed': self.speed,
+            'wall_seconds': round(time.perf_counter() - started, 3),
+            'summary': {
+                'commands': len(commands),
+                'clips': len(transcripts),
+                'responses_changed': sum(c['response_changed'] for c in commands),
+                'routes_changed': sum(c['route'] != c['recorded_route'] for c in commands),
+                'process': timing(commands, 'recorded_ms', 'replay_ms'),
+                'total': timing(commands, 'recorded_total_ms', 'replay_total_ms'),
+                'preprocess': timing(transcripts, 'recorded_ms', 'replay_ms'),
+            },
+            'commands': commands,
+            'clips': transcripts,
+        }
+    
+    @staticmethod
+    def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+        """Latency differences between two replay reports, e.g. from two builds"""
+        before = {c['seq']: c for c in baseline.get('commands', [])}
+        rows = []
+        for command in current.get('commands', []):
+            old = before.get(command['seq'])
+            if old:
+                rows.append({'seq': command['seq'], 'command': command['command'],
+                             'baseline_ms': old['replay_ms'], 'current_ms': command['replay_ms'],
+                             'delta_ms': round(command['replay_ms'] - old['replay_ms'], 2),
+                             'route_changed': old['route'] != command['route']})
+        deltas = [row['delta_ms'] for row in rows]
+        
+        def shift(section: str, key: str) -> Optional[float]:
+            a = baseline.get('summary', {}).get(section, {}).get(key)
+            b = current.get('summary', {}).get(section, {}).get(key)
+            return round(b - a, 2) if a is not None and b is not None else None
+        
+        return {
+            'matched_commands': len(rows),
+            'process_p50_delta_ms': shift('process', 'replay_ms_50'),
+            'process_p95_delta_ms': shift('process', 'replay_ms_95'),
+            'total_p50_delta_ms': shift('total', 'replay_total_ms_50'),
+            'preprocess_p50_delta_ms': shift('preprocess', 'replay_ms_50'),
+            'largest_regressions': sorted(rows, key=lambda row: row['delta_ms'], reverse=True)[:5] if deltas else [],
+        }
+
+
+def run_load_generator(jarvis: JarvisEnhanced, commands: List[str], qps: float,
+                       duration: float = 10.0, max_workers: int = 64) -> Dict[str, Any]:
+    """Drive process_command at a target rate and report throughput and latency percentiles
+
+    Requests are issued on a fixed schedule (open loop). Latency is measured
+    from each request's scheduled start, so a backed-up engine shows up as
+    queueing delay instead of silently lowering the offered load.
+    """
+    if not commands:
+        raise ValueError("No commands to send")
+    if qps <= 0:
+        raise ValueError(f"Request rate must be positive, got {qps}")
+    interval = 1.0 / qps
+    total = max(1, int(qps * duration))
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+    
+    def run(command: str, scheduled: float):
+        with jarvis.scheduler.interactive():
+            response = jarvis.process_command(command)
+        response = jarvis.resolve_response(response)
+        latency = time.perf_counter() - scheduled
+        with lock:
+            latencies.append(latency)
+            if AIIntegration.is_error_response(response):
+                failures.append(response[:80])
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='jarvis-load') as executor:
+        for i in range(total):
+            scheduled = start + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(run, commands[i % len(commands)], scheduled)
+    wall = time.perf_counter() - start
+    
+    failure_kinds = {}
+    for message in failures:
+        failure_kinds[message] = failure_kinds.get(message, 0) + 1
+    return {
+        'target_qps': qps,
+        'requests': len(latencies),
+        'achieved_qps': round(len(latencies) / wall, 1) if wall > 0 else 0.0,
+        'errors': len(failures),
+        'error_kinds': failure_kinds,
+        'latency_p50_ms': round(_percentile(latencies, 50) * 1000, 1),
+        'latency_p95_ms': round(_percentile(latencies, 95) * 1000, 1),
+        'latency_p99_ms': round(_percentile(latencies, 99) * 1000, 1),
+        'latency_max_ms': round(max(latencies, default=0.0) * 1000, 1)
+    }
+
+
+def start_provider_stub(args) -> ProviderStubServer:
+    """Start a ProviderStubServer in a background thread from command line options"""
+    error_rates = {kind: rate for kind, rate in (('quota', args.stub_quota_rate),
+                                                 ('rate_limit', args.stub_rate_limit_rate),
+                                                 ('empty', args.stub_empty_rate),
+                                                 ('server', args.stub_server_error_rate)) if rate > 0}
+    stub = ProviderStubServer((args.host, args.stub_port), latency_ms=args.stub_latency_ms,
+                              latency_sigma=args.stub_latency_sigma, error_rates=error_rates)
+    threading.Thread(target=stub.serve_forever, name='jarvis-provider-stub', daemon=True).start()
+    logging.info(f"Provider stub listening on {stub.base_url} "
+                 f"(OpenAI base URL {stub.base_url}/v1, Gemini endpoint {stub.base_url})")
+    return stub
+
+
+def use_provider_stub(jarvis: JarvisEnhanced, args) -> ProviderStubServer:
+    """Start a provider stub and point the assistant's AI clients at it"""
+    stub = start_provider_stub(args)
+    jarvis.config['openai_base_url'] = f"{stub.base_url}/v1"
+    jarvis.config['gemini_base_url'] = stub.base_url
+    jarvis.config['openai_api_key'] = jarvis.config.get('openai_api_key') or 'stub-key'
+    jarvis.config['gemini_api_key'] = jarvis.config.get('gemini_api_key') or 'stub-key'
+    # Stub latencies and injected errors must not reach the real provider statistics
+    stats_dir = tempfile.mkdtemp(prefix='jarvis-stub-')
+    atexit.register(shutil.rmtree, stats_dir, True)
+    jarvis.ai.stats = ProviderStats(path=Path(stats_dir) / 'provider_stats.json')
+    jarvis.load_api_keys()
+    return stub
+
+
+def run_probe_mode(args) -> Dict[str, Any]:
+    """Benchmark the configured AI providers from the command line"""
+    jarvis = JarvisEnhanced(headless=True)
+    stub = use_provider_stub(jarvis, args) if args.with_stub else None
+    probe = ProviderProbe(jarvis.ai, requests_per_provider=args.probe_providers,
+                          concurrency=args.workers or 2, record_stats=not stub)
+    summary = probe.run(lambda result: print(ProviderProbe.format_result(result), file=sys.stderr))
+    if stub:
+        stub.shutdown()
+    return summary
+
+
+def run_load_test_mode(args) -> Dict[str, Any]:
+    """Run the load generator, optionally against an in-process provider stub"""
+    if args.batch:
+        with open(args.batch, 'r', encoding='utf-8') as f:
+            commands = BatchCommandRunner.read_commands(f)
+        if not commands:
+            raise ValueError(f"No commands found in {args.batch}")
+    else:
+        commands = ['explain how rainbows form', 'tell me about the moon', 'what time is it',
+                    'system status', 'what is the date today']
+    
+    jarvis = JarvisEnhanced(headless=True)
+    stub = use_provider_stub(jarvis, args) if args.with_stub else None
+    
+    with (contextlib.nullcontext() if args.live else jarvis.dry_run()):
+        report = run_load_generator(jarvis, commands, args.load_test, duration=args.duration)
+    if stub:
+        report['stub_requests'] = dict(stub.counts)
+        stub.shutdown()
+    return report
+
+
+def run_batch_mode(args) -> int:
+    """Run commands from a file or stdin and write JSON Lines results"""
+    if args.batch == '-':
+        commands = BatchCommandRunner.read_commands(sys.stdin)
+    else:
+        with open(args.batch, 'r', encoding='utf-8') as f:
+            commands = BatchCommandRunner.read_commands(f)
+    
+    jarvis = JarvisEnhanced(headless=True)
+    workers = args.workers or jarvis.config.get('batch_workers', 4)
+    runner = BatchCommandRunner(jarvis, workers=workers)
+    
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    start = time.perf_counter()
+    failures = 0
+    # Replayed usage logs must not open tabs, launch apps or change the volume unless asked to
+    with (contextlib.nullcontext() if args.live else jarvis.dry_run()) as skipped:
+        try:
+            for result in runner.run(commands):
+                failures += not result['ok']
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+        finally:
+            if output is not sys.stdout:
+                output.close()
+    if skipped and skipped.actions:
+        logging.info(f"Dry run skipped {len(skipped.actions)} host action(s); use --live to perform them")
+    
+    elapsed = time.perf_counter() - start
+    rate = len(commands) / elapsed if elapsed > 0 else 0.0
+    logging.info(f"Batch finished: {len(commands)} commands in {elapsed:.2f}s "
+                 f"({rate:.1f}/s, {workers} workers, {failures} failed)")
+    return 1 if failures else 0
+
+
+def benchmark_idle_listener(jarvis: JarvisEnhanced, seconds: float = 30.0) -> Dict[str, Any]:
+    """Measure process CPU of the wake-word listener pinned to each mode in a quiet room
+
+    'active' is the always-on loop used before duty cycling; the others
+    are what the listener falls back to once nobody has spoken for a while.
+    """
+    duty = jarvis.duty_cycle
+    results = {}
+    for mode in ('active', 'idle', 'deep'):
+        duty.forced = mode
+        stop = threading.Event()
+        listener = threading.Thread(target=jarvis.listen_for_wake_word, args=(stop,), daemon=True)
+        wall, cpu = time.monotonic(), time.process_time()
+        listener.start()
+        time.sleep(seconds)
+        stop.set()
+        listener.join(timeout=5)
+        wall, cpu = time.monotonic() - wall, time.process_time() - cpu
+        results[mode] = {'seconds': round(wall, 1), 'cpu_percent': round(100 * cpu / wall, 2),
+                         'recognitions': duty.stats[mode]['recognitions']}
+    duty.forced = None
+    before = results['active']['cpu_percent']
+    for mode in ('idle', 'deep'):
+        if before > 0:
+            results[mode]['cpu_reduction_percent'] = round(100 * (1 - results[mode]['cpu_percent'] / before), 1)
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="JARVIS Enhanced AI Desktop Assistant")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="run commands from FILE ('-' for stdin) and print JSON Lines results")
+    parser.add_argument('--live', action='store_true',
+                        help="let --batch and --load-test open the browser, launch apps, take real "
+                             "screenshots and change the volume (dry run by default)")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="maximum number of commands run in parallel in batch mode")
+    parser.add_argument('--output', metavar='FILE', help="write batch results or the replay report to FILE instead of stdout")
+    parser.add_argument('--gateway', action='store_true',
+                        help="serve many client sessions over HTTP instead of starting the GUI")
+    parser.add_argument('--host', default='127.0.0.1', help="gateway bind address")
+    parser.add_argument('--port', type=int, default=8765, help="gateway port")
+    parser.add_argument('--gateway-load-test', type=int, metavar='SESSIONS',
+                        help="load test an in-process gateway with SESSIONS concurrent clients and exit")
+    parser.add_argument('--stub-server', action='store_true',
+                        help="run a local OpenAI/Gemini-compatible stub server")
+    parser.add_argument('--stub-port', type=int, default=8766, help="provider stub port")
+    parser.add_argument('--stub-latency-ms', type=float, default=300.0, help="median stub latency")
+    parser.add_argument('--stub-latency-sigma', type=float, default=0.5, help="log-normal spread of stub latency")
+    parser.add_argument('--stub-quota-rate', type=float, default=0.0, help="fraction of quota errors")
+    parser.add_argument('--stub-rate-limit-rate', type=float, default=0.0, help="fraction of rate limit errors")
+    parser.add_argument('--stub-empty-rate', type=float, default=0.0, help="fraction of empty responses")
+    parser.add_argument('--stub-server-error-rate', type=float, default=0.0, help="fraction of server errors")
+    parser.add_argument('--load-test', type=float, metavar='QPS',
+                        help="drive process_command at QPS and report latency percentiles "
+                             "(commands from --batch FILE if given)")
+    parser.add_argument('--duration', type=float, default=10.0, help="load test duration in seconds")
+    parser.add_argument('--with-stub', action='store_true',
+                        help="point the AI providers at an in-process stub server during --load-test or --probe-providers")
+    parser.add_argument('--probe-providers', type=int, metavar='N',
+                        help="send N streamed requests to each AI provider and report latency percentiles")
+    parser.add_argument('--record', metavar='DIR', nargs='?', const='',
+                        help="record voice sessions (audio, transcripts, replies, timings) for replay")
+    parser.add_argument('--replay', metavar='ARCHIVE',
+                        help="replay a recorded session archive and print a timing report")
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help="replay speed: 1 for real time, higher to accelerate, 0 for no waiting (default)")
+    parser.add_argument('--baseline', metavar='REPORT',
+                        help="earlier --replay report to compare latencies against")
+    parser.add_argument('--diagnostics', action='store_true',
+                        help="print a resource diagnostics report as JSON and exit")
+    parser.add_argument('--audio-report', nargs='+', metavar='WAV',
+                        help="report upload payload sizes of WAV files (or folders) before and after preprocessing")
+    parser.add_argument('--bench-screenshot', type=int, metavar='FRAMES',
+                        help="benchmark the screenshot pipeline with synthetic frames and exit")
+    parser.add_argument('--screenshot-format', default='png', choices=['png', 'jpeg', 'webp'],
+                        help="image format used by --bench-screenshot")
+    parser.add_argument('--idle-benchmark', type=float, metavar='SECONDS',
+                        help="measure wake-word listener CPU in each idle mode for SECONDS each and exit")
+    args = parser.parse_args(argv)
+    if args.load_test is not None and args.load_test <= 0:
+        parser.error("--load-test QPS must be positive")
+    return args
+
+
 def main():
     """Main function to run JARVIS Enhanced - FIXED VERSION"""
+    args = parse_args()
+    if args.load_test:
+        try:
+            report = run_load_test_mode(args)
+        except ValueError as e:
+            print(f"Load test not started: {e}", file=sys.stderr)
+            sys.exit(2)
+        print(json.dumps(report, indent=2))
+        return
+    if args.stub_server:
+        stub = start_provider_stub(args)
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            stub.shutdown()
+        return
+    if args.batch:
+        sys.exit(run_batch_mode(args))
+    if args.gateway:
+        token = os.getenv('JARVIS_GATEWAY_TOKEN', '')
+        if not token and not is_loopback_host(args.host):
+            print(f"Refusing to serve on {args.host} without JARVIS_GATEWAY_TOKEN set", file=sys.stderr)
+            sys.exit(2)
+        gateway = JarvisGateway(JarvisEnhanced(headless=True), token=token)
+        server = gateway.make_server(args.host, args.port)
+        logging.info(f"JARVIS gateway listening on http://{args.host}:{args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logging.info("JARVIS gateway shutdown by user")
+        return
+    if args.gateway_load_test:
+        print(json.dumps(run_gateway_load_test(args.gateway_load_test, workers=args.workers or 4), indent=2))
+        return
+    if args.replay:
+        jarvis = JarvisEnhanced(headless=True)
+        report = SessionReplayer(args.replay, speed=args.speed).run(jarvis)
+        if args.baseline:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                report['comparison'] = SessionReplayer.compare(json.load(f), report)
+        output = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(output)
+        print(output)
+        return
+    if args.probe_providers:
+        print(json.dumps(run_probe_mode(args), indent=2))
+        return
+    if args.diagnostics:
+        jarvis = JarvisEnhanced(headless=True)
+        print(json.dumps(jarvis.monitor.sample(), indent=2))
+        return
+    if args.audio_report:
+        for entry in audio_size_report(args.audio_report):
+            print(json.dumps(entry))
+        return
+    if args.idle_benchmark:
+        print(json.dumps(benchmark_idle_listener(JarvisEnhanced(), args.idle_benchmark), indent=2))
+        return
+    if args.bench_screenshot:
+        print(json.dumps(benchmark_screenshot_pipeline(args.bench_screenshot,
+                                                       image_format=args.screenshot_format), indent=2))
+        return
+    
     try:
         print("🚀 Initializing JARVIS Enhanced AI Assistant...")
         
         # Create JARVIS instance
         jarvis = JarvisEnhanced()
+        if args.record is not None or jarvis.config.get('record_sessions'):
+            jarvis.start_recording(args.record or None)
         
         # Create and run GUI
         root = jarvis.create_gui()